@@ -2,7 +2,7 @@ from os import getenv
 from web import create_app
 
 # app = create_app('development')  # Set to 'production' if needed
-app = create_app('production')  # Set to 'production' if needed
+app = create_app(getenv('FLASK_CONFIG', 'production'))  # Set to 'production' if needed
 
 from flask import jsonify
 @app.route("/routes")
@@ -0,0 +1,73 @@
+"""
+Cold start cost of the app: `python -X importtime` of create_app, summarized.
+
+    cd backend && python -m benchmarks.import_time [--config testing] [--top 25] [--budget-ms 1500]
+
+Runs the boot in a fresh interpreter, prints the slowest top level imports (cumulative
+time) and the total, and exits 1 when the total is over --budget-ms or when a module
+that should load lazily (opencv, numpy, faker, weasyprint, pandas) was imported during
+boot, so CI can keep cold starts from creeping back up.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+LAZY_MODULES = ('cv2', 'numpy', 'faker', 'weasyprint', 'pandas')
+
+BOOT = "from web import create_app; create_app({config!r})"
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        name = name[1:]  # one space after the bar, then two per nesting level
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def run_boot(config):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT.format(config=config)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-4000:])
+        raise SystemExit(f"boot failed with exit code {result.returncode}")
+    return parse_importtime(result.stderr), wall_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default='testing', help='config name passed to create_app')
+    parser.add_argument('--top', type=int, default=25, help='slowest top level imports to list')
+    parser.add_argument('--budget-ms', type=float, default=None, help='fail when imports take longer than this')
+    args = parser.parse_args()
+
+    rows, wall_ms = run_boot(args.config)
+    top_level = [row for row in rows if row[3] == 0]
+    total_ms = sum(row[2] for row in top_level) / 1000
+
+    print(f"{'module':<50}{'cumulative ms':>15}{'self ms':>10}")
+    for name, self_us, cumulative_us, _ in sorted(top_level, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{name:<50}{cumulative_us / 1000:>15.1f}{self_us / 1000:>10.1f}")
+    print(f"\nimports: {total_ms:.1f} ms, whole boot (interpreter + create_app): {wall_ms:.1f} ms")
+
+    failures = []
+    loaded = {row[0] for row in rows}
+    eager = [module for module in LAZY_MODULES if module in loaded]
+    if eager:
+        failures.append(f"imported during boot, should be lazy: {', '.join(eager)}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"imports took {total_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
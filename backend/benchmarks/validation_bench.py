@@ -0,0 +1,46 @@
+"""
+Per-request cost of json-schema validation, before and after the compiled registry.
+
+    cd backend && python -m benchmarks.validation_bench [-n 20000]
+
+"before" is what the handlers used to do, `jsonschema.validate()` per request (build a
+validator class + check the schema + validate). "after" is `schemas.validate()`, which
+reuses the validator compiled at startup and stops at the first error.
+"""
+import argparse
+import timeit
+from jsonschema import ValidationError, validate
+from web.apis.utils.validation import SchemaRegistry
+from web.apis.schemas.product import product_schema
+from web.apis.schemas.user import signup_schema
+from web.apis.schemas.order import order_schema
+
+CASES = {
+    'product (valid)': (product_schema, {'name': 'Ankara gown', 'description': 'Hand made', 'price': 25000, 'stock': 4, 'is_deleted': False}),
+    'product (invalid)': (product_schema, {'name': 'Ankara gown', 'price': 'free', 'stock': 'many'}),
+    'signup (valid)': (signup_schema, {'username': 'ada', 'phone': '08030000000', 'email': 'ada@example.com', 'password': 'secret'}),
+    'order (empty)': (order_schema, {}),
+}
+
+def run_once(check, schema, payload):
+    try:
+        check(payload, schema)
+    except ValidationError:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=20000, help='validations per case')
+    args = parser.parse_args()
+
+    registry = SchemaRegistry().load()
+    before = lambda payload, schema: validate(instance=payload, schema=schema)
+
+    print(f"{'case':<20}{'before us/req':>15}{'after us/req':>15}{'speedup':>10}")
+    for name, (schema, payload) in CASES.items():
+        old = timeit.timeit(lambda: run_once(before, schema, payload), number=args.number) / args.number * 1e6
+        new = timeit.timeit(lambda: run_once(registry.validate, schema, payload), number=args.number) / args.number * 1e6
+        print(f"{name:<20}{old:>15.1f}{new:>15.1f}{old / new:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
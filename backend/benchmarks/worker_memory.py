@@ -0,0 +1,127 @@
+"""
+Memory per gunicorn worker, app preloaded in the master vs built in every worker.
+
+    cd backend && python -m benchmarks.worker_memory [--workers 4] [--requests 200] [--config production]
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:application` twice, GUNICORN_PRELOAD off
+then on, sends --requests GETs so every worker has served traffic, then reads
+/proc/<pid>/smaps_rollup (Linux) of the master and each worker:
+
+    rss   resident pages, shared ones counted in full in every process
+    pss   shared pages split between the processes sharing them, sums to real usage
+    uss   pages only this worker holds, what one more worker would cost
+
+Compare the `uss` column and the `total pss` line of the two runs: with preload the
+code, mappers, schemas and templates move from each worker's private pages into pages
+shared with the master, so uss per worker drops and total pss grows much slower with
+--workers. Run it against the database the deploy uses (SQLALCHEMY_DATABASE_URI).
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:  # fields after the name start at state, then ppid
+            found.append(int(entry))
+    return sorted(found)
+
+def memory_kb(pid):
+    """{'rss', 'pss', 'uss'} in kB from smaps_rollup."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[key] = int(rest.split()[0])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+def measure(preload, workers, requests, config):
+    port = free_port()
+    env = {
+        **os.environ,
+        'GUNICORN_PRELOAD': str(preload),
+        'WEB_CONCURRENCY': str(workers),
+        'PORT': str(port),
+        'FLASK_CONFIG': config,
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'wsgi:application'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while len(children(server.pid)) < workers:
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise SystemExit(f"gunicorn did not start {workers} workers (preload={preload})")
+            time.sleep(0.2)
+
+        for _ in range(requests):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/routes', timeout=10).read()
+            except OSError:
+                time.sleep(0.2)  # workers still booting without preload
+        time.sleep(1)
+
+        master = memory_kb(server.pid)
+        per_worker = [memory_kb(pid) for pid in children(server.pid)]
+        return master, per_worker
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def report(label, master, per_worker):
+    print(f"\n{label}")
+    print(f"{'process':<12}{'rss MB':>10}{'pss MB':>10}{'uss MB':>10}")
+    rows = [('master', master)] + [(f'worker {i}', m) for i, m in enumerate(per_worker, 1)]
+    for name, m in rows:
+        print(f"{name:<12}{m['rss'] / 1024:>10.1f}{m['pss'] / 1024:>10.1f}{m['uss'] / 1024:>10.1f}")
+    total_pss = sum(m['pss'] for _, m in rows)
+    mean_uss = sum(m['uss'] for m in per_worker) / max(1, len(per_worker))
+    print(f"total pss: {total_pss / 1024:.1f} MB, uss per worker: {mean_uss / 1024:.1f} MB")
+    return total_pss, mean_uss
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='requests spread over the workers before measuring')
+    parser.add_argument('--config', default='production', help='config name passed to create_app')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        raise SystemExit("needs Linux 4.14+ (/proc/<pid>/smaps_rollup)")
+
+    results = {}
+    for preload in (False, True):
+        label = f"preload {'on' if preload else 'off'}, {args.workers} workers"
+        results[preload] = report(label, *measure(preload, args.workers, args.requests, args.config))
+
+    (pss_off, uss_off), (pss_on, uss_on) = results[False], results[True]
+    print(f"\npreload saves {(pss_off - pss_on) / 1024:.1f} MB in total, "
+          f"{(uss_off - uss_on) / 1024:.1f} MB of private memory per worker")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+gunicorn settings, run from backend/:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+WEB_CONCURRENCY workers with WEB_THREADS threads each. With GUNICORN_PRELOAD on (the
+default) the app is built once in the master and forked, see wsgi.py and
+benchmarks/worker_memory.py for what that saves per worker.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5001)}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 'yes', 'on')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+accesslog = '-'
+
+# web/config.py divides DB_CONNECTION_BUDGET by these, the app is loaded after this file
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ['WEB_THREADS'] = str(threads)
+
+def _dispose_pools(close):
+    from wsgi import application
+    from web.extensions import db
+    with application.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        _dispose_pools(close=True)  # nothing opened in the master is inherited
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        # Drop any pool state copied from the master without closing its sockets,
+        # which are the master's; this worker opens its own connections on first use.
+        _dispose_pools(close=False)
@@ -0,0 +1,25 @@
+"""baseline: the schema db.create_all() built before migrations were tracked
+
+Revision ID: 3f1a9c2e7b10
+Revises: 
+Create Date: 2026-10-19 18:00:00
+
+Empty on purpose. Databases created before this point already have these tables,
+`flask db stamp 3f1a9c2e7b10` marks them (see migrations/README).
+
+"""
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2e7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
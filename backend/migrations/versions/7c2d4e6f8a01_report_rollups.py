@@ -0,0 +1,81 @@
+"""daily report rollups and their watermarks
+
+Revision ID: 7c2d4e6f8a01
+Revises: 9e4b1d3a5c72
+Create Date: 2026-10-19 18:00:02
+
+Created empty, the first `flask reports refresh` folds in the existing history.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d4e6f8a01'
+down_revision = '9e4b1d3a5c72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_watermarks',
+        sa.Column('source', sa.String(length=64), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source')
+    )
+    op.create_table('report_daily_sales',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('orders_count', sa.Integer(), nullable=False),
+        sa.Column('items_sold', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('report_daily_product_sales',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'product_id', name='one_product_row_per_day')
+    )
+    op.create_index(op.f('ix_report_daily_product_sales_day'), 'report_daily_product_sales', ['day'], unique=False)
+    op.create_index(op.f('ix_report_daily_product_sales_product_id'), 'report_daily_product_sales', ['product_id'], unique=False)
+    op.create_table('report_daily_category_sales',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'category_id', name='one_category_row_per_day')
+    )
+    op.create_index(op.f('ix_report_daily_category_sales_day'), 'report_daily_category_sales', ['day'], unique=False)
+    op.create_index(op.f('ix_report_daily_category_sales_category_id'), 'report_daily_category_sales', ['category_id'], unique=False)
+    op.create_table('report_daily_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('plan_id', sa.Integer(), nullable=False),
+        sa.Column('units_used', sa.BigInteger(), nullable=False),
+        sa.Column('events', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'plan_id', name='one_plan_row_per_day')
+    )
+    op.create_index(op.f('ix_report_daily_usage_day'), 'report_daily_usage', ['day'], unique=False)
+    op.create_index(op.f('ix_report_daily_usage_plan_id'), 'report_daily_usage', ['plan_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_report_daily_usage_plan_id'), table_name='report_daily_usage')
+    op.drop_index(op.f('ix_report_daily_usage_day'), table_name='report_daily_usage')
+    op.drop_table('report_daily_usage')
+    op.drop_index(op.f('ix_report_daily_category_sales_category_id'), table_name='report_daily_category_sales')
+    op.drop_index(op.f('ix_report_daily_category_sales_day'), table_name='report_daily_category_sales')
+    op.drop_table('report_daily_category_sales')
+    op.drop_index(op.f('ix_report_daily_product_sales_product_id'), table_name='report_daily_product_sales')
+    op.drop_index(op.f('ix_report_daily_product_sales_day'), table_name='report_daily_product_sales')
+    op.drop_table('report_daily_product_sales')
+    op.drop_table('report_daily_sales')
+    op.drop_table('report_watermarks')
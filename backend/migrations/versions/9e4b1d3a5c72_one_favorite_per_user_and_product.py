@@ -0,0 +1,38 @@
+"""one favorite per user and product
+
+Revision ID: 9e4b1d3a5c72
+Revises: 3f1a9c2e7b10
+Create Date: 2026-10-19 18:00:01
+
+Duplicates saved before the constraint are dropped first, the oldest row of each
+pair is kept (brought back if any of its duplicates was still live).
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b1d3a5c72'
+down_revision = '3f1a9c2e7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # derived tables, mysql won't read the table it deletes from in a plain subquery
+    op.execute(
+        "UPDATE favorites SET is_deleted = false WHERE id IN ("
+        " SELECT id FROM (SELECT MIN(id) AS id FROM favorites GROUP BY user_id, product_id"
+        "  HAVING SUM(CASE WHEN is_deleted THEN 0 ELSE 1 END) > 0) AS live)"
+    )
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN ("
+        " SELECT id FROM (SELECT MIN(id) AS id FROM favorites GROUP BY user_id, product_id) AS keep)"
+    )
+    with op.batch_alter_table('favorites') as batch_op:
+        batch_op.create_unique_constraint('same_favorite_for_same_user', ['user_id', 'product_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('favorites') as batch_op:
+        batch_op.drop_constraint('same_favorite_for_same_user', type_='unique')
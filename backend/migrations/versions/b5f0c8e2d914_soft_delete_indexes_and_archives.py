@@ -0,0 +1,56 @@
+"""partial indexes over live rows, <table>_archive for soft deleted ones
+
+Revision ID: b5f0c8e2d914
+Revises: 7c2d4e6f8a01
+Create Date: 2026-10-19 18:00:03
+
+The archive tables mirror their source table as it is at this revision (see
+`define_archive_tables`), later revisions that add a column to a soft delete table
+add it to the archive too.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f0c8e2d914'
+down_revision = '7c2d4e6f8a01'
+branch_labels = None
+depends_on = None
+
+SOFT_DELETE_TABLES = (
+    'areas', 'categories', 'comments', 'favorites', 'file_uploads', 'pages',
+    'products', 'service_requests', 'services', 'tags',
+)
+
+LIVE_ROWS = {'postgresql_where': sa.text('is_deleted = false'), 'sqlite_where': sa.text('is_deleted = 0')}
+
+
+def create_archive(name):
+    """`<name>_archive`: the columns of `name` as the database has them, no constraints, plus archived_at."""
+    source = sa.Table(name, sa.MetaData(), autoload_with=op.get_bind())
+    op.create_table(f'{name}_archive',
+        *[sa.Column(column.name, column.type, primary_key=column.primary_key) for column in source.columns],
+        sa.Column('archived_at', sa.DateTime(), nullable=False)
+    )
+    op.create_index(op.f(f'ix_{name}_archive_archived_at'), f'{name}_archive', ['archived_at'], unique=False)
+
+
+def drop_archive(name):
+    op.drop_index(op.f(f'ix_{name}_archive_archived_at'), table_name=f'{name}_archive')
+    op.drop_table(f'{name}_archive')
+
+
+def upgrade():
+    op.create_index('ix_products_live_created_at', 'products', ['created_at'], unique=False, **LIVE_ROWS)
+    op.create_index('ix_comments_live_product_created', 'comments', ['product_id', 'created_at'], unique=False, **LIVE_ROWS)
+    for name in SOFT_DELETE_TABLES:
+        create_archive(name)
+
+
+def downgrade():
+    for name in SOFT_DELETE_TABLES:
+        drop_archive(name)
+    op.drop_index('ix_comments_live_product_created', table_name='comments')
+    op.drop_index('ix_products_live_created_at', table_name='products')
@@ -0,0 +1,64 @@
+"""dispatch batches, and the claim columns and queue index of service requests
+
+Revision ID: c81e5a3f0d27
+Revises: b5f0c8e2d914
+Create Date: 2026-10-19 18:00:04
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81e5a3f0d27'
+down_revision = 'b5f0c8e2d914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dispatch_batches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('area_id', sa.Integer(), nullable=False),
+        sa.Column('claimed_by', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('closed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['area_id'], ['areas.id'], ),
+        sa.ForeignKeyConstraint(['claimed_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_dispatch_batches_area_id'), 'dispatch_batches', ['area_id'], unique=False)
+    op.create_index(op.f('ix_dispatch_batches_status'), 'dispatch_batches', ['status'], unique=False)
+
+    with op.batch_alter_table('service_requests') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+        batch_op.create_foreign_key('fk_service_requests_batch_id_dispatch_batches', 'dispatch_batches', ['batch_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_service_requests_batch_id'), ['batch_id'], unique=False)
+    op.create_index(
+        'ix_service_requests_live_queue', 'service_requests', ['status', 'area_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_deleted = false'), sqlite_where=sa.text('is_deleted = 0'),
+    )
+
+    # archived rows keep every column of their table
+    with op.batch_alter_table('service_requests_archive') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('service_requests_archive') as batch_op:
+        batch_op.drop_column('claimed_at')
+        batch_op.drop_column('batch_id')
+
+    op.drop_index('ix_service_requests_live_queue', table_name='service_requests')
+    with op.batch_alter_table('service_requests') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_service_requests_batch_id'))
+        batch_op.drop_constraint('fk_service_requests_batch_id_dispatch_batches', type_='foreignkey')
+        batch_op.drop_column('claimed_at')
+        batch_op.drop_column('batch_id')
+
+    op.drop_index(op.f('ix_dispatch_batches_status'), table_name='dispatch_batches')
+    op.drop_index(op.f('ix_dispatch_batches_area_id'), table_name='dispatch_batches')
+    op.drop_table('dispatch_batches')
@@ -0,0 +1,51 @@
+"""service categories: is_deleted and timestamps, and their archive table
+
+Revision ID: d2a7f4b9e615
+Revises: c81e5a3f0d27
+Create Date: 2026-10-19 18:00:05
+
+Existing categories are live and get the migration time as created_at/updated_at.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7f4b9e615'
+down_revision = 'c81e5a3f0d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # nullable first, sqlite can't add a NOT NULL column defaulting to the current time
+    with op.batch_alter_table('service_categories') as batch_op:
+        batch_op.add_column(sa.Column('is_deleted', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE service_categories SET is_deleted = false, created_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP")
+    with op.batch_alter_table('service_categories') as batch_op:
+        batch_op.alter_column('is_deleted', existing_type=sa.Boolean(), nullable=False)
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_table('service_categories_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('is_deleted', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_service_categories_archive_archived_at'), 'service_categories_archive', ['archived_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_service_categories_archive_archived_at'), table_name='service_categories_archive')
+    op.drop_table('service_categories_archive')
+    with op.batch_alter_table('service_categories') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('created_at')
+        batch_op.drop_column('is_deleted')
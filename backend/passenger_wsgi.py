@@ -1 +1,11 @@
-from app import app as application
\ No newline at end of file
+import logging
+from os import getenv
+
+if getenv('WEB_CONCURRENCY') is None:
+    # web/config.py sizes the db pool per process from it, Passenger doesn't export it
+    logging.getLogger('web').warning(
+        "WEB_CONCURRENCY is not set, every Passenger process sizes its db pool for the whole "
+        "DB_CONNECTION_BUDGET. Set it to PassengerMaxPoolSize (SetEnv / passenger_env_var)."
+    )
+
+from app import app as application
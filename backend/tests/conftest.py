@@ -0,0 +1,11 @@
+import pytest
+from web import create_app
+from web.extensions import db
+
+@pytest.fixture
+def app():
+    """An app on the testing config, its in-memory database created fresh for every test."""
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
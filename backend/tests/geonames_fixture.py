@@ -0,0 +1,122 @@
+"""
+A local stand-in for the GeoNames API, for tests and offline imports.
+
+Serves `countryInfoJSON` and `childrenJSON` from in-memory data, in the payload shape
+GeoNamesClient reads, and records every request it answers:
+
+    server = GeoNamesFixture(countries, children).start()
+    importer = GeoImporter(GeoNamesClient(server.url, retries=1), checkpoint=ImportCheckpoint(path))
+    ...
+    server.stop()
+
+Run on its own it serves SAMPLE, for `flask geo import --api-url`:
+
+    cd backend && python -m tests.geonames_fixture [--port 8765]
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def country(geoname_id, code, name, iso_numeric):
+    return {
+        'geonameId': geoname_id, 'countryCode': code, 'countryName': name,
+        'isoNumeric': iso_numeric, 'languages': 'en', 'currencyCode': 'XXX',
+    }
+
+def place(geoname_id, name):
+    return {'geonameId': geoname_id, 'name': name}
+
+# two countries, two states each, two cities per state
+SAMPLE = {
+    'countries': [country(1, 'AA', 'Aland', '901'), country(2, 'BB', 'Borduria', '902')],
+    'children': {
+        1: [place(11, 'Aland North'), place(12, 'Aland South')],
+        2: [place(21, 'Borduria East'), place(22, 'Borduria West')],
+        11: [place(111, 'Avik'), place(112, 'Amberg')],
+        12: [place(121, 'Asle'), place(122, 'Anholt')],
+        21: [place(211, 'Szohod'), place(212, 'Bakovia')],
+        22: [place(221, 'Brno Vel'), place(222, 'Blaskov')],
+    },
+}
+
+class GeoNamesFixture:
+    """
+    Args:
+        countries (list): countryInfoJSON entries.
+        children (dict): {geonameId: childrenJSON entries}, unknown ids answer [].
+        failing (set, optional): geonameIds whose childrenJSON answers 500.
+    """
+    def __init__(self, countries, children, failing=(), port=0):
+        self.countries = countries
+        self.children = children
+        self.failing = set(failing)
+        self.requests = []  # (endpoint, query args), in the order they came in
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def children_requested(self):
+        """geonameIds childrenJSON was asked for."""
+        return [int(args['geonameId']) for endpoint, args in self.requests if endpoint == 'childrenJSON']
+
+    def _answer(self, endpoint, args):
+        if endpoint == 'countryInfoJSON':
+            return 200, {'geonames': self.countries}
+        if endpoint == 'childrenJSON':
+            geoname_id = int(args['geonameId'])
+            if geoname_id in self.failing:
+                return 500, {}
+            return 200, {'geonames': self.children.get(geoname_id, [])}
+        return 404, {'status': {'message': f"unknown endpoint {endpoint}", 'value': 404}}
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                endpoint = parsed.path.strip('/')
+                args = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                with fixture._lock:
+                    fixture.requests.append((endpoint, args))
+                status, payload = fixture._answer(endpoint, args)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = GeoNamesFixture(SAMPLE['countries'], SAMPLE['children'], port=args.port)
+    print(f"serving the sample GeoNames data at {server.url}, "
+          f"`flask geo import --api-url {server.url}` to import it")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
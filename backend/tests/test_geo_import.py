@@ -0,0 +1,121 @@
+import pytest
+import sqlalchemy as sa
+from web.extensions import db
+from web.apis.models.addresses import Country, State, City
+from web.apis.utils.geo_import import GeoImporter, GeoNamesClient, ImportCheckpoint, upsert_by_geoname
+from tests.geonames_fixture import GeoNamesFixture, SAMPLE
+
+def importer_for(server, checkpoint_path, batch_size=1000):
+    client = GeoNamesClient(base_url=server.url, username='test', timeout=5, retries=1)
+    return GeoImporter(client, workers=2, batch_size=batch_size,
+                       checkpoint=ImportCheckpoint(str(checkpoint_path)), log=lambda message: None)
+
+@pytest.fixture
+def geonames():
+    server = GeoNamesFixture(SAMPLE['countries'], SAMPLE['children']).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def statements(app):
+    """SQL statements sent to the database while the test runs."""
+    sent = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', record)
+    yield sent
+    sa.event.remove(db.engine, 'before_cursor_execute', record)
+
+def names(model):
+    return sorted(db.session.scalars(sa.select(model.name)))
+
+def test_import_resumes_after_the_last_checkpointed_country(app, geonames, tmp_path):
+    checkpoint = tmp_path / 'geo.json'
+    ImportCheckpoint(str(checkpoint)).mark(1)  # an earlier run finished Aland
+
+    stats = importer_for(geonames, checkpoint).run()
+
+    assert stats['skipped'] == 1 and stats['failed'] == []
+    assert (stats['states'], stats['cities']) == (2, 4)
+    assert 1 not in geonames.children_requested()
+    assert names(State) == ['Borduria East', 'Borduria West']
+    assert ImportCheckpoint(str(checkpoint)).done == {1, 2}
+
+    geonames.requests.clear()
+    stats = importer_for(geonames, checkpoint).run()
+
+    assert stats['skipped'] == 2
+    assert geonames.children_requested() == []
+
+def test_failed_country_is_retried_on_the_next_run(app, tmp_path):
+    checkpoint = tmp_path / 'geo.json'
+    server = GeoNamesFixture(SAMPLE['countries'], SAMPLE['children'], failing={2}).start()
+    try:
+        stats = importer_for(server, checkpoint).run()
+        assert stats['failed'] == [2]
+        assert ImportCheckpoint(str(checkpoint)).done == {1}
+
+        server.failing.clear()
+        server.requests.clear()
+        stats = importer_for(server, checkpoint).run()
+    finally:
+        server.stop()
+
+    assert stats['skipped'] == 1 and stats['failed'] == []
+    assert 1 not in server.children_requested()
+    assert len(names(State)) == 4 and len(names(City)) == 8
+
+def test_upsert_by_geoname_costs_the_same_statements_per_batch(app, statements):
+    rows = [
+        {'geoname_id': 1000 + i, 'name': f"Country {i}", 'code': f"C{i}", 'iso_numeric': str(i)}
+        for i in range(25)
+    ]
+    ids = upsert_by_geoname(Country, rows, batch_size=10)
+    db.session.commit()
+
+    # 3 batches: lookup by geoname id, legacy lookup by name, bulk insert, ids read back
+    assert len(statements) <= 3 * 4
+    assert len(ids) == 25
+    assert db.session.scalar(sa.select(sa.func.count()).select_from(Country)) == 25
+
+    statements.clear()
+    renamed = [{**row, 'name': f"{row['name']} renamed"} for row in rows]
+    assert upsert_by_geoname(Country, renamed, batch_size=10) == ids
+    db.session.commit()
+
+    # all matched by geoname id: a lookup and a bulk update per batch
+    assert len([s for s in statements if s.lstrip().upper().startswith(('SELECT', 'UPDATE', 'INSERT'))]) <= 3 * 2
+    assert all(name.endswith('renamed') for name in names(Country))
+
+def test_upsert_by_geoname_adopts_rows_stored_without_a_geoname_id(app):
+    legacy = Country(name='Aland', code='AA')
+    db.session.add(legacy)
+    db.session.commit()
+
+    ids = upsert_by_geoname(Country, [{
+        'geoname_id': 1, 'name': 'Aland', 'code': 'AA', 'iso_numeric': '901',
+    }, {
+        'geoname_id': 2, 'name': 'Borduria', 'code': 'BB', 'iso_numeric': '902',
+    }])
+    db.session.commit()
+
+    assert ids[1] == legacy.id
+    assert db.session.get(Country, legacy.id).geoname_id == 1
+    assert names(Country) == ['Aland', 'Borduria']
+
+def test_duplicate_geoname_rows_are_stored_once(app):
+    rows = [
+        {'geoname_id': 1, 'name': 'Aland', 'code': 'AA', 'iso_numeric': '901'},
+        {'geoname_id': 1, 'name': 'Aland Islands', 'code': 'AA', 'iso_numeric': '901'},
+    ]
+    upsert_by_geoname(Country, rows)
+    db.session.commit()
+
+    assert names(Country) == ['Aland Islands']
+
+def test_country_filter_imports_only_the_wanted_codes(app, geonames, tmp_path):
+    stats = importer_for(geonames, tmp_path / 'geo.json').run(country_codes=['bb'])
+
+    assert stats['countries'] == 1
+    assert names(Country) == ['Borduria']
+    assert set(geonames.children_requested()) == {2, 21, 22}
@@ -20,8 +20,32 @@ def create_app(config_name=None):
         from web.apis.errors.handlers import error_bp
         app.register_blueprint(error_bp)
 
-        with app.app_context():
-            db.create_all()  # Create all tables
+        # per-request query counts/timings, only when PROFILER_ENABLED
+        from web.apis.utils.profiler import init_profiler
+        init_profiler(app)
+
+        # compile every json schema once, requests reuse the validators
+        from web.apis.utils.validation import init_validation
+        init_validation(app)
+
+        # reads of `@use_replica` views go to the replica, when one is configured
+        from web.apis.utils.replicas import init_replicas
+        init_replicas(app)
+
+        # cost based rate limiting, writes pay per call, reads are free
+        from web.apis.utils.rate_limit import init_rate_limit
+        init_rate_limit(app)
+
+        # flask cli commands, e.g `flask geo import`
+        from web.cli import register_commands
+        register_commands(app)
+
+        # Schema changes go through migrations (`flask db upgrade`, migrations/README for databases
+        # made before they were tracked), or `flask schema create` on a fresh database.
+        # AUTO_CREATE_SCHEMA (tests, sqlite in memory) still creates tables on boot.
+        if app.config.get('AUTO_CREATE_SCHEMA'):
+            with app.app_context():
+                db.create_all()  # Create all tables
 
         return app
     
@@ -16,6 +16,14 @@ from . import comments
 from . import plans                       
 from . import pays                       
 from . import services                       
+from . import orders
+from . import favorites
+from . import tags
+from . import reports
+from . import exports
+from . import invoices
+from . import batch
+from . import restore
 
 __all__ = [
     
@@ -1,15 +1,23 @@
 import traceback
-from flask import jsonify, request
+from flask import current_app, jsonify, request
 from flask_jwt_extended import current_user, jwt_required
-import requests
 from sqlalchemy import desc
-from web.extensions import db
+from web.extensions import db, redis
 from web.apis import api_bp as address_bp
 from web.apis.models.addresses import Country, State, City, Address
-from web.apis.utils.serializers import PageSerializer, success_response, error_response
+from web.apis.utils.serializers import PageSerializer, PrefetchedPagination, success_response, error_response
+from web.apis.utils.replicas import use_replica
+from web.apis.utils.decorators import access_required
+from web.apis.utils.rate_limit import cost_limited
+from web.apis.utils.profiler import query_budget
+from web.apis.utils.snapshots import make_etag, not_modified, not_modified_response, cacheable
+from web.apis.utils.geo_reference import geo_snapshot, country_summary, GEO_MAX_AGE
+from web.apis.utils.geo_import import GeoImporter, GeoNamesClient, upsert_by_geoname
 from web.apis.schemas.address import country_schema, state_schema, city_schema, address_schema
 from web.extensions import limiter
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from web.apis.utils.validation import schemas
+from web.tasks import geo_import
 
 # Address API
 
@@ -47,7 +55,7 @@ def create_address():
     """Create a new address for the authenticated user."""
     try:
         data = request.json
-        validate(instance=data, schema=address_schema)  # Validate the data using JSON schema
+        schemas.validate(data, address_schema)  # Validate the data using JSON schema
 
         address = Address(
             first_name=data.get('first_name', current_user.name),
@@ -106,7 +114,7 @@ def create_address():
 
 # 
 from sqlalchemy.exc import SQLAlchemyError
-from flask import request, current_app
+from flask import request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 @address_bp.route('/addresses/<int:address_id>', methods=['PUT'])
 @jwt_required()
@@ -146,7 +154,7 @@ def update_address(address_id):
             return error_response("No data provided", status_code=400)
 
         try:
-            validate(instance=data, schema=address_schema)
+            schemas.validate(data, address_schema)
         except ValidationError as e:
             current_app.logger.debug(f"Validation failed: {e.message}")
             return error_response(f"Validation error: {e.message}", status_code=400)
@@ -206,26 +214,36 @@ def delete_address(address_id):
 @address_bp.route('/countries/<int:country_id>', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@query_budget(5)  # viewer, their countries, a snapshot rebuild (3)
+@use_replica
 def list_countries(country_id=None):
-    """List all countries with pagination."""
+    """List all countries with pagination, served from the geo snapshot."""
     try:
-        
+        geo, version = geo_snapshot.get()
+        selected_ids = Country.selected_ids_for(current_user)
+        page_size = max(request.args.get('page_size', 500, type=int), 1)
+        page = max(request.args.get('page', 1, type=int), 1)
+
+        # is_selected differs per viewer, so their selection is part of the etag and only browsers may cache it
+        etag = make_etag('countries', version, country_id, page, page_size, sorted(selected_ids))
+        private = bool(current_user)
+        if not_modified(etag):
+            return not_modified_response(etag, max_age=GEO_MAX_AGE, private=private)
+
         if country_id is not None:
             # Fetch a single country
-            country = Country.query.filter_by(id=country_id, user_id=current_user.id).first()
+            country = geo['countries_by_id'].get(country_id)
             if country is None:
-                return error_response("Address not found", status_code=404)
-            data = country.get_summary(include_user=False)
-            return success_response("Country fetched successfully", data=data)
+                return error_response("Country not found", status_code=404)
+            data = country_summary(country, selected_ids)
+            return cacheable(success_response("Country fetched successfully", data=data), etag, max_age=GEO_MAX_AGE, private=private)
 
-        page_size = request.args.get('page_size', 500, type=int)
-        page = request.args.get('page', 1, type=int)
-
-        # Fetch countries with pagination
-        countries = Country.query.order_by(Country.name).paginate(page=page, per_page=page_size)
-        data = PageSerializer(pagination_obj=countries, resource_name="countries").get_data()
+        countries = geo['countries']
+        start = (page - 1) * page_size
+        pagination = PrefetchedPagination(items=countries[start:start + page_size], total=len(countries), page=page, per_page=page_size)
+        data = PageSerializer(pagination_obj=pagination, resource_name="countries", summary_func=country_summary, selected_ids=selected_ids).get_data()
 
-        return success_response("Countries fetched successfully.", data=data)
+        return cacheable(success_response("Countries fetched successfully.", data=data), etag, max_age=GEO_MAX_AGE, private=private)
 
     except Exception as e:
         traceback.print_exc()
@@ -238,7 +256,7 @@ def create_country():
     """Create a new country."""
     try:
         data = request.json
-        validate(instance=data, schema=country_schema)
+        schemas.validate(data, country_schema)
 
         country = Country(name=data['name'])
         db.session.add(country)
@@ -259,7 +277,7 @@ def update_country(country_id):
         country = Country.query.get_or_404(country_id)
 
         data = request.json
-        validate(instance=data, schema=country_schema)
+        schemas.validate(data, country_schema)
 
         country.name = data.get('name', country.name)
         db.session.commit()
@@ -289,24 +307,29 @@ def delete_country(country_id):
 @address_bp.route('/states/<int:country_id>/countries', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@query_budget(4)  # viewer, a snapshot rebuild (3)
+@use_replica
 def states_by_country(country_id):
-    """List all states by country with pagination."""
+    """List all states by country with pagination, served from the geo snapshot."""
     try:
         
         if country_id is not None:
 
-            page_size = request.args.get('page_size', 50, type=int)
-            page = request.args.get('page', 1, type=int)
+            page_size = max(request.args.get('page_size', 50, type=int), 1)
+            page = max(request.args.get('page', 1, type=int), 1)
 
-            # Fetch states with pagination
-            # states = State.query.order_by(State.name).paginate(page=page, per_page=page_size)
-            states = State.query.filter_by(country_id=country_id).order_by(State.name).paginate(page=page, per_page=page_size)
-            if states is None:
-                return error_response(f"No state(s) found for {country_id}", status_code=404)
-            data = PageSerializer(items=states.items, resource_name="states").get_data()
+            geo, version = geo_snapshot.get()
+            etag = make_etag('states', version, country_id, page, page_size)
+            if not_modified(etag):
+                return not_modified_response(etag, max_age=GEO_MAX_AGE)
+
+            # Slice states from the snapshot
+            start = (page - 1) * page_size
+            states = geo['states_by_country'].get(country_id, [])[start:start + page_size]
+            data = PageSerializer(items=states, resource_name="states", summary_func=lambda item, **kw: item).get_data()
             # data = PageSerializer(pagination_obj=states, resource_name="states", context_id=country_id).get_data()
 
-            return success_response(f"States fetched for {country_id} successfully.", data=data)
+            return cacheable(success_response(f"States fetched for {country_id} successfully.", data=data), etag, max_age=GEO_MAX_AGE)
         
         return error_response("Country ID required to fetch it's states.")
 
@@ -317,6 +340,7 @@ def states_by_country(country_id):
 @address_bp.route('/states', methods=['GET'])
 @jwt_required()
 @limiter.exempt
+@use_replica
 def list_states():
     """List all states."""
     try:
@@ -334,7 +358,7 @@ def create_state():
     """Create a new state."""
     try:
         data = request.json
-        validate(instance=data, schema=state_schema)
+        schemas.validate(data, state_schema)
 
         state = State(name=data['name'], country_id=data['country_id'])
         db.session.add(state)
@@ -355,7 +379,7 @@ def update_state(state_id):
         state = State.query.get_or_404(state_id)
 
         data = request.json
-        validate(instance=data, schema=state_schema)
+        schemas.validate(data, state_schema)
 
         state.name = data.get('name', state.name)
         state.country_id = data.get('country_id', state.country_id)
@@ -386,22 +410,28 @@ def delete_state(state_id):
 @address_bp.route('/cities/<int:state_id>/states', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@query_budget(4)  # viewer, a snapshot rebuild (3)
+@use_replica
 def cities_by_states(state_id):
-    """List all ctities by state with pagination."""
+    """List all ctities by state with pagination, served from the geo snapshot."""
     try:
         
         if state_id is not None:
 
-            page_size = request.args.get('page_size', 50, type=int)
-            page = request.args.get('page', 1, type=int)
+            page_size = max(request.args.get('page_size', 50, type=int), 1)
+            page = max(request.args.get('page', 1, type=int), 1)
+
+            geo, version = geo_snapshot.get()
+            etag = make_etag('cities', version, state_id, page, page_size)
+            if not_modified(etag):
+                return not_modified_response(etag, max_age=GEO_MAX_AGE)
 
-            # Fetch cities by state id with pagination
-            cities = City.query.filter_by(state_id=state_id).order_by(City.name).paginate(page=page, per_page=page_size)
-            if cities is None:
-                return error_response(f"No state(s) found for {state_id}", status_code=404)
-            data = PageSerializer(items=cities.items, resource_name="cities").get_data()
+            # Slice cities of the state from the snapshot
+            start = (page - 1) * page_size
+            cities = geo['cities_by_state'].get(state_id, [])[start:start + page_size]
+            data = PageSerializer(items=cities, resource_name="cities", summary_func=lambda item, **kw: item).get_data()
             
-            return success_response(f"Cities fetched for {state_id} successfully.", data=data)
+            return cacheable(success_response(f"Cities fetched for {state_id} successfully.", data=data), etag, max_age=GEO_MAX_AGE)
         
         return error_response("State ID required to fetch it's cities.")
 
@@ -413,6 +443,7 @@ def cities_by_states(state_id):
 @address_bp.route('/cities', methods=['GET'])
 @jwt_required()
 @limiter.exempt
+@use_replica
 def list_cities():
     """List all cities."""
     try:
@@ -430,7 +461,7 @@ def create_city():
     """Create a new city."""
     try:
         data = request.json
-        validate(instance=data, schema=city_schema)
+        schemas.validate(data, city_schema)
 
         city = City(name=data['name'], state_id=data['state_id'])
         db.session.add(city)
@@ -451,7 +482,7 @@ def update_city(city_id):
         city = City.query.get_or_404(city_id)
 
         data = request.json
-        validate(instance=data, schema=city_schema)
+        schemas.validate(data, city_schema)
 
         city.name = data.get('name', city.name)
         city.state_id = data.get('state_id', city.state_id)
@@ -646,70 +677,47 @@ def delete_city(city_id):
 #         return jsonify({"error": str(e)}), 500
 
 
-import requests
-@address_bp.route('/fetch_data', methods=['GET'])
+@address_bp.route('/fetch_data', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
 @limiter.exempt
+@cost_limited(50)  # queues a full GeoNames crawl
 def fetch_data():
-    try:
-        # Fetch countries from GeoNames
-        country_response = requests.get('http://api.geonames.org/countryInfoJSON?username=EDET')
-        countries = country_response.json().get('geonames', [])
-
-        for country in countries:
-            existing_country = Country.query.filter_by(name=country['countryName']).first()
-            if existing_country:
-                continue  # Skip if the country already exists
-
-            # Get currency and handle missing key
-            currency = country.get('currency', 'N/A')  # Default value if currency not found
-            currency_symbol = country.get('currencyCode', 'N/A')  # Default value if currency symbol not found
-
-            country_instance = Country(
-                name=country['countryName'],
-                geoname_id=country['geonameId'],
-                code=country['countryCode'],
-                languages=country['languages'],
-                iso_numeric=country['isoNumeric'],
-                currency=currency,
-                currency_symbol=currency_symbol,
-                logo_url=f"https://flagcdn.com/w320/{country['countryCode'].lower()}.png",
-                flag_url=f"https://flagcdn.com/{country['countryCode'].lower()}.svg"
-            )
-
-            db.session.add(country_instance)
-            db.session.commit()
+    """
+    Start a GeoNames import of countries, states and cities in the background.
 
-            # Fetch states for the country
-            state_response = requests.get(f'http://api.geonames.org/childrenJSON?geonameId={country["geonameId"]}&username=EDET')
-            states = state_response.json().get('geonames', [])
-
-            for state in states:
-                state_instance = State(
-                    name=state['name'],
-                    country_id=country_instance.id
-                )
-                db.session.add(state_instance)
-                db.session.commit()
-
-                # Fetch cities for the state
-                city_response = requests.get(f'http://api.geonames.org/childrenJSON?geonameId={state["geonameId"]}&username=EDET')
-                cities = city_response.json().get('geonames', [])
+    Same job as `flask geo import`, which is the better way to run it, this only
+    hands it to a thread so no web worker is held for the length of the import.
+    """
+    try:
+        if not start_geo_import():
+            return jsonify({"message": "An import is already running."}), 409
+        return jsonify({"message": "Import started, countries, states and cities will fill in as it runs."}), 202
 
-                for city in cities:
-                    city_instance = City(
-                        name=city['name'],
-                        state_id=state_instance.id
-                    )
-                    db.session.add(city_instance)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-            db.session.commit()
+GEO_IMPORT_LOCK = 'geo:import:lock'
 
-        return jsonify({"message": "Data fetched and stored successfully!"}), 200
+def start_geo_import(country_codes=None):
+    """
+    Queue a GeoImporter run on the task worker.
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": str(e)}), 500
+    A redis lock keeps repeated calls from starting overlapping imports, the task
+    releases it when it finishes.
 
+    Returns:
+        bool: False when an import is already running.
+    """
+    if not redis.set(GEO_IMPORT_LOCK, 1, nx=True, ex=6 * 3600):
+        return False
+    try:
+        geo_import.delay(country_codes, lock_key=GEO_IMPORT_LOCK)
+    except Exception:
+        redis.delete(GEO_IMPORT_LOCK)
+        raise
+    return True
 
 # 
 
@@ -775,57 +783,41 @@ def fetch_data():
 
 # 
 
-import requests
+def geonames_client():
+    config = current_app.config
+    return GeoNamesClient(base_url=config['GEONAMES_API_URL'], username=config['GEONAMES_USERNAME'])
 
 # Fetch states by country's Geoname ID
 def fetch_states(country_geoname_id):
-    url = f"http://api.geonames.org/childrenJSON?geonameId={country_geoname_id}&username=edet"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json().get('geonames', [])
-    return []
+    try:
+        return geonames_client().children(country_geoname_id)
+    except Exception:
+        traceback.print_exc()
+        return []
 
 # Fetch cities by state's Geoname ID
 def fetch_cities(state_geoname_id):
-    url = f"http://api.geonames.org/childrenJSON?geonameId={state_geoname_id}&username=edet"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json().get('geonames', [])
-    return []
+    try:
+        return geonames_client().children(state_geoname_id)
+    except Exception:
+        traceback.print_exc()
+        return []
 
-# Save states with their Geoname IDs, avoiding duplicates
+# Save states with their Geoname IDs, avoiding duplicates (batched upsert on geoname_id)
 def save_states(country_id, states):
-    for state in states:
-        existing_state = State.query.filter_by(name=state['name'], country_id=country_id).first()
-        if existing_state:
-            # Update geoname_id if it is missing
-            if not existing_state.geoname_id:
-                existing_state.geoname_id = state['geonameId']
-            continue  # Skip if the state already exists
-        new_state = State(
-            name=state['name'],
-            country_id=country_id,
-            geoname_id=state['geonameId']
-        )
-        db.session.add(new_state)
+    rows = [{'geoname_id': state['geonameId'], 'name': state['name'], 'country_id': country_id} for state in states]
+    state_ids = upsert_by_geoname(State, rows, parent_column='country_id')
     db.session.commit()
+    geo_snapshot.bump()  # bulk statements don't fire the model events the snapshot watches
+    return state_ids
 
-# Save cities with their Geoname IDs, avoiding duplicates
+# Save cities with their Geoname IDs, avoiding duplicates (batched upsert on geoname_id)
 def save_cities(state_id, cities):
-    for city in cities:
-        existing_city = City.query.filter_by(name=city['name'], state_id=state_id).first()
-        if existing_city:
-            # Update geoname_id if it is missing
-            if not existing_city.geoname_id:
-                existing_city.geoname_id = city['geonameId']
-            continue  # Skip if the city already exists
-        new_city = City(
-            name=city['name'],
-            state_id=state_id,
-            geoname_id=city['geonameId']
-        )
-        db.session.add(new_city)
+    rows = [{'geoname_id': city['geonameId'], 'name': city['name'], 'state_id': state_id} for city in cities]
+    city_ids = upsert_by_geoname(City, rows, parent_column='state_id')
     db.session.commit()
+    geo_snapshot.bump()
+    return city_ids
 
 # # Automate the population of states and cities
 # def automate_population():
@@ -838,21 +830,16 @@ def save_cities(state_id, cities):
 #             cities = fetch_cities(state['geonameId'])
 #             save_cities(state['id'], cities)
 
-def automate_population():
-    countries = Country.query.all()
-    for country in countries:
-        states = fetch_states(country.geoname_id)
-        save_states(country.id, states)
-        
-        for state in states:
-            # Assuming you've saved the state and can query it back
-            existing_state = State.query.filter_by(name=state['name'], country_id=country.id).first()
-            if existing_state:
-                cities = fetch_cities(state['geonameId'])
-                save_cities(existing_state.id, cities)
+def automate_population(country_codes=None):
+    """Concurrent fetch + batched upserts, resumes from GEO_IMPORT_CHECKPOINT."""
+    return GeoImporter.from_config(current_app.config).run(country_codes=country_codes)
 
 
-@address_bp.route('/populate', methods=['GET'])
+@address_bp.route('/populate', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
+@cost_limited(50)
 def populate():
-    automate_population()
-    return jsonify({"message": "Population of states and cities completed."})
+    if not start_geo_import():
+        return jsonify({"message": "An import is already running."}), 409
+    return jsonify({"message": "Population of states and cities started."}), 202
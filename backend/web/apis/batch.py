@@ -0,0 +1,84 @@
+import traceback
+from urllib.parse import urlencode
+from flask import current_app, g, request
+from flask_jwt_extended import current_user, jwt_required
+from web.extensions import limiter
+from web.apis.schemas.batch import batch_schema
+from web.apis.utils.rate_limit import cost_limited
+from web.apis.utils.serializers import error_response, success_response
+from web.apis.utils.subrequests import SubrequestError, run_all, runs_subrequests
+from web.apis.utils.validation import validated_body
+from web.apis import api_bp as batch_bp
+
+# what the storefront loads on every page, part name -> path
+BOOTSTRAP = {
+    'products': '/api/products',
+    'categories': '/api/categories',
+    'favorites': '/api/favorite',
+    'user': '/api/users/current',  # signed in callers only
+}
+# query args of /bootstrap passed on to the products listing
+PRODUCT_ARGS = ('page', 'page_size', 'category_id', 'category', 'sort')
+
+@batch_bp.route('/batch', methods=['POST'])
+@jwt_required(optional=True)
+@validated_body(batch_schema, coerce=False, allow_form=False, empty_message="No requests to run.")
+@cost_limited(lambda: len(g.validated_body['requests']) * current_app.config['RATE_LIMIT_SUBREQUEST_COST'])
+@runs_subrequests
+def batch():
+    """
+    Run several GETs of this API in one request, with one token check, one user lookup
+    and one database session for all of them.
+
+    Body: {"requests": {"products": "/api/products?page_size=20", "categories": "/api/categories"}}
+
+    Every GET inside costs RATE_LIMIT_SUBREQUEST_COST tokens, so a batch can't be used to
+    fan out past the rate limit. Only batchable reads are accepted (web/apis/utils/subrequests.py).
+
+    :return: {"responses": {"products": {"status": 200, "body": {...}}, ...}}, each body as
+        the endpoint would have answered it.
+    """
+    try:
+        responses = run_all(g.validated_body['requests'])
+        return success_response("Batch completed.", data={'responses': responses})
+    except SubrequestError as e:
+        return error_response(str(e), status_code=400)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error running batch: {str(e)}", status_code=500)
+
+@batch_bp.route('/bootstrap', methods=['GET'])
+@jwt_required(optional=True)
+@limiter.exempt
+@runs_subrequests
+def bootstrap():
+    """
+    What the storefront needs on page load in one call: products, categories,
+    favorites and the signed in user.
+
+    `?include=products,categories` picks the parts, all by default (`user` only for
+    signed in callers). page, page_size, category_id, category and sort go to the
+    products listing.
+
+    :return: {"responses": {part: {"status": ..., "body": ...}}}, like /batch.
+    """
+    try:
+        include = request.args.get('include')
+        parts = [part.strip() for part in include.split(',') if part.strip()] if include else list(BOOTSTRAP)
+        unknown = [part for part in parts if part not in BOOTSTRAP]
+        if unknown:
+            return error_response(
+                f"Unknown part(s) {', '.join(unknown)}, pick from {', '.join(BOOTSTRAP)}.", status_code=400
+            )
+        if not current_user:
+            parts = [part for part in parts if part != 'user']
+
+        paths = {part: BOOTSTRAP[part] for part in parts}
+        product_args = {name: request.args[name] for name in PRODUCT_ARGS if name in request.args}
+        if 'products' in paths and product_args:
+            paths['products'] += f"?{urlencode(product_args)}"
+
+        return success_response("Bootstrap data fetched.", data={'responses': run_all(paths)})
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error fetching bootstrap data: {str(e)}", status_code=500)
@@ -151,7 +151,8 @@ import re
 import traceback
 from flask import current_app as app, request
 from flask_jwt_extended import jwt_required, current_user
-from jsonschema import ValidationError, validate
+from jsonschema import ValidationError
+from web.apis.utils.validation import schemas
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import desc, exc
 from werkzeug.utils import secure_filename
@@ -161,11 +162,13 @@ from web.apis.models.products import Product
 from web.apis.schemas.categories import category_schema
 from web.apis.utils.helpers import validate_file_upload
 from web.apis.utils.serializers import PageSerializer, error_response, success_response
+from web.apis.utils.replicas import use_replica
 from web.apis import api_bp as category_bp
 
 @category_bp.route('/categories', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@use_replica
 def categories():
     """
     Retrieve a paginated list of categories.
@@ -202,6 +205,7 @@ def categories():
 @category_bp.route('/categories/<category_id>', methods=['GET'])
 @jwt_required()
 @limiter.exempt
+@use_replica
 def by_category_id(category_id):
     """
     Retrieve a category by its ID.
@@ -218,6 +222,7 @@ def by_category_id(category_id):
 @category_bp.route('/categories/<category_slug>/slug', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@use_replica
 def by_category_slug(category_slug):
     """
     Retrieve a category by its slug.
@@ -236,6 +241,7 @@ def by_category_slug(category_slug):
 
 @category_bp.route('/categories/<int:category_id>/products', methods=['GET'])
 @jwt_required(optional=True)
+@use_replica
 def category_products(category_id):
     """
     Fetch products associated with a specific category with pagination.
@@ -290,7 +296,7 @@ def create_categories():
 
         # Validate category data
         try:
-            validate(instance=data, schema=category_schema)
+            schemas.validate(data, category_schema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}")
 
@@ -342,7 +348,7 @@ def update_categories(category_id):
 
         # Validate category data
         try:
-            validate(instance=data, schema=category_schema)
+            schemas.validate(data, category_schema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}")
 
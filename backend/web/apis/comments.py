@@ -1,11 +1,14 @@
 import traceback
 from flask import request
 from flask_jwt_extended import jwt_required, get_jwt, current_user
-from jsonschema import ValidationError, validate
-from sqlalchemy import desc
+from jsonschema import ValidationError
+from web.apis.utils.validation import schemas
 from sqlalchemy.exc import SQLAlchemyError
 from web.apis.utils.decorators import access_required
-from web.apis.utils.serializers import PageSerializer, error_response, success_response
+from web.apis.utils.serializers import PageSerializer, PrefetchedPagination, error_response, success_response
+from web.apis.utils.replicas import use_replica
+from web.apis.utils.comment_feed import bump_comment_feed, cached_comment_feed
+from web.apis.utils.profiler import query_budget
 from web.apis.models.products import Product
 from web.apis.models.comments import Comment
 from web.apis.schemas.comment import comment_schema
@@ -15,6 +18,8 @@ from web.apis import api_bp as comment_bp
 # List comments for a specific product or all products
 @comment_bp.route('/comments/products/<product_slug>', methods=['GET'])
 @comment_bp.route('/comments/products', methods=['GET'])
+@query_budget(4)  # product lookup, comment page, an empty-page count, authors
+@use_replica
 def list_comments(product_slug=None):
     try:
         # If product_slug is provided, fetch its comments
@@ -28,15 +33,17 @@ def list_comments(product_slug=None):
             
             product_id = product.id
 
-            comments = Comment.query.filter_by(product_id=product_id).order_by(
-                desc(Comment.created_at) ).paginate(page=page, per_page=page_size)
+            # one query for the page, one for its authors - cached until a comment write bumps the feed
+            items, total = cached_comment_feed(product_id=product_id, page=page, page_size=page_size)
+            comments = PrefetchedPagination(items=items, total=total, page=page, per_page=page_size)
 
-            data = PageSerializer(pagination_obj=comments, resource_name="comments", include_user=True).get_data()
+            data = PageSerializer(pagination_obj=comments, resource_name="comments", summary_func=lambda item, **kw: item).get_data()
             return success_response("Comments fetched successfully.", data=data)
         
         # fetch - return all comments if slug is not provided
-        comments = Comment.query.order_by(desc(Comment.created_at) ).paginate(page=page, per_page=page_size)
-        data = PageSerializer(pagination_obj=comments, resource_name="comments", include_user=True).get_data()
+        items, total = cached_comment_feed(page=page, page_size=page_size)
+        comments = PrefetchedPagination(items=items, total=total, page=page, per_page=page_size)
+        data = PageSerializer(pagination_obj=comments, resource_name="comments", summary_func=lambda item, **kw: item).get_data()
         return success_response("Comments fetched successfully.", data=data)
     
     except SQLAlchemyError as e:
@@ -49,6 +56,7 @@ def list_comments(product_slug=None):
 
 # Get details of a specific comment by id
 @comment_bp.route('/comments/<int:comment_id>', methods=['GET'])
+@use_replica
 def show_comment(comment_id):
     try:
         comment = Comment.query.get_or_404(comment_id)
@@ -68,7 +76,7 @@ def create_comment(product_slug):
         
         # Validate incoming data against JSON schema
         try:
-            validate(instance=data, schema=comment_schema)
+            schemas.validate(data, comment_schema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}", status_code=400)
         
@@ -84,6 +92,7 @@ def create_comment(product_slug):
         comment = Comment(content=data['content'], user_id=user_id, rating=data.get('rating'), product_id=product.id)
         db.session.add(comment)
         db.session.commit()
+        bump_comment_feed(comment.product_id)
 
         # Serialize and return the response
         # data = PageSerializer(items=[comment], resource_name="comment").get_data()
@@ -113,7 +122,7 @@ def update_comment(comment_id):
         data = request.json
         
         try:
-            validate(instance=data, schema=comment_schema)
+            schemas.validate(data, comment_schema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}", status_code=400)
 
@@ -127,6 +136,7 @@ def update_comment(comment_id):
             comment.rating = rating
 
         db.session.commit()
+        bump_comment_feed(comment.product_id)
         # data = PageSerializer(items=[comment], resource_name="comment").get_data()
         data = comment.get_summary()
         return success_response("Comment updated successfully.", data=data)
@@ -153,8 +163,10 @@ def destroy_comment(comment_id):
         if not current_user.is_admin() and comment.user_id != current_user.id:
             return error_response("Permission denied.", status_code=403)
 
+        product_id = comment.product_id
         db.session.delete(comment)
         db.session.commit()
+        bump_comment_feed(product_id)
         return success_response("Comment deleted successfully.")
 
     except SQLAlchemyError as e:
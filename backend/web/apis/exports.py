@@ -0,0 +1,64 @@
+import traceback
+from flask import Response, current_app, request, send_from_directory, stream_with_context
+from flask_jwt_extended import current_user, jwt_required
+from web.apis.utils.decorators import access_required
+from web.apis.utils.exports import FORMATS, export_filename, export_job, iter_export, start_export_job
+from web.apis.utils.helpers import strtobool_custom
+from web.apis.utils.serializers import error_response, success_response
+from web.apis.utils.rate_limit import cost_limited
+from web.apis import api_bp as export_bp
+
+@export_bp.route('/exports/<dataset>', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+@cost_limited(20)
+def export_dataset(dataset):
+    """
+    Stream orders, users, transactions or service requests as CSV or NDJSON.
+
+    Query args:
+        format: csv (default) or ndjson.
+        start, end: YYYY-MM-DD on created_at, inclusive.
+        status: order status, user status (active, deleted, guest, verified), transaction status
+            or service request status.
+        area_id: service requests of one area.
+        async: true to write the file in the background instead, poll /exports/jobs/<job_id>.
+    """
+    fmt = request.args.get('format', 'csv')
+    filters = {key: request.args.get(key) for key in ('start', 'end', 'status', 'area_id')}
+    try:
+        if strtobool_custom(request.args.get('async', 'false')):
+            job_id = start_export_job(dataset, fmt, requested_by=current_user.username, **filters)
+            return success_response("Export started", data={'job_id': job_id, 'status': 'running'}, status_code=202)
+
+        chunks = iter_export(dataset, fmt, **filters)
+    except ValueError as e:  # ExportError, or a bad `async` value
+        return error_response(str(e), status_code=400)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error exporting {dataset}: {str(e)}")
+
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(dataset, fmt)}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass chunks through as they come
+    return response
+
+@export_bp.route('/exports/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+def export_job_status(job_id):
+    job = export_job(job_id)
+    if job is None:
+        return error_response("Export job not found or expired.", status_code=404)
+    return success_response("Export job", data={'job_id': job_id, **job})
+
+@export_bp.route('/exports/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+def download_export(job_id):
+    job = export_job(job_id)
+    if job is None:
+        return error_response("Export job not found or expired.", status_code=404)
+    if job['status'] != 'done':
+        return error_response(f"Export is {job['status']}.", status_code=409, data=job)
+    return send_from_directory(current_app.config['EXPORTS_LOCATION'], job['file'], as_attachment=True)
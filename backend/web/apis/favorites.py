@@ -1,15 +1,20 @@
 import traceback
 from flask import request, session
 from flask_jwt_extended import current_user, jwt_required
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 from web.apis.models.products import Product
 from web.apis.models.users import User
 from web.apis.utils.serializers import PageSerializer, error_response, success_response
+from web.apis.utils import favorites as favorites_index
+from web.apis.utils.subrequests import batchable
 from web.extensions import db
 from web.apis.models.favorites import Favorite
 from web.apis import api_bp as basket_bp
 
 @basket_bp.route('/favorite', methods=['GET'])
 @jwt_required(optional=True)
+@batchable
 def get_favorite():
     """Retrieve favorite items for a user, either from the database (authenticated users) or session (non-authenticated users)."""
     user_id = request.args.get('user_id') or (current_user.id if current_user else None)
@@ -23,7 +28,8 @@ def get_favorite():
             # favorites = Favorite.query.filter_by(user_id=user_id).all()
             page = request.args.get('page', 1, type=int)  # Default to page 1
             per_size = request.args.get('page_size', 10, type=int)  # Default to 10 items per page
-            favorites = Favorite.query.filter_by(user_id=user_id).paginate(page=page, per_page=per_size, error_out=False)
+            favorites = Favorite.query.filter_by(user_id=user_id).options(joinedload(Favorite.products)) \
+                .order_by(Favorite.created_at.desc()).paginate(page=page, per_page=per_size, error_out=False)
 
             # data = PageSerializer(items=favorites.items, resource_name='favorites').get_data()
             
@@ -52,21 +58,16 @@ def add_favorite():
         return error_response("Product ID is required.", status_code=400)
 
     try:
-        product = Product.get_product(product_id)
-        if not product:
+        # an id probe is enough, the full product isn't needed to favorite it
+        if not db.session.scalar(select(Product.id).where(Product.id == product_id)):
             return error_response(f"Product <{product_id}> not found.", status_code=404)
 
         if user_id:
-            # Authenticated user: store in the database
-            user = User.get_user(user_id)
-            if not user:
+            # Authenticated user: store in the database, the unique (user_id, product_id) constraint dedupes
+            if not (current_user and str(current_user.id) == str(user_id)) and not User.get_user(user_id):
                 return error_response(f"User <{user_id}> not found.", status_code=404)
 
-            favorite = Favorite.query.filter_by(user_id=user_id, product_id=product_id).first()
-            if not favorite:
-                favorite = Favorite(user_id=user_id, product_id=product_id)
-                db.session.add(favorite)
-                db.session.commit()
+            favorites_index.add_favorite(user_id, product_id)
             
             return success_response('Product added to favorites successfully.', status_code=201)
         else:
@@ -93,10 +94,7 @@ def remove_favorite(product_id):
             if not user:
                 return error_response(f"User <{user_id}> not found.", status_code=404)
 
-            favorite = Favorite.query.filter_by(user_id=user_id, product_id=product_id).first()
-            if favorite:
-                db.session.delete(favorite)
-                db.session.commit()
+            if favorites_index.remove_favorite(user_id, product_id):
                 return success_response('Product removed from favorites successfully.', status_code=200)
 
             return error_response(f"Product <{product_id}> not found in your <{user.username}> favorites.", status_code=404)
@@ -110,4 +108,33 @@ def remove_favorite(product_id):
 
             return error_response(f"Product <{product_id}> not found in favorites (guest).", status_code=404)
     except Exception as e:
-        return error_response(f"Error removing product from favorites: {str(e)}", status_code=500)
\ No newline at end of file
+        return error_response(f"Error removing product from favorites: {str(e)}", status_code=500)
+
+@basket_bp.route('/favorite/lookup', methods=['GET', 'POST'])
+@jwt_required(optional=True)
+def lookup_favorites():
+    """
+    Bulk "is favorited" lookup for the viewer.
+
+    Product ids come as `?product_ids=1,2,3` or a json body `{"product_ids": [1, 2, 3]}`.
+    Answers `{"favorites": {"1": true, "2": false, ...}}` in one round trip.
+    """
+    try:
+        if request.method == 'POST':
+            product_ids = (request.get_json(silent=True) or {}).get('product_ids', [])
+        else:
+            product_ids = request.args.get('product_ids', '').split(',')
+
+        try:
+            product_ids = [int(product_id) for product_id in product_ids if str(product_id).strip()]
+        except (TypeError, ValueError):
+            return error_response("product_ids must be a list of integers.", status_code=400)
+
+        if len(product_ids) > 500:
+            return error_response("At most 500 product ids per lookup.", status_code=400)
+
+        flags = favorites_index.viewer_favorites(current_user, product_ids)
+        return success_response('Favorites looked up successfully.', data={'favorites': flags}, status_code=200)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error looking up favorites: {str(e)}", status_code=500)
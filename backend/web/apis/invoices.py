@@ -0,0 +1,63 @@
+import os
+import re
+import traceback
+from flask import send_file, url_for
+from flask_jwt_extended import current_user, jwt_required
+from web.apis.utils.invoices import KINDS, document_path, load_document, request_document
+from web.apis.utils.serializers import error_response, success_response
+from web.apis.utils.rate_limit import cost_limited
+from web.extensions import limiter
+from web.apis import api_bp as invoice_bp
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+@invoice_bp.route('/invoices/<kind>/<int:object_id>', methods=['GET'])
+@jwt_required()
+@cost_limited(2)
+def invoice(kind, object_id):
+    """
+    Invoice of an order or receipt of a transaction.
+
+    200 with the pdf url when it is ready, 202 while it is rendered in the background
+    (retry after a moment). The url changes whenever the order does.
+    """
+    if kind not in KINDS:
+        return error_response(f"kind must be one of {', '.join(KINDS)}", status_code=404)
+    try:
+        obj, context = load_document(kind, object_id)
+        if obj is None:
+            return error_response(f"{kind.capitalize()} not found.", status_code=404)
+        if obj.user_id != current_user.id and not current_user.is_admin():
+            return error_response("Access forbidden: insufficient permissions.", status_code=403)
+
+        digest, ready = request_document(kind, object_id, context=context)
+        data = {'kind': kind, 'id': object_id, 'number': context['number'], 'digest': digest}
+        if not ready:
+            return success_response("Document is being generated, retry shortly.", data={**data, 'status': 'rendering'}, status_code=202)
+        return success_response("Document ready", data={**data, 'status': 'ready', 'url': url_for('apis.invoice_file', digest=digest)})
+
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error preparing {kind} document: {str(e)}")
+
+@invoice_bp.route('/invoices/files/<digest>.pdf', methods=['GET'])
+@limiter.exempt
+def invoice_file(digest):
+    """
+    The pdf itself. Its name is an HMAC (keyed on SECRET_KEY) of its content, so it never
+    changes and browsers may keep it for a year. The name can't be derived without the
+    key, it is the access check like a signed url, and only `invoice()` hands it out, to
+    the owner or an admin.
+    """
+    if not DIGEST_RE.match(digest):
+        return error_response("Document not found.", status_code=404)
+    path = document_path(digest)
+    if not os.path.exists(path):
+        return error_response("Document not found.", status_code=404)
+
+    response = send_file(path, mimetype='application/pdf', etag=digest, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True  # personal data, browsers only, no shared caches
+    response.cache_control.immutable = True
+    return response
@@ -27,6 +27,10 @@ from .categories import Category, products_categories
 from .transactions import Transaction
 from .plans import Plan, Subscription, Usage
 from .services import *
+from .reports import ReportWatermark, DailySales, DailyProductSales, DailyCategorySales, DailyUsage
+from .soft_delete import define_archive_tables
+
+define_archive_tables()  # <table>_archive for every soft delete model imported above
 
 __all__ = [
     
@@ -66,7 +70,13 @@ __all__ = [
     "Category",
     "products_categories",
     
-    "Transaction"
+    "Transaction",
+
+    "ReportWatermark",
+    "DailySales",
+    "DailyProductSales",
+    "DailyCategorySales",
+    "DailyUsage"
 ]
 
 
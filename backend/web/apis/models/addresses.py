@@ -44,19 +44,27 @@ class Country(db.Model):
     states = db.relationship('State', backref='country', lazy=True)
     created_at = db.Column(db.DateTime, index=True, nullable=False, default=func.now())
 
-    def get_summary(self, include_states=False):
-        # Determine if the user has selected this country before
-        is_selected = False
-        if current_user and current_user.addresses:
-            for address in current_user.addresses:
-                if address.city and address.city.state and address.city.state.country.id == self.id:
-                    is_selected = True
-                    break
+    @staticmethod
+    def selected_ids_for(user):
+        """Ids of the countries a user has addresses in, in a single query."""
+        if not user:
+            return frozenset()
+        return frozenset(db.session.scalars(
+            db.select(State.country_id).distinct()
+            .join(City, City.state_id == State.id)
+            .join(Address, Address.city_id == City.id)
+            .where(Address.user_id == user.id)
+        ))
+
+    def get_summary(self, include_states=False, selected_ids=None):
+        # Determine if the user has selected this country before, pass `selected_ids` when summarizing many countries
+        if selected_ids is None:
+            selected_ids = Country.selected_ids_for(current_user)
 
         data = {
             'id': self.id,
             'name': self.name,
-            'is_selected': is_selected,
+            'is_selected': self.id in selected_ids,
             'created_at': self.created_at
         }
         
@@ -2,6 +2,7 @@ from slugify import slugify
 from sqlalchemy import event, func
 from sqlalchemy.orm import backref, validates
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin
 
 # from apis.ecommerce_api.factory import db
 # from apis.products.models import products_categories
@@ -13,7 +14,7 @@ products_categories = \
         db.Column("product_id", db.Integer, db.ForeignKey("products.id"))
         )
 
-class Category(db.Model):
+class Category(SoftDeleteMixin, db.Model):
     __tablename__ = 'categories'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(140), unique=True)
@@ -1,9 +1,11 @@
 
 from sqlalchemy import func
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin, live_index
 
-class Comment(db.Model):
+class Comment(SoftDeleteMixin, db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (live_index('ix_comments_live_product_created', 'product_id', 'created_at'),)
 
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
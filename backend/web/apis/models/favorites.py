@@ -1,8 +1,10 @@
-from sqlalchemy import func
+from sqlalchemy import UniqueConstraint, func
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin
 
-class Favorite(db.Model):
+class Favorite(SoftDeleteMixin, db.Model):
     __tablename__ = 'favorites'
+    __table_args__ = (UniqueConstraint('user_id', 'product_id', name='same_favorite_for_same_user'),)
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1,7 +1,8 @@
 from sqlalchemy import func
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin
 
-class FileUpload(db.Model):
+class FileUpload(SoftDeleteMixin, db.Model):
     __tablename__ = 'file_uploads'
     id = db.Column('id', db.Integer, primary_key=True)
     type = db.Column('type', db.String(15))  # this will be our discriminator
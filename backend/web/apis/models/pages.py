@@ -1,5 +1,6 @@
 from sqlalchemy import func
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin
 
 products_pages = \
     db.Table(
@@ -14,7 +15,7 @@ users_pages = \
         db.Column("user_id", db.Integer, db.ForeignKey("users.id") ),
         db.Column("page_id", db.Integer, db.ForeignKey("pages.id") )
         )
-class Page(db.Model):
+class Page(SoftDeleteMixin, db.Model):
     __tablename__ = 'pages'
     __searchable__ = ['name', 'username', 'email', 'phone', 'description']
 
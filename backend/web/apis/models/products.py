@@ -3,13 +3,15 @@ from sqlalchemy import event, func, or_
 from sqlalchemy.orm import relationship
 
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin, live_index
 from web.apis.models.users import products_users
 from web.apis.models.categories import products_categories
 from web.apis.models.tags import products_tags
 from web.apis.models.pages import products_pages
 
-class Product(db.Model):
+class Product(SoftDeleteMixin, db.Model):
     __tablename__ = 'products'
+    __table_args__ = (live_index('ix_products_live_created_at', 'created_at'),)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -101,7 +103,7 @@ def generate_product_slug(target, value, oldvalue, initiator):
         counter = 1
         
         # Ensure slug uniqueness
-        while Product.query.filter(Product.slug == unique_slug).first():
+        while Product.query.execution_options(include_deleted=True).filter(Product.slug == unique_slug).first():  # deleted rows keep their slug
             unique_slug = f"{base_slug}-{counter}"
             counter += 1
             
@@ -0,0 +1,59 @@
+from sqlalchemy import UniqueConstraint, func
+from web.extensions import db
+
+# Daily rollups behind /api/reports, maintained by web/apis/utils/reports.py.
+# Never written by request handlers, only by `flask reports refresh` (or the refresh endpoint).
+
+class ReportWatermark(db.Model):
+    """Last source row folded into the rollups, one row per source table."""
+    __tablename__ = 'report_watermarks'
+
+    source = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=func.now(), onupdate=func.now())
+
+class DailySales(db.Model):
+    __tablename__ = 'report_daily_sales'
+
+    day = db.Column(db.Date, primary_key=True)
+    orders_count = db.Column(db.Integer, nullable=False, default=0)
+    items_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def get_summary(self):
+        return {
+            'day': self.day.isoformat(),
+            'orders_count': self.orders_count,
+            'items_sold': self.items_sold,
+            'revenue': self.revenue,
+        }
+
+class DailyProductSales(db.Model):
+    __tablename__ = 'report_daily_product_sales'
+    __table_args__ = (UniqueConstraint('day', 'product_id', name='one_product_row_per_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=False, index=True)  # no FK, history outlives deleted products
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)
+
+class DailyCategorySales(db.Model):
+    __tablename__ = 'report_daily_category_sales'
+    __table_args__ = (UniqueConstraint('day', 'category_id', name='one_category_row_per_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    category_id = db.Column(db.Integer, nullable=False, index=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)
+
+class DailyUsage(db.Model):
+    __tablename__ = 'report_daily_usage'
+    __table_args__ = (UniqueConstraint('day', 'plan_id', name='one_plan_row_per_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    plan_id = db.Column(db.Integer, nullable=False, default=0, index=True)  # 0: usage without a subscription
+    units_used = db.Column(db.BigInteger, nullable=False, default=0)
+    events = db.Column(db.Integer, nullable=False, default=0)
@@ -1,8 +1,9 @@
 from sqlalchemy import func, ForeignKey
 from sqlalchemy.orm import relationship
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin, live_index
 
-class Area(db.Model):
+class Area(SoftDeleteMixin, db.Model):
     __tablename__ = 'areas'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -26,11 +27,15 @@ class Area(db.Model):
             'updated_at': self.updated_at
         }
 
-class ServiceCategory(db.Model):
+class ServiceCategory(SoftDeleteMixin, db.Model):
     __tablename__ = 'service_categories'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
+
+    is_deleted = db.Column(db.Boolean(), nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=func.now(), onupdate=func.now())
     
     # Relationship to Service
     services = relationship('Service', back_populates='category')
@@ -41,7 +46,7 @@ class ServiceCategory(db.Model):
             'name': self.name,
         }
 
-class Service(db.Model):
+class Service(SoftDeleteMixin, db.Model):
     __tablename__ = 'services'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -78,8 +83,10 @@ class Service(db.Model):
             'updated_at': self.updated_at
         }
 
-class ServiceRequest(db.Model):
+class ServiceRequest(SoftDeleteMixin, db.Model):
     __tablename__ = 'service_requests'
+    # the dispatch queue: oldest pending requests of an area (web/apis/utils/dispatch.py)
+    __table_args__ = (live_index('ix_service_requests_live_queue', 'status', 'area_id', 'created_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -93,6 +100,8 @@ class ServiceRequest(db.Model):
     service_id = db.Column(db.Integer, ForeignKey('services.id'), nullable=False)
     
     status = db.Column(db.String(20), default='Pending')
+    batch_id = db.Column(db.Integer, ForeignKey('dispatch_batches.id'), index=True, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
 
     is_deleted = db.Column(db.Boolean(), nullable=False, default=False)
     created_at = db.Column(db.DateTime, nullable=False, default=func.now())
@@ -101,6 +110,7 @@ class ServiceRequest(db.Model):
     # Relationships
     area = relationship('Area', back_populates='service_requests')
     service = relationship('Service', back_populates='service_requests')
+    batch = relationship('DispatchBatch', back_populates='service_requests')
 
     def get_summary(self):
         return {
@@ -113,7 +123,36 @@ class ServiceRequest(db.Model):
             'area_id': self.area_id,
             'service_id': self.service_id,
             'status': self.status,
+            'batch_id': self.batch_id,
+            'claimed_at': self.claimed_at,
             'is_deleted': self.is_deleted,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
+
+class DispatchBatch(db.Model):
+    """Pending requests of one area claimed together by an operator, for one pickup round."""
+    __tablename__ = 'dispatch_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    area_id = db.Column(db.Integer, ForeignKey('areas.id'), index=True, nullable=False)
+    claimed_by = db.Column(db.Integer, ForeignKey('users.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='Open', index=True)  # Open, Closed, Expired
+
+    created_at = db.Column(db.DateTime, nullable=False, default=func.now())
+    closed_at = db.Column(db.DateTime, nullable=True)
+
+    area = relationship('Area')
+    service_requests = relationship('ServiceRequest', back_populates='batch')
+
+    def get_summary(self, requests=None):
+        return {
+            'id': self.id,
+            'area_id': self.area_id,
+            'area': self.area.name if self.area else None,
+            'claimed_by': self.claimed_by,
+            'status': self.status,
+            'created_at': self.created_at,
+            'closed_at': self.closed_at,
+            'service_requests': [request.get_summary() for request in (requests if requests is not None else self.service_requests)],
+        }
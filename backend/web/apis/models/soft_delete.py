@@ -0,0 +1,72 @@
+"""
+Soft deleted rows.
+
+Models with `SoftDeleteMixin` keep deleted rows around with `is_deleted` set, and every
+ORM query on them leaves those rows out on its own (listings, `session.get`, lazy
+loaded relationships), no `filter_by(is_deleted=False)` needed. To see them anyway:
+
+    db.session.execute(select(Favorite).where(...).execution_options(include_deleted=True))
+    Product.query.execution_options(include_deleted=True).filter_by(slug=slug)
+
+Admins list and bring back deleted rows through /deleted/<resource> (web/apis/restore.py),
+the routes that look rows up by id 404 on them like on missing ones.
+
+The added predicate is always `is_deleted = false`, the same one `live_index` builds
+partial indexes on, so the planner can use those indexes.
+
+Deleted rows older than SOFT_DELETE_RETENTION_DAYS are moved to `<table>_archive`
+by the compaction job (web/apis/utils/compaction.py).
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import with_loader_criteria
+from web.extensions import db
+
+ARCHIVE_SUFFIX = '_archive'
+
+class SoftDeleteMixin:
+    # the models declare it too, this copy is what with_loader_criteria inspects the
+    # criteria lambda against before applying it to each of them
+    is_deleted = db.Column(db.Boolean(), nullable=False, default=False)
+
+    @classmethod
+    def live(cls):
+        """The predicate every query gets, use it for hand written core statements too."""
+        return cls.is_deleted == False
+
+def live_index(name, *columns):
+    """Index over live rows only, for `__table_args__`; deleted rows don't bloat it."""
+    return db.Index(
+        name, *columns,
+        postgresql_where=db.text('is_deleted = false'),
+        sqlite_where=db.text('is_deleted = 0'),
+    )
+
+def _hide_deleted(state):
+    if not state.is_select or state.is_column_load or state.execution_options.get('include_deleted', False):
+        return
+    state.statement = state.statement.options(
+        with_loader_criteria(SoftDeleteMixin, lambda cls: cls.is_deleted == False, include_aliases=True)
+    )
+
+event.listen(db.session, 'do_orm_execute', _hide_deleted)
+
+# table name -> its archive table, filled by `define_archive_tables`
+archives = {}
+
+def define_archive_tables():
+    """
+    One `<table>_archive` per soft delete table: same columns, no constraints, plus
+    archived_at. Called once all models are imported (web/apis/models/__init__.py).
+    """
+    for mapper in db.Model.registry.mappers:
+        table = mapper.local_table
+        if not issubclass(mapper.class_, SoftDeleteMixin) or table.name in archives:
+            continue
+        columns = [db.Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns]
+        archives[table.name] = db.Table(
+            f"{table.name}{ARCHIVE_SUFFIX}", db.metadata,
+            *columns,
+            db.Column('archived_at', db.DateTime, nullable=False, index=True),
+        )
+    return archives
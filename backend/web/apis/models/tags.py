@@ -4,6 +4,7 @@ from slugify import slugify
 from sqlalchemy import event, Column, Integer, ForeignKey, UniqueConstraint, func
 
 from web.extensions import db
+from web.apis.models.soft_delete import SoftDeleteMixin
 
 products_tags = db.Table(
     'products_tags',
@@ -12,7 +13,7 @@ products_tags = db.Table(
     keep_existing=True
 )
 
-class Tag(db.Model):
+class Tag(SoftDeleteMixin, db.Model):
     __tablename__ = 'tags'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True)
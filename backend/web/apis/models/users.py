@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta, timezone
 import traceback
+from flask import g
 from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
 from sqlalchemy import func, or_
-from werkzeug.security import generate_password_hash, check_password_hash
 from web.apis.utils.serializers import error_response
+from web.apis.utils.passwords import password_hasher, make_unusable_password, UNUSABLE_PASSWORD_PREFIX
 from web.extensions import db, jwt
 from web.apis.models.roles import users_roles
 # from web.apis.models.products import products_users
@@ -84,17 +85,28 @@ class User(db.Model):
         return user
 
     def set_password(self, password: str) -> None:
-        """Hashes the password using bcrypt/scrypt and stores it."""
+        """Hashes the password (PASSWORD_HASH_METHOD, scrypt by default) on the hashing pool and stores it."""
         if not password:
             raise ValueError("Password cannot be empty")
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
+
+    def set_unusable_password(self) -> None:
+        """For guests and oauth sign-ups: no hashing, and no password will ever match."""
+        self.password = make_unusable_password()
+
+    def has_usable_password(self) -> bool:
+        return bool(self.password) and not self.password.startswith(UNUSABLE_PASSWORD_PREFIX)
 
     def check_password(self, password: str) -> bool:
-        """Checks the hashed password using bcrypt."""
+        """Checks the password against the stored hash on the hashing pool."""
         if self.password is None:
             # return False
             raise ValueError(f"Password not set for this user [{self.username}].")
-        return check_password_hash(self.password, password)
+        return password_hasher.verify(self.password, password)
+
+    def password_needs_rehash(self) -> bool:
+        """True when the stored hash predates the current PASSWORD_HASH_METHOD/cost."""
+        return password_hasher.needs_rehash(self.password)
 
     def is_admin(self):
         return 'admin' in [r.name for r in self.roles]
@@ -254,10 +266,14 @@ def user_identity_lookup(user):
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
     identity = jwt_data["sub"]
-    # return User.query.filter_by(or_(email=identity, id=identity)).one_or_none()
-    return User.query.filter(
-        or_(User.email == identity, User.id == identity)
-    ).one_or_none()
+    # once per request: the sub-requests of a batch share `g` (web/apis/utils/subrequests.py)
+    users = g.setdefault('jwt_users', {})
+    if identity not in users:
+        # return User.query.filter_by(or_(email=identity, id=identity)).one_or_none()
+        users[identity] = User.query.filter(
+            or_(User.email == identity, User.id == identity)
+        ).one_or_none()
+    return users[identity]
 
 # Callback function to check if a JWT exists in the database blocklist
 from web.extensions import redis as r
@@ -266,7 +282,10 @@ def check_if_token_revoked(jwt_header, jwt_payload: dict) -> bool:
     jti = jwt_payload["jti"]
     # token = db.session.query(TokenBlocklist.id).filter_by(jti=jti).scalar() // db-way-of-doing-it
     # return token is not None  // db-way-of-doing-it
-    return r.sismember("blacklist", jti) #  // redis-way-of-doing-it
+    revoked = g.setdefault('jwt_revoked', {})  # once per request, like the user above
+    if jti not in revoked:
+        revoked[jti] = r.sismember("blacklist", jti) #  // redis-way-of-doing-it
+    return revoked[jti]
 
 # 
 # Custom error response for missing token
@@ -1,16 +1,18 @@
 import traceback
 from flask import request
 from flask_jwt_extended import jwt_required, get_jwt, current_user
-from jsonschema import ValidationError, validate
+from jsonschema import ValidationError
+from web.apis.utils.validation import schemas
 from sqlalchemy import desc
 from web.apis.models.addresses import Address
 from web.apis.utils.decorators import access_required
 from web.extensions import db, fake, limiter
-from web.apis.models.orders import Order, OrderItem
+from web.apis.models.orders import ORDER_STATUS, Order, OrderItem
 from web.apis.schemas.order import order_schema
 from web.apis.utils.serializers import PageSerializer
 from web.apis.models.products import Product
 from web.apis.utils.serializers import success_response, error_response
+from web.apis.utils.invoices import queue_document
 
 from web.apis import api_bp as order_bp
 
@@ -21,8 +23,8 @@ from web.apis import api_bp as order_bp
 def orders():
     try:
         # Check permissions
-        page_size = request.args.get('page_size', 5)
-        page = request.args.get('page', 1)
+        page_size = request.args.get('page_size', 5, type=int)
+        page = request.args.get('page', 1, type=int)
         orders = Order.query.order_by(desc(Order.created_at)).paginate(page=page, per_page=page_size)
         data = PageSerializer(pagination_obj=orders, resource_name="orders", include_users=True).get_data()
         
@@ -42,8 +44,8 @@ def my_orders(user_id):
         if not current_user.is_admin() and user_id != current_user.id:
             return error_response("Permission denied.", status_code=403)
         
-        page_size = request.args.get('page_size', 5)
-        page = request.args.get('page', 1)
+        page_size = request.args.get('page_size', 5, type=int)
+        page = request.args.get('page', 1, type=int)
         
         orders = Order.query.filter_by(
             user_id=user_id).order_by(
@@ -67,7 +69,7 @@ def order_details(order_id):
     try:
         order = Order.query.get_or_404(order_id)
         user = current_user
-        if order.user_id is user.id or user.is_admin():
+        if order.user_id == user.id or user.is_admin():
             return success_response(f"Order <{order_id}> fetched successfully", data=order.get_summary(include_order_items=True))
         else:
             return error_response('Access denied, this does not belong to you', status_code=401)
@@ -196,7 +198,7 @@ def create_order():
 
         # Validate the incoming data against the order schema
         try:
-            validate(instance=data, schema=order_schema)
+            schemas.validate(data, order_schema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}", 400)
 
@@ -210,42 +212,25 @@ def create_order():
         if address_id is not None:
             # Check if the address belongs to the user or if the user is an admin
             address = Address.query.filter_by(id=address_id).first()
-            if address is None or (address.user_id is not None and address.user_id != user_id and not user.is_admin):
+            if address is None or (address.user_id is not None and address.user_id != user_id and not (user and user.is_admin())):
                 return error_response('Permission Denied: Invalid address', 403)
         else:
             # Create a new address if none is provided
             address = create_address(address_data, user)
 
         # Create the order
-        order = Order(order_status=0, tracking_number=fake.uuid4(), address_id=address.id)
+        order = Order(order_status=0, tracking_number=fake.uuid4(), address_id=address.id, user_id=user_id)
 
         # Validate cart items
-        product_ids = [ci['product_id'] for ci in cart_items]  # Updated key
-        products = db.session.query(Product).filter(Product.id.in_(product_ids)).all()
-
-        if len(products) != len(cart_items):
+        order_items = build_order_items(order, cart_items, user)
+        if order_items is None:
             return error_response('Error: Some products are unavailable', 400)
-
-        # Add items to the order
-        for index, product in enumerate(products):
-            order.order_items.append(
-                OrderItem(
-                    name=product.name,
-                    slug=product.slug,
-                    user_id=user_id,
-                    price=product.price,
-                    order_id=order.id, 
-                    product_id=product.id, 
-                    quantity=cart_items[index]['quantity'],  # No change needed here
-                    order=order,
-                    user=user,
-                    product=product,
-                )   
-            )
+        order.order_items.extend(order_items)
 
         # Commit the order to the database
         db.session.add(order)
         db.session.commit()
+        queue_document('order', order.id)  # invoice renders in the background
 
         return success_response('Order created successfully', data=order.get_summary(include_order_items=True))
 
@@ -253,6 +238,37 @@ def create_order():
         db.session.rollback()  # Rollback in case of error
         return error_response(f"An error occurred: {str(e)}", 500)
 
+def build_order_items(order, cart_items, user):
+    """
+    One OrderItem per product of `cart_items`, matched by product id (the IN query
+    comes back in no particular order), quantities of repeated lines added up.
+
+    Returns:
+        list: the items, None when a product doesn't exist.
+    """
+    quantities = {}
+    for ci in cart_items:
+        quantities[ci['product_id']] = quantities.get(ci['product_id'], 0) + ci['quantity']
+    products = db.session.query(Product).filter(Product.id.in_(quantities)).all()
+    if len(products) != len(quantities):
+        return None
+
+    return [
+        OrderItem(
+            name=product.name,
+            slug=product.slug,
+            user_id=user.id if user else None,
+            price=product.price,
+            order_id=order.id,
+            product_id=product.id,
+            quantity=quantities[product.id],
+            order=order,
+            user=user,
+            product=product,
+        )
+        for product in products
+    ]
+
 def create_address(data, user):
     first_name = data.get('first_name', None)
     last_name = data.get('last_name', None)
@@ -286,7 +302,7 @@ def create_address(data, user):
     return address
 
 @order_bp.route('/orders/<int:order_id>', methods=['PUT'])
-@jwt_required(optional=True)
+@jwt_required()
 @limiter.exempt
 def update_order(order_id):
     try:
@@ -300,7 +316,7 @@ def update_order(order_id):
 
         # Validate incoming data against the order schema
         try:
-            validate(instance=data, schema=order_schema)
+            schemas.validate(data, order_schema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}", 400)
 
@@ -308,28 +324,29 @@ def update_order(order_id):
         order = Order.query.get_or_404(order_id)
 
         # Check if the user is authorized to update the order
-        if order.user_id != user.id and not user.is_admin:
+        if order.user_id != user.id and not user.is_admin():
             return error_response('Permission Denied: You cannot update this order', 403)
 
-        # Update order fields as necessary
+        # Update order fields as necessary, the status is moved along by admins only
         if 'order_status' in data:
+            if not user.is_admin():
+                return error_response('Permission Denied: You cannot change the order status', 403)
+            if data['order_status'] not in range(len(ORDER_STATUS)):
+                return error_response(f"order_status must be an index of {ORDER_STATUS}", 400)
             order.order_status = data['order_status']
 
         if 'address_id' in data:
             # Validate the address
             address = Address.query.filter_by(id=data['address_id']).first()
-            if address is None or (address.user_id is not None and address.user_id != user.id and not user.is_admin):
+            if address is None or (address.user_id is not None and address.user_id != user.id and not user.is_admin()):
                 return error_response('Permission Denied: Invalid address', 403)
             
             order.address_id = data['address_id']
 
         if 'cart_items' in data:
-            cart_items = data['cart_items']
-            product_ids = [ci['id'] for ci in cart_items]
-            products = db.session.query(Product).filter(Product.id.in_(product_ids)).all()
-
             # Check if all products are available
-            if len(products) != len(cart_items):
+            order_items = build_order_items(order, data['cart_items'], user)
+            if order_items is None:
                 return error_response('Error: Some products are unavailable', 400)
 
             # Clear existing order items
@@ -338,23 +355,11 @@ def update_order(order_id):
                 db.session.delete(item)  # Permanently remove from the database
 
             # Add new order items
-            for index, product in enumerate(products):
-                order_item = OrderItem(
-                    name=product.name,
-                    slug=product.slug,
-                    user_id=user.id,
-                    price=product.price,
-                    order_id=order.id,  # Ensure this is not None
-                    product_id=product.id,
-                    quantity=cart_items[index]['quantity'],
-                    order=order,
-                    user=user,
-                    product=product,
-                )
-                order.order_items.append(order_item)
+            order.order_items.extend(order_items)
 
         # Commit the changes to the database
         db.session.commit()
+        queue_document('order', order.id)  # no-op unless the invoice content changed
         return success_response('Order updated successfully', data=order.get_summary(include_order_items=True))
 
     except Exception as e:
@@ -363,7 +368,7 @@ def update_order(order_id):
         return error_response(f"An error occurred: {str(e)}", 500)
 
 @order_bp.route('/orders/<int:order_id>', methods=['DELETE'])
-@jwt_required(optional=True)
+@jwt_required()
 @limiter.exempt
 def delete_order(order_id):
     try:
@@ -374,7 +379,7 @@ def delete_order(order_id):
             return error_response('Order not found', 404)
 
         # Check if the user is allowed to delete the order
-        if order.user_id != user.id and not user.is_admin:
+        if order.user_id != user.id and not user.is_admin():
             return error_response('Permission Denied: You cannot delete this order', 403)
         
         if len(order.order_items) > 0:
@@ -2,7 +2,6 @@ from os import getenv
 from flask_jwt_extended import current_user, jwt_required
 import traceback, requests, secrets
 from flask import current_app, request, url_for
-from web.apis.models.plans import Subscription
 from web.apis.models.plans import Plan
 from web.apis.utils.serializers import error_response, success_response
 from web.apis.models.transactions import Transaction
@@ -14,6 +13,9 @@ from web.extensions import db, csrf, limiter
 from web.apis.models.users import User
 # from web.apis.models.orders import Order
 from web.apis.utils.helpers import generate_ref
+from web.apis.utils.invoices import queue_document
+from web.apis.utils.paystack import verify_transaction
+from web.tasks import verify_paystack
 # from web.apis.transactions import save_transaction, transact_bp
 from web.apis import api_bp as transact_bp
 
@@ -84,7 +86,7 @@ def initiate_paystack(plan_id):
         if not user:
             # return error_response("Not user")
             user = User(username=email.split('@')[0], email=email, is_guest=True)
-            user.set_password(generate_ref())
+            user.set_unusable_password()  # guest checkout, nothing to hash
             db.session.add(user)
             db.session.commit()
 
@@ -129,90 +131,28 @@ def initiate_paystack(plan_id):
 def callback_paystack():
     try:
         reference = request.args.get('reference') or request.args.get('trxref')
-        transaction = Transaction.get_transaction(reference)
+        try:
+            outcome, response_data = verify_transaction(reference)
+        except (ConnectionError, Timeout):
+            # paystack unreachable, the worker keeps retrying with backoff
+            verify_paystack.apply_async(args=(reference,), countdown=30)
+            return success_response('Payment received, verification is pending. Your plan will be activated shortly.', status_code=202)
 
-        if not transaction:
-            return error_response('Transaction not found', status_code=404)
+        if outcome in ('updated', 'activated'):
+            queue_document('transaction', Transaction.get_transaction(reference).id)  # receipt renders in the background
 
-        if transaction.status == "success" or transaction.status == "successful":
+        if outcome == 'already':
             return success_response('Transaction verified and subscription activated already.')
-        
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {current_app.config['PAYSTACK_SK']}",
-            # "Authorization": f"Bearer {PAYSTACK_SK}",
-            "Content-Type": "application/json"
-        }
-
-        verify_endpoint = f"https://api.paystack.co/transaction/verify/{reference}"
-        response = requests.get(verify_endpoint, headers=headers)
-
-        if response.status_code == 200:
-            """
-            response_data = response.json().get('data', {})
-            if (
-                response_data.get('status') == "success"
-                and response_data.get('amount') >= transaction.amount * 100  # Amount in kobo
-                and response_data.get('currency') == transaction.currency
-            ):
-                transaction.status = response_data['status']
-
-                # Create subscription upon successful payment
-                subscription = Subscription(
-                    user_id=transaction.user_id,
-                    plan_id=response_data['metadata']['plan_id'],
-                    total_units=Plan.query.get(response_data['metadata']['plan_id']).units,
-                    status='active'
-                )
-                
-                db.session.add(subscription)
-                db.session.commit()
-
-                return success_response('Transaction verified and subscription activated.', data=response_data)
-                """
-            response_data = response.json().get('data', {})
-            if (
-                response_data.get('status') == "success"
-                and response_data.get('amount') >= transaction.amount * 100  # Amount in kobo
-                and response_data.get('currency') == transaction.currency
-            ):
-                transaction.status = response_data['status']
-
-                # Check for existing active subscription
-                existing_subscription = Subscription.query.filter_by(user_id=transaction.user_id).first()
-                units = Plan.query.get(response_data['metadata']['plan_id']).units
-                
-                if existing_subscription:
-                    # Update existing subscription plan and add new units
-                    existing_subscription.plan_id = response_data['metadata']['plan_id']
-                    new_units = units
-                    
-                    # Increment total units
-                    existing_subscription.total_units += new_units
-                    
-                    db.session.commit()
-
-                    return success_response('Transaction verified and existing subscription updated with new plan and units.', data=response_data)
-                else:
-                    # Create new subscription upon successful payment
-                    subscription = Subscription(
-                        user_id=transaction.user_id,
-                        plan_id=response_data['metadata']['plan_id'],
-                        total_units=units,
-                        status='active'
-                    )
-                    
-                    db.session.add(subscription)
-                    db.session.commit()
-
-                    return success_response('Transaction verified and subscription activated.', data=response_data)
-
-            else:
-                transaction.status = response_data['status']
-                db.session.commit()
-                return error_response(f'Transaction verification failed.')
-        else:
-            return error_response('Failed to verify transaction')
+        if outcome == 'updated':
+            return success_response('Transaction verified and existing subscription updated with new plan and units.', data=response_data)
+        if outcome == 'activated':
+            return success_response('Transaction verified and subscription activated.', data=response_data)
+        if outcome == 'failed':
+            return error_response(f'Transaction verification failed.')
+        return error_response('Failed to verify transaction')
+
+    except ValueError as e:
+        return error_response(str(e), status_code=404)
 
     except Exception as e:
         db.session.rollback()
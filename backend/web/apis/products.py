@@ -2,9 +2,8 @@ import os
 from pathlib import Path
 import re
 import traceback
-from flask import current_app as app, request
+from flask import current_app as app, g, request
 from flask_jwt_extended import jwt_required, current_user
-from jsonschema import ValidationError, validate
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import desc, exc, func
 from werkzeug.utils import secure_filename
@@ -18,18 +17,35 @@ from web.apis.models.products import Product
 from web.apis.schemas.product import product_schema
 from web.apis.utils.get_or_create import get_or_create
 from web.apis.utils.helpers import validate_file_upload
-from web.apis.utils.serializers import PageSerializer, error_response, success_response
+from web.apis.utils.serializers import PageSerializer, PrefetchedPagination, error_response, success_response
+from web.apis.utils.replicas import use_replica
+from web.apis.utils.rate_limit import cost_limited
+from web.apis.utils.favorites import viewer_favorites
+from web.apis.utils.rankings import RANKINGS, ranked_ids, unrank
+from web.apis.utils.validation import validated_body
 from web.apis import api_bp as product_bp
 
+# missing price/stock/is_deleted fall back to these before validation
+PRODUCT_DEFAULTS = {'price': 0, 'stock': 0, 'is_deleted': False}
+
+def _truncate(value):
+    """A json float price/stock is cut to an int like the handlers always did, not refused as a non integer."""
+    return int(value) if isinstance(value, float) else value
+
+PRODUCT_CASTS = {'price': _truncate, 'stock': _truncate}
+
 @product_bp.route('/products', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@use_replica
 def products():
     """
     Retrieve a paginated list of products.
 
     Returns a list of products, paginated by the specified page and page size.
     If no products are found, an empty list is returned.
+    `?sort=bestselling|trending|rating` lists ranked products only, best first,
+    newest first otherwise (and until the rankings are first built).
 
     :return: JSON response with paginated product data.
     """
@@ -44,6 +60,10 @@ def products():
         category_id = request.args.get('category_id', type=int)
         category_name = request.args.get('category')
 
+        sort = request.args.get('sort')
+        if sort and sort not in RANKINGS:
+            return error_response(f"sort must be one of {', '.join(RANKINGS)}", status_code=400)
+
         query = Product.query
 
         if category_id:
@@ -51,14 +71,36 @@ def products():
         elif category_name:
             query = query.join(products_categories).join(Category).filter(Category.name.ilike(f"%{category_name}%"))
 
-        products = query.order_by(desc(Product.created_at)).paginate(page=page, per_page=page_size)
+        ranked = None
+        if sort:
+            # Ranked listing, page order comes from the precomputed ranking (see utils/rankings.py)
+            page, page_size = max(page, 1), max(page_size, 1)
+            allowed_ids = None
+            if category_id or category_name:
+                allowed_ids = set(db.session.scalars(query.with_entities(Product.id)))
+            ranked = ranked_ids(sort, page=page, page_size=page_size, allowed_ids=allowed_ids)
+
+        if ranked is not None:
+            ranked, total = ranked
+            by_id = {product.id: product for product in Product.query.filter(Product.id.in_([pid for pid, _ in ranked]))}
+            items = [by_id[pid] for pid, _ in ranked if pid in by_id]
+            products = PrefetchedPagination(items=items, total=total, page=page, per_page=page_size)
+        else:
+            # unsorted, or the ranking isn't built yet
+            products = query.order_by(desc(Product.created_at)).paginate(page=page, per_page=page_size)
         #
         
         # Fetch products with pagination
         # products = Product.query.order_by(desc(Product.created_at)).paginate(page=page, per_page=page_size)
 
+        # Mark what the viewer has favorited, one lookup for the whole page
+        is_favorite = viewer_favorites(current_user, [product.id for product in products.items])
+
         # Serialize the paginated result using PageSerializer
-        data = PageSerializer(pagination_obj=products, resource_name="products").get_data()
+        data = PageSerializer(
+            pagination_obj=products, resource_name="products",
+            summary_func=lambda product, **kw: {**product.get_summary(**kw), 'is_favorite': is_favorite[product.id]}
+        ).get_data()
         
         return success_response("Products fetched successfully.", data=data)
 
@@ -93,6 +135,7 @@ def products():
 @product_bp.route('/products/<product_id>', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@use_replica
 def by_id(product_id):
     """
     Retrieve a product by its ID.
@@ -113,6 +156,7 @@ def by_id(product_id):
 
 @product_bp.route('/products/by-categories', methods=['GET'])
 @limiter.exempt
+@use_replica
 def get_products_by_categories():
     """
     Fetch products organized by categories and subcategories.
@@ -184,6 +228,7 @@ def get_products_by_categories():
 @product_bp.route('/products/<product_slug>/slug', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@use_replica
 def by_slug(product_slug):
     """
     Retrieve a product by its slug.
@@ -235,6 +280,7 @@ def by_user(user_id):
 @product_bp.route('/products/<page_id>/page', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
+@use_replica
 def by_page(page_id):
     """
     Fetch products associated with a specific page.
@@ -261,6 +307,7 @@ def by_page(page_id):
 
 @product_bp.route('/products/<int:category_id>/category', methods=['GET'])
 @jwt_required()
+@use_replica
 def by_category(category_id):
     """
     Fetch products associated with a specific category.
@@ -414,35 +461,19 @@ def by_category(category_id):
 
 @product_bp.route('/products', methods=['POST'])
 @jwt_required()
+@validated_body(product_schema, defaults=PRODUCT_DEFAULTS, casts=PRODUCT_CASTS, empty_message="No data received to publish your product.")
+@cost_limited(5)  # image uploads
 def create():
     """
     Create a new product.
 
     Accepts product data in JSON or multipart/form-data format and saves it to the database.
+    The body is parsed, coerced (price/stock to int, is_deleted to bool) and validated by `validated_body`.
 
     :return: JSON response indicating success or failure.
     """
     try:
-        # Parse request data based on content type
-        if request.content_type == 'application/json':
-            data = request.get_json()
-        elif 'multipart/form-data' in request.content_type:
-            data = request.form.to_dict()
-        else:
-            return error_response("Content-Type must be application/json or multipart/form-data", status_code=400)
-        
-        if not data:
-            return error_response("No data received to publish your product.", status_code=400)
-
-        # Validate and process product data
-        try:
-            data['price'] = int(data.get('price', 0))  # Default to 0 if 'price' is missing
-            data['stock'] = int(data.get('stock', 0))  # Default to 0 if 'stock' is missing
-            data['is_deleted'] = bool(data.get('is_deleted', False))  # Default to False if 'is_deleted' is missing
-            validate(instance=data, schema=product_schema)
-        except ValidationError as e:
-            traceback.print_exc()
-            return error_response(f"Validation error: {e.message}", status_code=400)
+        data = g.validated_body
 
         # Retrieve product details from the request
         product_name = data.get('name')
@@ -677,37 +708,20 @@ def delete_media(pro_id, img_id):
 @product_bp.route('/products/<product_slug>', methods=['PUT'])
 @jwt_required()
 @limiter.exempt
+@validated_body(product_schema, defaults=PRODUCT_DEFAULTS, casts=PRODUCT_CASTS, empty_message="No data received to update your product.")
+@cost_limited(5)
 def update(product_slug):
     """
     Update an existing product.
 
     Accepts product data in JSON or multipart/form-data format and updates the product in the database.
+    The body is parsed, coerced and validated by `validated_body`.
 
     :param product_slug: The slug of the product to update.
     :return: JSON response indicating success or failure.
     """
     try:
-        if request.content_type == 'application/json':
-            data = request.get_json()
-        elif 'multipart/form-data' in request.content_type:
-            data = request.form.to_dict()
-        else:
-            return error_response("Content-Type must be application/json or multipart/form-data")
-        
-        if not data:
-            return error_response("No data received to update your product.")
-
-        print(data, request.files)
-        
-        # Validate product data
-        try:
-            data['price'] = int(data.get('price', 0))  # Default to 0 if 'price' is missing
-            data['stock'] = int(data.get('stock', 0))  # Default to 0 if 'stock' is missing
-            data['is_deleted'] = bool(data.get('is_deleted', False))  # Default to False if 'is_deleted' is missing
-            validate(instance=data, schema=product_schema)
-        except ValidationError as e:
-            traceback.print_exc()
-            return error_response(f"Validation error: {e.message}")
+        data = g.validated_body
 
         product = Product.get_product(product_slug)
         if product is None:
@@ -911,6 +925,7 @@ def destroy(identifier):
         # Delete the product and commit the transaction
         db.session.delete(product)
         db.session.commit()
+        unrank(product.id)
         return success_response('Product deleted successfully')
     
     except Exception as e:
@@ -0,0 +1,119 @@
+import traceback
+from flask import request
+from flask_jwt_extended import jwt_required
+from web.apis.utils.decorators import access_required
+from web.apis.utils.reports import (
+    INTERVALS, ReportRefreshRunning, category_report, freshness, parse_range,
+    product_report, refresh_reports, sales_report, usage_report
+)
+from web.apis.utils.serializers import error_response, success_response
+from web.apis.utils.rate_limit import cost_limited
+from web.extensions import limiter
+from web.apis import api_bp as report_bp
+
+# All reports read the daily rollups (models/reports.py), refreshed by `flask reports refresh`.
+
+def _report_args():
+    """start, end, interval from the query string, raises ValueError on bad input."""
+    start, end = parse_range(request.args)
+    interval = request.args.get('interval', 'day')
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    return start, end, interval
+
+def _order_args(default_limit):
+    order_by = request.args.get('order_by', 'revenue')
+    if order_by not in ('revenue', 'units'):
+        raise ValueError("order_by must be revenue or units")
+    return order_by, min(request.args.get('limit', default_limit, type=int), 200)
+
+def _report_response(message, start, end, data):
+    return success_response(message, data={
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'as_of': freshness(),
+        **data,
+    })
+
+@report_bp.route('/reports/sales', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+@limiter.exempt
+def sales_summary():
+    """Orders, items sold and revenue per day/week/month. `?start=&end=` (YYYY-MM-DD), `?interval=`"""
+    try:
+        start, end, interval = _report_args()
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+    try:
+        return _report_response("Sales report", start, end, {'interval': interval, **sales_report(start, end, interval)})
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error building sales report: {str(e)}")
+
+@report_bp.route('/reports/products', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+@limiter.exempt
+def product_sales():
+    """Best products in the range. `?order_by=revenue|units`, `?limit=`"""
+    try:
+        start, end, _ = _report_args()
+        order_by, limit = _order_args(20)
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+    try:
+        products = product_report(start, end, order_by=order_by, limit=limit)
+        return _report_response("Product sales report", start, end, {'order_by': order_by, 'products': products})
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error building product report: {str(e)}")
+
+@report_bp.route('/reports/categories', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+@limiter.exempt
+def category_sales():
+    """Revenue and units per category, a product in several categories counts in each."""
+    try:
+        start, end, _ = _report_args()
+        order_by, limit = _order_args(50)
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+    try:
+        categories = category_report(start, end, order_by=order_by, limit=limit)
+        return _report_response("Category sales report", start, end, {'order_by': order_by, 'categories': categories})
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error building category report: {str(e)}")
+
+@report_bp.route('/reports/usage', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+@limiter.exempt
+def usage_summary():
+    """Subscription units consumed per period and per plan. `?plan_id=` narrows to one plan."""
+    try:
+        start, end, interval = _report_args()
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+    try:
+        data = usage_report(start, end, interval, plan_id=request.args.get('plan_id', type=int))
+        return _report_response("Usage report", start, end, {'interval': interval, **data})
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error building usage report: {str(e)}")
+
+@report_bp.route('/reports/refresh', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
+@cost_limited(20)
+def refresh_report_rollups():
+    """Fold in orders and usage recorded since the last refresh."""
+    try:
+        return success_response("Reports refreshed", data={'folded': refresh_reports(), 'as_of': freshness()})
+    except ReportRefreshRunning as e:
+        return error_response(str(e), status_code=409)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Error refreshing reports: {str(e)}")
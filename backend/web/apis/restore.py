@@ -0,0 +1,70 @@
+import traceback
+from flask import request
+from flask_jwt_extended import jwt_required
+from web.apis.models.categories import Category
+from web.apis.models.comments import Comment
+from web.apis.models.pages import Page
+from web.apis.models.products import Product
+from web.apis.models.services import Area, Service, ServiceCategory, ServiceRequest
+from web.apis.models.tags import Tag
+from web.apis.utils.decorators import access_required
+from web.apis.utils.serializers import PageSerializer, error_response, success_response
+from web.extensions import db
+from web.apis import api_bp as restore_bp
+
+# Soft deleted rows are hidden from every ORM query (web/apis/models/soft_delete.py),
+# the routes that look a row up by id 404 on them. These read them back for admins.
+RESTORABLE = {
+    'products': Product,
+    'categories': Category,
+    'tags': Tag,
+    'comments': Comment,
+    'pages': Page,
+    'service-categories': ServiceCategory,
+    'services': Service,
+    'service-requests': ServiceRequest,
+    'areas': Area,
+}
+
+@restore_bp.route('/deleted/<resource>', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+def deleted_items(resource):
+    """Soft deleted rows of `resource` (a RESTORABLE key), most recently changed first."""
+    model = RESTORABLE.get(resource)
+    if model is None:
+        return error_response(f"resource must be one of {', '.join(RESTORABLE)}", status_code=404)
+    try:
+        page = request.args.get('page', 1, type=int)
+        page_size = min(request.args.get('page_size', 20, type=int), 100)
+        items = model.query.execution_options(include_deleted=True).filter(model.is_deleted == True) \
+            .order_by(model.updated_at.desc(), model.id.desc()) \
+            .paginate(page=page, per_page=page_size, error_out=False)
+        data = PageSerializer(pagination_obj=items, resource_name=resource).get_data()
+        return success_response(f"Deleted {resource} fetched successfully", data=data)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(str(e))
+
+@restore_bp.route('/deleted/<resource>/<int:item_id>/restore', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
+def restore_item(resource, item_id):
+    """Bring a soft deleted row back, it shows up in listings and lookups again."""
+    model = RESTORABLE.get(resource)
+    if model is None:
+        return error_response(f"resource must be one of {', '.join(RESTORABLE)}", status_code=404)
+    try:
+        item = model.query.execution_options(include_deleted=True).filter(model.id == item_id).first()
+        if item is None:
+            return error_response(f"{resource} <{item_id}> not found", status_code=404)
+        if not item.is_deleted:
+            return error_response(f"{resource} <{item_id}> isn't deleted", status_code=409)
+
+        item.is_deleted = False
+        db.session.commit()
+        return success_response(f"{resource} <{item_id}> restored", data=item.get_summary())
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        return error_response(str(e))
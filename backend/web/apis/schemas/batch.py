@@ -0,0 +1,20 @@
+MAX_BATCH_REQUESTS = 10
+
+batch_schema = {
+  "$schema": "http://json-schema.org/draft-07/schema#",
+  "type": "object",
+  "properties": {
+    "requests": {
+      "type": "object",
+      "description": "Name of each sub-request -> the API path to GET, query string included",
+      "minProperties": 1,
+      "maxProperties": MAX_BATCH_REQUESTS,
+      "additionalProperties": {
+        "type": "string",
+        "pattern": "^/"
+      }
+    }
+  },
+  "required": ["requests"],
+  "additionalProperties": False
+}
@@ -1,23 +1,37 @@
+import traceback
 from flask import request
 from flask_jwt_extended import jwt_required, current_user
 from sqlalchemy.exc import IntegrityError
 from web.apis.utils.decorators import access_required
-from web.apis.models.services import Area, Service, ServiceCategory, ServiceRequest
+from web.apis.models.services import Area, DispatchBatch, Service, ServiceCategory, ServiceRequest
+from web.apis.utils.dispatch import (
+    PENDING, REQUEST_STATUSES, DispatchError, area_queues, batch_requests, claim_batch, close_batch
+)
 from web.extensions import db, limiter
 from web.apis.utils.serializers import success_response, error_response, PageSerializer
+from web.apis.utils.service_catalog import CATALOG_MAX_AGE, QuoteError, catalog_snapshot, quote, seed_catalog
+from web.apis.utils.snapshots import cacheable, make_etag, not_modified, not_modified_response
 from web.apis import api_bp as categories_bp
 
+def _catalog_listing(key, resource_name, message):
+    """A whole catalog table from the snapshot (utils/service_catalog.py), with an etag."""
+    try:
+        catalog, version = catalog_snapshot.get()
+        etag = make_etag(key, version)
+        if not_modified(etag):
+            return not_modified_response(etag, max_age=CATALOG_MAX_AGE)
+        data = PageSerializer(items=catalog[key], resource_name=resource_name, summary_func=lambda item: item).get_data()
+        return cacheable(success_response(message, data=data), etag, max_age=CATALOG_MAX_AGE)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(str(e))
+
 # Get all service categories
 @categories_bp.route('/service-categories', methods=['GET'])
 @jwt_required(optional=True)
 @limiter.exempt
 def get_service_categories():
-    try:
-        categories = ServiceCategory.query.filter_by(is_deleted=False).all()
-        categories = PageSerializer(items=categories, resource_name="service_categories").get_data()
-        return success_response("Service categories fetched successfully", data=categories)
-    except Exception as e:
-        return error_response(str(e))
+    return _catalog_listing('categories', "service_categories", "Service categories fetched successfully")
 
 # Create a new service category
 @categories_bp.route('/service-categories', methods=['POST'])
@@ -90,13 +104,30 @@ from web.apis import api_bp as services_bp
 @jwt_required(optional=True)
 @limiter.exempt
 def get_services():
+    return _catalog_listing('services', "services", "Services fetched successfully")
+
+# Price of a service request, from the in-memory catalog
+@services_bp.route('/services/quote', methods=['GET'])
+@limiter.exempt
+def quote_service_request():
+    """`?service_id=&area_id=&quantity=`, the area's price per item times the quantity."""
     try:
-        services = Service.query.filter_by(is_deleted=False).all()
-        services = PageSerializer(items=services, resource_name="services").get_data()
-        return success_response("Services fetched successfully", data=services)
+        data, version = quote(
+            request.args.get('service_id', type=int),
+            request.args.get('area_id', type=int),
+            request.args.get('quantity', type=int),
+        )
+    except QuoteError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
+        traceback.print_exc()
         return error_response(str(e))
 
+    etag = make_etag('quote', version, data['service_id'], data['area_id'], data['quantity'])
+    if not_modified(etag):
+        return not_modified_response(etag, max_age=CATALOG_MAX_AGE)
+    return cacheable(success_response("Quote", data=data), etag, max_age=CATALOG_MAX_AGE)
+
 # Create a new service
 @services_bp.route('/services', methods=['POST'])
 @jwt_required()
@@ -170,145 +201,110 @@ def delete_service(service_id):
     except Exception as e:
         return error_response(str(e))
 
-# 
-# INSERT SERVICES DIRECTLY
-@services_bp.route('/insert-services', methods=['GET'])
-# @jwt_required(optional=True)
-# @access_required('admin', 'dev')
-@limiter.exempt
+# Insert the initial catalog, same as `flask catalog seed`
+@services_bp.route('/insert-services', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
 def populate_services():
     try:
-        laundry_category = ServiceCategory(name='Laundry')
-        fashion_category = ServiceCategory(name='Fashion')
-
-        laundry_services = [
-            {
-                'name': 'Dry Cleaning',
-                'image': './static/img/laundry/services/dry-cleaning.png',
-                'description': 'Professional dry cleaning service.',
-                'link': './laundry',
-                'icon': None
-            },
-            {
-                'name': 'Stain Removal',
-                'image': './static/img/laundry/services/stain-remover.png',
-                'description': 'Remove tough stains from your clothes.',
-                'link': './laundry',
-                'icon': None
-            },
-            {
-                'name': 'Iron Only',
-                'image': './static/img/laundry/services/ironing.png',
-                'description': 'Ironing service for your clothes.',
-                'link': './laundry',
-                'icon': 'fi-dresser'
-            },
-            {
-                'name': 'Wash & Iron',
-                'image': './static/img/laundry/services/iron-board.png',
-                'description': 'Wash and ironing services combined.',
-                'link': './laundry',
-                'icon': 'fi-package'
-            },
-            {
-                'name': 'Volume Subscription (Enjoy-discount)',
-                'image': './static/img/laundry/services/transaction.png',
-                'description': 'Get a discount with volume subscriptions.',
-                'link': './laundry',
-                'icon': 'fi-gift'
-            },
-            {
-                'name': 'Adjustment & Alterations',
-                'image': './static/img/laundry/services/sewing-machine.png',
-                'description': 'Alterations and adjustments for your clothes.',
-                'link': './laundry',
-                'icon': 'fi-scissors'
-            },
-            {
-                'name': 'Pick-up & Delivery',
-                'image': './static/img/laundry/services/pickup.png',
-                'description': 'Convenient pick-up and delivery service.',
-                'link': './laundry',
-                'icon': 'fi-bicycle'
-            }
-        ]
-
-        fashion_services = [
-            {
-                "name": "Men's Ankaras",
-                'image': './static/img/fashion/02.jpg',
-                "description": "Stylish men's Ankaras.",
-                "link": "./fashion",
-                "icon": None
-            },
-            {
-                "name": "Women Ankaras",
-                'image': './static/img/fashion/services/women_native.jpg',
-                "description": "Elegant women's Ankaras.",
-                "link": "./fashion",
-                "icon": None
-            },
-            {
-                "name": "Children Natives",
-                'image': './static/img/fashion/03.jpg',
-                "description": "Traditional outfits for children.",
-                "link": "./fashion",
-                "icon": None
-            },
-            {
-                "name": "Men's Native Clothes",
-                'image': './static/img/fashion/02.jpg',
-                "description": "Classic men's native attire.",
-                "link": "./fashion",
-                "icon": None
-            }
-        ]
-
-        # Add laundry services
-        for service in laundry_services:
-            new_service = Service(
-                name=service['name'],
-                image=service['image'],
-                description=service['description'],
-                link=service['link'],
-                icon=service['icon'],
-                category=laundry_category  # Reference the committed category
-            )
-            db.session.add(new_service)
-
-        # Add fashion services
-        for service in fashion_services:
-            new_service = Service(
-                name=service['name'],
-                image=service['image'],
-                description=service['description'],
-                link=service['link'],
-                icon=service['icon'],
-                category=fashion_category  # Reference the committed category
-            )
-            db.session.add(new_service)
-
-        db.session.commit()  # Commit all services at once
-
-        return success_response(None, "Services populated successfully")
-
+        return success_response("Services populated successfully", data={'added': seed_catalog()})
     except Exception as e:
+        db.session.rollback()
         return error_response(str(e))
 
 
 # ++++++++++++++++++++++++++ SERVICE REQUESTS +++++++++++++++++++
 from web.apis import api_bp as requests_bp
 
-# Get all service requests
+# Get service requests, paginated, oldest first
 @requests_bp.route('/service-requests', methods=['GET'])
-@jwt_required(optional=True)
+@jwt_required()
+@access_required('admin', 'dev')
 @limiter.exempt
 def get_service_requests():
+    """
+    `?status=` (Pending, Claimed, Completed, Cancelled), `?area_id=`, `?page=`, `?page_size=`.
+    The whole list as NDJSON/CSV: /exports/service_requests?area_id=&status=
+    """
+    status = request.args.get('status')
+    if status and status not in REQUEST_STATUSES:
+        return error_response(f"status must be one of {', '.join(REQUEST_STATUSES)}", status_code=400)
     try:
-        requests = ServiceRequest.query.filter_by(is_deleted=False).all()
-        requests = PageSerializer(items=requests, resource_name="service_requests").get_data()
+        page = request.args.get('page', 1, type=int)
+        page_size = min(request.args.get('page_size', 20, type=int), 100)
+
+        query = ServiceRequest.query
+        if status:
+            query = query.filter(ServiceRequest.status == status)
+        area_id = request.args.get('area_id', type=int)
+        if area_id:
+            query = query.filter(ServiceRequest.area_id == area_id)
+
+        requests = query.order_by(ServiceRequest.created_at, ServiceRequest.id).paginate(page=page, per_page=page_size, error_out=False)
+        requests = PageSerializer(pagination_obj=requests, resource_name="service_requests").get_data()
         return success_response("Service requests fetched successfully", data=requests)
     except Exception as e:
+        traceback.print_exc()
+        return error_response(str(e))
+
+# Queue length per area, to pick where the next pickup round goes
+@requests_bp.route('/service-requests/areas', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+def service_request_areas():
+    status = request.args.get('status', PENDING)
+    if status not in REQUEST_STATUSES:
+        return error_response(f"status must be one of {', '.join(REQUEST_STATUSES)}", status_code=400)
+    try:
+        return success_response("Service request queues", data={'areas': area_queues(status)})
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(str(e))
+
+# Claim the oldest pending requests of an area as one batch
+@requests_bp.route('/service-requests/claim', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
+def claim_service_requests():
+    """Body (optional): {"area_id": 3, "limit": 20}. Without area_id the area waiting longest is served."""
+    data = request.get_json(silent=True) or {}
+    try:
+        batch = claim_batch(current_user.id, area_id=data.get('area_id'), limit=data.get('limit'))
+        if batch is None:
+            return success_response("No pending service requests to claim.", data=None)
+        return success_response("Service requests claimed", data=batch.get_summary(batch_requests(batch.id)), status_code=201)
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        return error_response(str(e))
+
+@requests_bp.route('/service-requests/batches/<int:batch_id>', methods=['GET'])
+@jwt_required()
+@access_required('admin', 'dev')
+def get_dispatch_batch(batch_id):
+    batch = db.session.get(DispatchBatch, batch_id)
+    if batch is None:
+        return error_response("Dispatch batch not found.", status_code=404)
+    return success_response("Dispatch batch", data=batch.get_summary(batch_requests(batch_id)))
+
+# Finish a pickup round, unfinished requests go back to the queue
+@requests_bp.route('/service-requests/batches/<int:batch_id>/close', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
+def close_dispatch_batch(batch_id):
+    """Body (optional): {"completed": [ids]}, every claimed request of the batch when left out."""
+    if db.session.get(DispatchBatch, batch_id) is None:
+        return error_response("Dispatch batch not found.", status_code=404)
+    data = request.get_json(silent=True) or {}
+    try:
+        counts = close_batch(batch_id, completed_ids=data.get('completed'))
+        return success_response("Dispatch batch closed", data={'id': batch_id, **counts})
+    except DispatchError as e:
+        db.session.rollback()
+        return error_response(str(e), status_code=409)
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
         return error_response(str(e))
 
 # Create a new service request
@@ -394,12 +390,7 @@ from web.apis import api_bp as areas_bp
 # @jwt_required(optional=True)
 @limiter.exempt
 def get_areas():
-    try:
-        areas = Area.query.filter_by(is_deleted=False).all()
-        areas = PageSerializer(items=areas, resource_name="areas").get_data()
-        return success_response("Areas fetched successfully", data=areas)
-    except Exception as e:
-        return error_response(str(e))
+    return _catalog_listing('areas', "areas", "Areas fetched successfully")
 
 # Create a new area
 @areas_bp.route('/areas', methods=['POST'])
@@ -466,53 +457,13 @@ def delete_area(area_id):
     except Exception as e:
         return error_response(str(e))
 
-# Define the areas and their prices
-AREAS_WITH_PRICES = {
-    "ajah": 2000,
-    "vgc": 4000,
-    "chevron": 3000,
-    "lekki": 4000,
-    "LBS": 10000,
-    "Sangotedo": 13000,
-    "Awoyaya": 11000,
-    "Ado Road": 0,  # Placeholder for dynamic pricing if needed
-    "Badore": 0,
-    "adesanya": 0,
-    "graceland": 0,
-    "Scheme 2": 0,
-    "ogombo": 0,
-}
-
-# Endpoint to save areas with their prices
-@areas_bp.route('/insert-areas', methods=['POST', 'GET'])
-# @jwt_required()
-@limiter.exempt
+# Endpoint to save the priced areas, same as `flask catalog seed`
+@areas_bp.route('/insert-areas', methods=['POST'])
+@jwt_required()
+@access_required('admin', 'dev')
 def save_areas():
     try:
-        # data = request.json
-        
-        # # Validate required fields
-        # required_fields = ['name', 'phone', 'email', 'quantity', 'address']
-        # if not all(field in data for field in required_fields):
-        #     return error_response("Must provide name, phone, email, quantity, and address.")
-
-        # Iterate through the predefined areas and save them
-        for area_name, price in AREAS_WITH_PRICES.items():
-            if price > 0:  # Only save areas with defined prices
-                new_area = Area(
-                    name=area_name,
-                    price=price
-                )
-                db.session.add(new_area)
-
-        db.session.commit()
-        
-        return success_response("Areas saved successfully", status_code=201)
-    
-    except IntegrityError:
-        db.session.rollback()
-        return error_response("An error occurred while saving areas.")
-    
+        return success_response("Areas saved successfully", data={'added': seed_catalog()}, status_code=201)
     except Exception as e:
         db.session.rollback()
         return error_response(str(e))
@@ -3,14 +3,18 @@ from werkzeug.utils import secure_filename
 import traceback
 from flask import app, request
 from flask_jwt_extended import jwt_required
-from sqlalchemy import desc
+import sqlalchemy as sa
+from sqlalchemy import desc, func
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import selectinload
 from web.apis.utils.helpers import validate_file_upload
-from web.apis.models.tags import Tag
+from web.apis.models.tags import Tag, products_tags
+from web.apis.models.products import Product
 from web.apis.models.file_uploads import TagImage
 from web.apis.utils.decorators import access_required
 from web.apis.utils.serializers import PageSerializer, error_response, success_response
-from web.extensions import db
+from web.apis.utils.replicas import use_replica
+from web.extensions import db, limiter
 from web.apis import api_bp as tag_bp
 
 @tag_bp.route('/tags', methods=['POST'])
@@ -76,27 +80,78 @@ def create_tag():
         traceback.print_exc()
         return error_response(f"Unexpected error: {str(e)}")
 
+def tag_product_index(tag_ids, top_n=5):
+    """
+    Product count and the newest `top_n` product ids of each tag, in one query.
+
+    Window functions count and rank each tag's live (not deleted) products in a
+    single pass over products_tags, then only the top ranked rows come back.
+
+    Returns:
+        dict: {tag_id: {'products_count': int, 'top_product_ids': [int, ...]}}
+    """
+    index = {tag_id: {'products_count': 0, 'top_product_ids': []} for tag_id in tag_ids}
+    if not tag_ids or top_n < 0:
+        return index
+
+    ranked = (
+        sa.select(
+            products_tags.c.tag_id,
+            products_tags.c.product_id,
+            func.count().over(partition_by=products_tags.c.tag_id).label('products_count'),
+            func.row_number().over(
+                partition_by=products_tags.c.tag_id, order_by=(desc(Product.created_at), desc(Product.id))
+            ).label('rank'),
+        )
+        .join(Product, Product.id == products_tags.c.product_id)
+        # explicit: the soft delete loader criteria aren't guaranteed to reach inside a subquery
+        .where(products_tags.c.tag_id.in_(tag_ids), Product.live())
+        .subquery()
+    )
+    # a tag with fewer products than top_n still has its rank 1 row, which carries the count
+    rows = db.session.execute(
+        sa.select(ranked).where(ranked.c.rank <= max(top_n, 1)).order_by(ranked.c.tag_id, ranked.c.rank)
+    )
+    for row in rows:
+        entry = index[row.tag_id]
+        entry['products_count'] = row.products_count
+        if row.rank <= top_n:
+            entry['top_product_ids'].append(row.product_id)
+    return index
+
 @tag_bp.route('/tags', methods=['GET'])
 @tag_bp.route('/tags/<int:tag_id>', methods=['GET'])
 @jwt_required()
 @access_required('admin', 'dev')
 def get_tags(tag_id=None):
+    """
+    Tag index: each tag with its product count and newest product ids (`?top=5`, at most 50).
+
+    Full products of a tag are paginated separately under /api/tags/<id>/products.
+    """
     try:
+        top_n = min(max(request.args.get('top', 5, type=int), 0), 50)
+
         if tag_id:
             tag = Tag.query.get(tag_id)
             if not tag:
                 return error_response("Tag not found.")
-            return success_response(f"Tag <{tag.name}> fetched successfully.", data=tag.get_summary())
+            data = {**tag.get_summary(), **tag_product_index([tag.id], top_n)[tag.id]}
+            return success_response(f"Tag <{tag.name}> fetched successfully.", data=data)
 
         # Pagination parameters: Default page = 1, page_size = 5
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('page_size', 5, type=int)
 
-        # Fetch tags ordered by creation date
-        tags = Tag.query.order_by(desc(Tag.created_at)).paginate(page=page, per_page=page_size)
+        # Fetch tags ordered by creation date, with their images in one extra query
+        tags = Tag.query.options(selectinload(Tag.images)).order_by(desc(Tag.created_at)).paginate(page=page, per_page=page_size)
+        index = tag_product_index([tag.id for tag in tags.items], top_n)
 
         # Serialize the paginated result using PageSerializer
-        data = PageSerializer(pagination_obj=tags, resource_name="tags", include_products=True).get_data()
+        data = PageSerializer(
+            pagination_obj=tags, resource_name="tags",
+            summary_func=lambda tag, **kw: {**tag.get_summary(), **index[tag.id]}
+        ).get_data()
 
         # Check if data is iterable
         if isinstance(data, dict):  # Assuming get_data() returns a dict
@@ -108,6 +163,36 @@ def get_tags(tag_id=None):
         traceback.print_exc()
         return error_response(f"Error fetching tags: {str(e)}")
 
+@tag_bp.route('/tags/<int:tag_id>/products', methods=['GET'])
+@jwt_required(optional=True)
+@limiter.exempt
+@use_replica
+def tag_products(tag_id):
+    """
+    Full products of a tag, paginated (newest first).
+
+    :param tag_id: The ID of the tag to list products for.
+    :return: JSON response with paginated product data for the tag.
+    """
+    try:
+        if not db.session.scalar(sa.select(Tag.id).where(Tag.id == tag_id)):
+            return error_response("Tag not found.", status_code=404)
+
+        page = request.args.get('page', 1, type=int)
+        page_size = min(request.args.get('page_size', 10, type=int), 100)
+
+        products = Product.query.join(products_tags, products_tags.c.product_id == Product.id) \
+            .filter(products_tags.c.tag_id == tag_id) \
+            .order_by(desc(Product.created_at), desc(Product.id)) \
+            .paginate(page=page, per_page=page_size, error_out=False)
+
+        data = PageSerializer(pagination_obj=products, resource_name="products", context_id=tag_id).get_data()
+        return success_response("Products fetched successfully.", data=data)
+
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"An error occurred: {str(e)}", status_code=500)
+
 @tag_bp.route('/tags/<int:tag_id>', methods=['PUT'])
 @jwt_required()
 @access_required('admin', 'dev')
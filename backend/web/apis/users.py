@@ -7,22 +7,26 @@ from requests.exceptions import ConnectionError, Timeout, RequestException
 from urllib.parse import urlencode
 # from flask_jwt_extended import jwt_optional, get_jwt_claims // deprecated
 from flask_jwt_extended import get_jwt, jwt_required, get_jwt_identity, current_user  # Instead of get_jwt_claims
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from web.apis.utils.validation import schemas
 from flask import (
     current_app, make_response, redirect, session, render_template, 
     url_for, request
 )
 
-from web.apis.utils.get_or_create import get_or_create
 from web.apis.utils.decorators import access_required
-from web.apis.utils.users import handle_reset_password, handle_verify_email
+from web.apis.utils.users import (
+    handle_reset_password, handle_verify_email, find_user_conflicts, integrity_conflicts, cached_role, forget_cached_roles
+)
 from web.extensions import db, csrf, fake, limiter
 from web.apis.utils.helpers import user_ip
-from web.apis.models.roles import Role
+from web.apis.utils.passwords import HashingBusy
 from web.apis.models.users import User
 from web.apis.utils.serializers import (
     PageSerializer, error_response, success_response
 )
+from web.apis.utils.rate_limit import cost_limited
+from web.apis.utils.subrequests import batchable
 
 from web.apis.schemas.user import (
     signin_schema, signup_schema, request_schema, reset_password_email_schema, 
@@ -42,6 +46,7 @@ load_dotenv()
 # Requests form route
 @user_bp.route('/users/message', methods=['POST'])
 @csrf.exempt
+@cost_limited(5)  # mail
 def send_message():
     try:
         
@@ -60,7 +65,7 @@ def send_message():
 
         # Validate the data against the schema
         try:
-            validate(instance=data, schema=request_schema)
+            schemas.validate(data, request_schema)
         except ValidationError as e:
             return error_response(e.message)
         
@@ -110,6 +115,7 @@ def send_message():
 @csrf.exempt
 @jwt_required(optional=True)
 @limiter.exempt
+@cost_limited(10)  # password hash
 def signup():
     user_identity = get_jwt_identity()
     if user_identity and not current_user.is_admin():
@@ -121,26 +127,20 @@ def signup():
     data = request.get_json()
 
     try:
-        validate(instance=data, schema=signup_schema)
+        schemas.validate(data, signup_schema)
     except ValidationError as e:
         return error_response(e.message)
 
     if not all(data.get(key) for key in ('username', 'phone', 'email', 'password')):
         return error_response("Must provide ('username', 'phone', 'email', 'password')")
 
-    # Check for existing user details
-    if db.session.scalar(sa.select(User).where(User.username == data['username'])):
-        return error_response("Please use a different username.")
-
-    if db.session.scalar(sa.select(User).where(User.email == data['email'])):
-        return error_response("Please use a different email address.")
-
-    if db.session.scalar(sa.select(User).where(User.phone == data['phone'])):
-        return error_response("Please use a different phone number.")
-
-    role = get_or_create(db.session, Role, {'name': "user"}, name="user")[0]
+    # Check for existing user details, all three fields in one query
+    conflicts = find_user_conflicts({key: data[key] for key in ('username', 'email', 'phone')})
+    if conflicts:
+        return error_response(next(iter(conflicts.values())), status_code=409, data={'fields': conflicts})
 
     try:
+        role = cached_role("user", description="for standard users")
         user = User(
             username=data['username'],
             email=data['email'],
@@ -163,7 +163,15 @@ def signup():
 
     except exc.IntegrityError as e:
         db.session.rollback()
+        # lost a race with another signup for the same details
+        conflicts = integrity_conflicts(e)
+        if conflicts:
+            return error_response(next(iter(conflicts.values())), status_code=409, data={'fields': conflicts})
+        forget_cached_roles()  # e.g the cached role was deleted meanwhile
         return error_response("This username or email is already taken.")
+    except HashingBusy as e:
+        db.session.rollback()
+        return error_response(str(e), status_code=503)
     except Exception as e:
         db.session.rollback()
         print(traceback.print_exc())
@@ -173,6 +181,7 @@ def signup():
 @csrf.exempt
 @limiter.exempt
 @jwt_required(optional=True)
+@cost_limited(10)  # password hash
 def signin():
     try:
         # Check if the request content type is application/json
@@ -193,7 +202,7 @@ def signin():
 
         # Validate the data against the schema
         try:
-            validate(instance=data, schema=signin_schema)
+            schemas.validate(data, signin_schema)
         except ValidationError as e:
             return error_response(e.message)
 
@@ -208,6 +217,11 @@ def signin():
 
         # If user exists and password matches
         if user and user.check_password(data['password']):
+            # hash parameters changed since this password was set, upgrade it while we have the plain text
+            if user.password_needs_rehash():
+                user.set_password(data['password'])
+                db.session.commit()
+
             access_token = user.make_token(token_type='access')
             refresh_token = user.make_token(token_type='refresh')
 
@@ -233,13 +247,15 @@ def signin():
         # If authentication failed
         return error_response("Invalid username or password.", status_code=401)
 
+    except HashingBusy as e:
+        return error_response(str(e), status_code=503)
+
     except Exception as e:
         # Log the exception for debugging
         traceback.print_exc()
         return error_response(f"Error signing in: {e}", status_code=400)
 
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from flask import make_response
 
 @user_bp.route("/users/refresh-token", methods=['POST', 'GET'])
 @limiter.exempt
@@ -315,6 +331,7 @@ def signout():
 @user_bp.route('/users/change-password', methods=['POST'])
 @jwt_required()
 @limiter.exempt
+@cost_limited(10)
 def change_password():
     """Allow authenticated users to change their password."""
     try:
@@ -361,6 +378,9 @@ def change_password():
         current_app.logger.info(f"Password changed for user {user.id}")
         return success_response("Password changed successfully")
 
+    except HashingBusy as e:
+        return error_response(str(e), status_code=503)
+
     except Exception as e:
         current_app.logger.error(f"Password change error: {str(e)}", exc_info=True)
         return error_response("An error occurred while changing password", status_code=500)
@@ -370,6 +390,7 @@ from flask_expects_json import expects_json
 @user_bp.route("users/reset-password", methods=['POST'])
 @jwt_required(optional=True)
 @expects_json()
+@cost_limited(5)  # sends an email
 def reset_password():
     try:
         # Check if the user is already authenticated (using JWT token)
@@ -383,7 +404,7 @@ def reset_password():
             return error_response('Invalid request: No JSON data provided.', status_code=400)
 
         try:
-            validate(instance=data, schema=reset_password_email_schema)
+            schemas.validate(data, reset_password_email_schema)
         except ValidationError as ve:
             return error_response(f'Validation error: {ve.message}', status_code=400)
 
@@ -439,7 +460,7 @@ def process_token(token: str = None):
 
         # Validate the incoming data against the schema
         try:
-            validate(instance=data, schema=validTokenSchema)
+            schemas.validate(data, validTokenSchema)
         except ValidationError as e:
             return error_response(f"Token validation error: {e.message}")
 
@@ -591,7 +612,7 @@ def oauth2_callback(provider):
         user = db.session.scalar(db.select(User).where(User.email == email))
         if user is None:
             user = User(email=email, username=email.split('@')[0], oauth_providers=provider)
-            user.set_password(secrets.token_urlsafe(5))
+            user.set_unusable_password()  # oauth sign-in only, until they reset it
             db.session.add(user)
             db.session.commit()
 
@@ -698,6 +719,7 @@ def get_users(user_id=None):
 @user_bp.route('/users/current', methods=['GET'])
 @jwt_required()
 @limiter.exempt
+@batchable
 def get_current_user():
     try:
         user = User.get_user(current_user.id)
@@ -711,6 +733,12 @@ def get_current_user():
         return error_response(f"An error occurred: {str(e)}", status_code=500)
 
 # V02
+UPDATE_CONFLICT_MESSAGES = {
+    'username': "Username already in use",
+    'email': "Email already in use",
+    'phone': "Phone number already in use",
+}
+
 @user_bp.route('/users/<username>', methods=['PUT', 'POST'])
 @jwt_required()
 @limiter.exempt
@@ -741,19 +769,13 @@ def update_user(username):
         if not data:
             return error_response("No data provided", status_code=400)
 
-        # Validate unique fields
-        with db.session.begin_nested():  # Use nested transaction for validation
-            if 'username' in data and data['username'] != user.username:
-                if User.query.filter_by(username=data['username']).first():
-                    return error_response("Username already in use", status_code=400)
-
-            if 'email' in data and data['email'] != user.email:
-                if User.query.filter_by(email=data['email']).first():
-                    return error_response("Email already in use", status_code=400)
-
-            if 'phone' in data and data['phone'] != user.phone:
-                if User.query.filter_by(phone=data['phone']).first():
-                    return error_response("Phone number already in use", status_code=400)
+        # Validate unique fields, only the ones that change and all in one query
+        conflicts = find_user_conflicts(
+            {field: data[field] for field in UPDATE_CONFLICT_MESSAGES if field in data and data[field] != getattr(user, field)},
+            exclude_user_id=user.id, messages=UPDATE_CONFLICT_MESSAGES
+        )
+        if conflicts:
+            return error_response(next(iter(conflicts.values())), status_code=400, data={'fields': conflicts})
 
         # Update user attributes safely
         update_fields = {
@@ -782,7 +804,15 @@ def update_user(username):
             data=user.get_summary()
         )
 
-    except SQLAlchemyError as e:
+    except exc.IntegrityError as e:
+        db.session.rollback()
+        conflicts = integrity_conflicts(e, messages=UPDATE_CONFLICT_MESSAGES)
+        if conflicts:
+            return error_response(next(iter(conflicts.values())), status_code=400, data={'fields': conflicts})
+        current_app.logger.error(f"Database error updating user {username}: {str(e)}")
+        return error_response("Database error occurred", status_code=500)
+
+    except exc.SQLAlchemyError as e:
         db.session.rollback()
         current_app.logger.error(f"Database error updating user {username}: {str(e)}")
         return error_response("Database error occurred", status_code=500)
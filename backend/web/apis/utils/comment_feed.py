@@ -0,0 +1,119 @@
+import json
+import traceback
+import sqlalchemy as sa
+from werkzeug.http import http_date
+from web.extensions import db, on_primary, redis
+from web.apis.models.comments import Comment
+from web.apis.models.users import User
+
+FEED_CACHE_TTL = 300  # seconds, a bumped version makes older pages unreachable long before this
+ALL_PRODUCTS = 'all'
+
+def _version_key(product_id=None):
+    return f"comments:feed:version:{product_id or ALL_PRODUCTS}"
+
+def _page_key(product_id, version, page, page_size):
+    return f"comments:feed:{product_id or ALL_PRODUCTS}:v{version}:{page}:{page_size}"
+
+def feed_version(product_id=None):
+    """Current cache version of a product's comment feed (or of the all-products feed)."""
+    version = redis.get(_version_key(product_id))
+    return int(version) if version else 0
+
+def bump_comment_feed(product_id=None):
+    """
+    Invalidate cached comment pages after a comment write.
+
+    Bumps both the product's feed and the all-products feed, so every page cached
+    under the previous versions stops being served and simply expires.
+    """
+    try:
+        pipe = redis.pipeline()
+        if product_id:
+            pipe.incr(_version_key(product_id))
+        pipe.incr(_version_key())
+        pipe.execute()
+    except Exception:
+        # a missed bump only means stale pages until FEED_CACHE_TTL, never a failed write
+        traceback.print_exc()
+
+def public_user_summaries(user_ids):
+    """
+    Compact public projection of users (id, name, avatar) keyed by user id, in one query.
+    """
+    if not user_ids:
+        return {}
+
+    rows = db.session.execute(
+        sa.select(User.id, User.name, User.avatar).where(User.id.in_(set(user_ids)))
+    ).all()
+    return {row.id: {'id': row.id, 'name': row.name, 'avatar': row.avatar} for row in rows}
+
+def load_comment_feed(product_id=None, page=1, page_size=5):
+    """
+    Load one page of comments with their authors in two queries.
+
+    1. the page of comments, with the total count computed by a window function
+       on the same statement instead of a separate COUNT query.
+    2. the public projection of every author on that page.
+
+    Returns:
+        tuple: (items, total) where items are plain dicts ready for PageSerializer.
+    """
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+
+    stmt = sa.select(Comment, sa.func.count().over().label('total'))
+    if product_id:
+        stmt = stmt.where(Comment.product_id == product_id)
+    stmt = stmt.order_by(sa.desc(Comment.created_at)).limit(page_size).offset((page - 1) * page_size)
+
+    rows = db.session.execute(stmt).all()
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        # past the last page the window has nothing to count over
+        count_stmt = sa.select(sa.func.count(Comment.id))
+        if product_id:
+            count_stmt = count_stmt.where(Comment.product_id == product_id)
+        total = db.session.scalar(count_stmt)
+    else:
+        total = 0
+
+    comments = [row.Comment for row in rows]
+    users = public_user_summaries([comment.user_id for comment in comments])
+
+    items = []
+    for comment in comments:
+        data = comment.get_summary()
+        data['created_at'] = http_date(comment.created_at) if comment.created_at else None
+        data['user'] = users.get(comment.user_id)
+        items.append(data)
+
+    return items, total
+
+def cached_comment_feed(product_id=None, page=1, page_size=5):
+    """
+    Same as load_comment_feed, served from redis under the feed's current version.
+
+    Comment writes call bump_comment_feed(), so a cached page is never served after
+    the comments it was built from have changed.
+    """
+    try:
+        key = _page_key(product_id, feed_version(product_id), page, page_size)
+        cached = redis.get(key)
+        if cached:
+            data = json.loads(cached)
+            return data['items'], data['total']
+    except Exception:
+        traceback.print_exc()
+        return load_comment_feed(product_id, page, page_size)
+
+    with on_primary():  # cached under the current version, a replica behind the write that bumped it would pin stale comments
+        items, total = load_comment_feed(product_id, page, page_size)
+    try:
+        redis.setex(key, FEED_CACHE_TTL, json.dumps({'items': items, 'total': total}))
+    except Exception:
+        traceback.print_exc()
+
+    return items, total
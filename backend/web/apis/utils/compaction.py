@@ -0,0 +1,155 @@
+"""
+Compaction of soft deleted rows (see web/apis/models/soft_delete.py).
+
+Rows deleted more than SOFT_DELETE_RETENTION_DAYS ago are copied to `<table>_archive`
+and removed from the live table, SOFT_DELETE_BATCH_SIZE rows per transaction, tables
+with foreign keys first so children go before their parents. For every batch:
+
+    - link rows in association tables (products_categories, ...) are dropped,
+    - rows of other soft delete tables pointing at it (a product's images, comments,
+      favorites) are archived along with it, and image files nobody else uses are
+      removed once the batch is committed,
+    - a row still referenced by anything else (an order item, a transaction) stays
+      where it is, it is retried on the next run.
+
+Runs daily on the task worker (`compact_deleted`) or by hand with `flask softdelete compact`.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlparse
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from web.extensions import db
+from web.apis.models.soft_delete import archives
+
+logger = logging.getLogger('web.compaction')
+
+def _is_link_table(table):
+    return table.name not in archives and all(column.foreign_keys for column in table.columns)
+
+def _references(table):
+    """(referencing table, its foreign key column) for every foreign key pointing at `table.id`."""
+    found = []
+    for other in db.metadata.sorted_tables:
+        for fk in other.foreign_keys:
+            if fk.column is table.c.id and not other.name.endswith('_archive'):
+                found.append((other, fk.parent))
+    return found
+
+def _archive_where(table, where):
+    """Copy the matching rows to the archive and delete them. Returns the image urls they held."""
+    archive = archives[table.name]
+    names = [column.name for column in table.columns]
+    files = []
+    if 'file_path' in table.c:
+        files = list(db.session.scalars(sa.select(table.c.file_path).where(where)))
+    db.session.execute(archive.insert().from_select(
+        names + ['archived_at'],
+        sa.select(*[table.c[name] for name in names], sa.func.now()).where(where),
+    ))
+    db.session.execute(table.delete().where(where))
+    return files
+
+def _move(table, ids):
+    files = []
+    for other, column in _references(table):
+        if other is table:
+            continue  # children of a self referencing table block their parent, see _blocked
+        if _is_link_table(other):
+            db.session.execute(other.delete().where(column.in_(ids)))
+        elif other.name in archives:
+            files += _archive_where(other, column.in_(ids))
+    files += _archive_where(table, table.c.id.in_(ids))
+    return files
+
+def _blocked(table):
+    """Rows that something outside the cascade still points at."""
+    conditions = []
+    for other, column in _references(table):
+        if other is table or (not _is_link_table(other) and other.name not in archives):
+            conditions.append(table.c.id.in_(sa.select(column).where(column.isnot(None))))
+    return sa.or_(*conditions) if conditions else sa.false()
+
+def _compact_batch(table, ids):
+    try:
+        with db.session.begin_nested():
+            files = _move(table, ids)
+        db.session.commit()
+        return len(ids), files
+    except IntegrityError:
+        # referenced from a place the cascade doesn't cover, archive the rows one by one
+        # and leave the ones that still fail
+        moved, files = 0, []
+        for row_id in ids:
+            try:
+                with db.session.begin_nested():
+                    files += _move(table, [row_id])
+                moved += 1
+            except IntegrityError:
+                logger.warning(f"{table.name} {row_id} is still referenced, kept")
+        db.session.commit()
+        return moved, files
+
+def media_file(url):
+    """Path of an uploaded file from its stored url, None when it isn't under MEDIA_LOCATION."""
+    media = current_app.config['MEDIA_LOCATION'].strip('/')
+    root = (Path(current_app.root_path) / media).resolve()
+    target = (Path(current_app.root_path) / urlparse(url).path.lstrip('/')).resolve()
+    return target if root in target.parents else None
+
+def _remove_files(urls):
+    """Remove files no remaining upload points at (the uploader reuses files with the same content)."""
+    removed = 0
+    table = db.metadata.tables['file_uploads']
+    for url in set(urls):
+        if db.session.scalar(sa.select(sa.func.count()).select_from(table).where(table.c.file_path == url)):
+            continue
+        path = media_file(url)
+        if path is not None and path.is_file():
+            path.unlink()
+            removed += 1
+    return removed
+
+def compact_table(table, cutoff, batch_size):
+    """Archive `table` rows deleted before `cutoff`. Returns (rows archived, files removed)."""
+    archived = removed = 0
+    last_id = 0
+    while True:
+        ids = list(db.session.scalars(
+            sa.select(table.c.id)
+            .where(table.c.is_deleted == True, table.c.updated_at < cutoff, table.c.id > last_id)
+            .where(sa.not_(_blocked(table)))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ))
+        if not ids:
+            return archived, removed
+        last_id = ids[-1]
+        moved, files = _compact_batch(table, ids)
+        archived += moved
+        removed += _remove_files(files)
+
+def compact(retention_days=None, batch_size=None, tables=None):
+    """
+    Archive old soft deleted rows of every soft delete table (or only `tables`).
+
+    Returns:
+        dict: {table name: {'archived': rows, 'files': files removed}}
+    """
+    config = current_app.config
+    retention_days = config['SOFT_DELETE_RETENTION_DAYS'] if retention_days is None else retention_days
+    batch_size = batch_size or config['SOFT_DELETE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    result = {}
+    for table in reversed(db.metadata.sorted_tables):  # children before parents
+        if table.name not in archives or (tables and table.name not in tables):
+            continue
+        archived, removed = compact_table(table, cutoff, batch_size)
+        result[table.name] = {'archived': archived, 'files': removed}
+        if archived:
+            logger.info(f"{table.name}: {archived} rows archived, {removed} files removed")
+    return result
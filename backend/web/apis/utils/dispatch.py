@@ -0,0 +1,158 @@
+"""
+Dispatch of service requests (laundry pickups) to operators.
+
+Pending requests form a queue per area, oldest first, served by the
+(status, area_id, created_at) index on service_requests. An operator claims a batch
+of one area at a time and works through it as one pickup round:
+
+    batch = claim_batch(operator_id, area_id=3, limit=20)  # None when the area has nothing pending
+    close_batch(batch.id, completed_ids=[...])             # the rest go back to the queue
+
+Claims select with FOR UPDATE SKIP LOCKED, so operators claiming at the same time
+skip each other's rows instead of waiting on them. SQLite has no row locks and
+ignores the clause; there the UPDATE only takes rows still 'Pending', so concurrent
+claims can't take the same request either, a late claimer just gets fewer.
+
+Batches left open longer than DISPATCH_CLAIM_TIMEOUT_MINUTES are expired and their
+requests queued again by `release_stale_batches` (a beat task).
+"""
+
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from flask import current_app
+from web.extensions import db
+from web.apis.models.services import Area, DispatchBatch, ServiceRequest
+
+PENDING, CLAIMED, COMPLETED, CANCELLED = 'Pending', 'Claimed', 'Completed', 'Cancelled'
+REQUEST_STATUSES = (PENDING, CLAIMED, COMPLETED, CANCELLED)
+MAX_BATCH_SIZE = 100
+
+class DispatchError(ValueError):
+    """Unknown batch, or a batch that is no longer open."""
+
+def _queue_order():
+    return (ServiceRequest.created_at, ServiceRequest.id)
+
+def oldest_pending_area():
+    """Area whose oldest pending request has waited longest, None when nothing is pending."""
+    return db.session.scalar(
+        sa.select(ServiceRequest.area_id).where(ServiceRequest.status == PENDING).order_by(*_queue_order()).limit(1)
+    )
+
+def claim_batch(operator_id, area_id=None, limit=None):
+    """
+    Claim up to `limit` of the oldest pending requests of an area as one batch.
+
+    Args:
+        operator_id (int): user claiming the batch.
+        area_id (int, optional): defaults to the area waiting longest.
+        limit (int, optional): DISPATCH_BATCH_SIZE by default, at most MAX_BATCH_SIZE.
+
+    Returns:
+        DispatchBatch: the new batch, None when there was nothing left to claim.
+    """
+    limit = max(1, min(limit or current_app.config['DISPATCH_BATCH_SIZE'], MAX_BATCH_SIZE))
+    if area_id is None:
+        area_id = oldest_pending_area()
+        if area_id is None:
+            return None
+
+    ids = list(db.session.scalars(
+        sa.select(ServiceRequest.id)
+        .where(ServiceRequest.status == PENDING, ServiceRequest.area_id == area_id)
+        .order_by(*_queue_order())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ))
+    if not ids:
+        db.session.rollback()
+        return None
+
+    batch = DispatchBatch(area_id=area_id, claimed_by=operator_id, status='Open')
+    db.session.add(batch)
+    db.session.flush()
+    claimed = db.session.execute(
+        sa.update(ServiceRequest)
+        .where(ServiceRequest.id.in_(ids), ServiceRequest.status == PENDING)  # the sqlite guard, see above
+        .values(status=CLAIMED, batch_id=batch.id, claimed_at=sa.func.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return batch
+
+def batch_requests(batch_id):
+    """Requests of a batch in pickup order: grouped by address, then oldest first."""
+    return list(db.session.scalars(
+        sa.select(ServiceRequest).where(ServiceRequest.batch_id == batch_id)
+        .order_by(ServiceRequest.address, *_queue_order())
+    ))
+
+def close_batch(batch_id, completed_ids=None):
+    """
+    Close an open batch. Requests in `completed_ids` (all of them when None) are
+    completed, the others go back to the queue.
+
+    Returns:
+        dict: {'completed': n, 'requeued': n}
+
+    Raises:
+        DispatchError: unknown or already closed batch.
+    """
+    batch = db.session.get(DispatchBatch, batch_id)
+    if batch is None:
+        raise DispatchError("Dispatch batch not found.")
+    if batch.status != 'Open':
+        raise DispatchError(f"Dispatch batch is {batch.status.lower()}.")
+
+    in_batch = (ServiceRequest.batch_id == batch_id, ServiceRequest.status == CLAIMED)
+    done = sa.update(ServiceRequest).where(*in_batch).values(status=COMPLETED)
+    if completed_ids is not None:
+        done = done.where(ServiceRequest.id.in_(completed_ids))
+    completed = db.session.execute(done.execution_options(synchronize_session=False)).rowcount
+    requeued = _requeue(*in_batch)
+
+    batch.status = 'Closed'
+    batch.closed_at = datetime.utcnow()
+    db.session.commit()
+    return {'completed': completed, 'requeued': requeued}
+
+def _requeue(*where):
+    return db.session.execute(
+        sa.update(ServiceRequest).where(*where)
+        .values(status=PENDING, batch_id=None, claimed_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+def release_stale_batches(timeout_minutes=None):
+    """Expire batches open for too long and queue their unfinished requests again. Returns requests requeued."""
+    timeout_minutes = timeout_minutes or current_app.config['DISPATCH_CLAIM_TIMEOUT_MINUTES']
+    cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
+    stale = list(db.session.scalars(
+        sa.select(DispatchBatch.id).where(DispatchBatch.status == 'Open', DispatchBatch.created_at < cutoff)
+    ))
+    if not stale:
+        return 0
+    requeued = _requeue(ServiceRequest.batch_id.in_(stale), ServiceRequest.status == CLAIMED)
+    db.session.execute(
+        sa.update(DispatchBatch).where(DispatchBatch.id.in_(stale), DispatchBatch.status == 'Open')
+        .values(status='Expired', closed_at=sa.func.now())
+    )
+    db.session.commit()
+    return requeued
+
+def area_queues(status=PENDING):
+    """Per area: requests in `status`, and when the oldest of them came in. Busiest areas first."""
+    rows = db.session.execute(
+        sa.select(Area.id, Area.name, sa.func.count(ServiceRequest.id), sa.func.min(ServiceRequest.created_at))
+        .join(ServiceRequest, ServiceRequest.area_id == Area.id)
+        .where(ServiceRequest.status == status)
+        .group_by(Area.id, Area.name)
+        .order_by(sa.func.count(ServiceRequest.id).desc())
+    )
+    return [
+        {'area_id': area_id, 'area': name, 'status': status, 'count': count, 'oldest': oldest}
+        for area_id, name, count, oldest in rows
+    ]
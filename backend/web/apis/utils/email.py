@@ -1,13 +1,10 @@
 from flask import current_app, render_template
-from flask_mail import Message
-from threading import Thread
-import traceback
 # from web.apis.utils.helpers import error_response, success_response
-from web.extensions import mail
+from web.tasks import send_email as send_email_task
 
 def send_email(subject, sender=None, recipients=None, text_body='', html_body=''):
     """
-    Sends an email asynchronously using Flask-Mail.
+    Queues an email, sent by the task worker using Flask-Mail.
     
     Args:
         subject (str): The subject of the email.
@@ -17,14 +14,6 @@ def send_email(subject, sender=None, recipients=None, text_body='', html_body=''
         html_body (str, optional): The HTML content of the email.
 
     """
-    def send_async_email(app, msg):
-        try:
-            with app.app_context():
-                mail.send(msg)
-                print("Success: Email sent successfully!")
-        except Exception:
-            traceback.print_exc()
-
     # Use default sender from app configuration if sender is not provided
     if sender is None:
         sender = current_app.config.get('MAIL_DEFAULT_SENDER')
@@ -36,13 +25,8 @@ def send_email(subject, sender=None, recipients=None, text_body='', html_body=''
     if not recipients:
         raise ValueError("Recipients list cannot be empty.")
 
-    # Create the email message
-    msg = Message(subject, sender=sender, recipients=recipients)
-    msg.body = text_body
-    msg.html = html_body
-
-    # Use Flask's application context in a separate thread
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+    # Queue it, the worker talks to the smtp server and retries when it is down
+    send_email_task.delay(subject, sender, list(recipients), text_body=text_body, html_body=html_body)
 
 def reset_email(user):
     token = user.make_token(token_type="reset_password")
@@ -0,0 +1,230 @@
+"""
+CSV / NDJSON exports of orders, users, transactions and service requests.
+
+Rows are selected column by column (no ORM objects) with `yield_per`, which streams
+them from a server-side cursor where the driver supports it, and are written out a
+chunk at a time. Memory stays flat whatever the table size, for a streamed response
+and for an export written to a file by the task worker alike.
+"""
+
+import csv
+import io
+import json
+import os
+import secrets
+import time
+import traceback
+from datetime import datetime, time as day_time
+import sqlalchemy as sa
+from flask import current_app
+from web.extensions import db, redis
+from web.apis.models.orders import ORDER_STATUS, Order
+from web.apis.models.services import ServiceRequest
+from web.apis.models.transactions import Transaction
+from web.apis.models.users import User
+from web.apis.utils.dispatch import REQUEST_STATUSES
+from web.tasks import build_export
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+JOB_TTL = 7 * 24 * 3600
+
+class ExportError(ValueError):
+    """Unknown dataset, format or filter value."""
+
+def _order_status(value):
+    if value not in ORDER_STATUS:
+        raise ExportError(f"status must be one of {', '.join(ORDER_STATUS)}")
+    return Order.order_status == ORDER_STATUS.index(value)
+
+USER_STATUS = {
+    'active': User.is_deleted == False,
+    'deleted': User.is_deleted == True,
+    'guest': User.is_guest == True,
+    'verified': User.valid_email == True,
+}
+
+def _user_status(value):
+    if value not in USER_STATUS:
+        raise ExportError(f"status must be one of {', '.join(USER_STATUS)}")
+    return USER_STATUS[value]
+
+def _request_status(value):
+    if value not in REQUEST_STATUSES:
+        raise ExportError(f"status must be one of {', '.join(REQUEST_STATUSES)}")
+    return ServiceRequest.status == value
+
+# dataset -> model, exported columns (never passwords), status filter, area column if it has one
+DATASETS = {
+    'orders': {
+        'model': Order,
+        'columns': (Order.id, Order.user_id, Order.order_status, Order.tracking_number, Order.address_id,
+                    Order.is_deleted, Order.created_at, Order.updated_at),
+        'status': _order_status,
+        'format_row': lambda row: {**row, 'order_status': ORDER_STATUS[row['order_status']] if row['order_status'] is not None else None},
+    },
+    'users': {
+        'model': User,
+        'columns': (User.id, User.name, User.username, User.email, User.valid_email, User.phone, User.is_guest,
+                    User.oauth_providers, User.last_seen, User.is_deleted, User.created_at),
+        'status': _user_status,
+    },
+    'transactions': {
+        'model': Transaction,
+        'columns': (Transaction.id, Transaction.user_id, Transaction.amount, Transaction.currency, Transaction.payment_method,
+                    Transaction.reference, Transaction.status, Transaction.description, Transaction.plan_id,
+                    Transaction.service_id, Transaction.created_at),
+        'status': lambda value: Transaction.status == value,
+    },
+    'service_requests': {
+        'model': ServiceRequest,
+        'columns': (ServiceRequest.id, ServiceRequest.name, ServiceRequest.phone, ServiceRequest.email,
+                    ServiceRequest.quantity, ServiceRequest.address, ServiceRequest.area_id, ServiceRequest.service_id,
+                    ServiceRequest.status, ServiceRequest.batch_id, ServiceRequest.is_deleted, ServiceRequest.created_at),
+        'status': _request_status,
+        'area': ServiceRequest.area_id,
+    },
+}
+
+def _parse_day(value, end=False):
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ExportError(f"dates must look like YYYY-MM-DD, got {value!r}")
+    return datetime.combine(day, day_time.max if end else day_time.min)
+
+def build_query(dataset, start=None, end=None, status=None, area_id=None):
+    """
+    SELECT for an export, ordered by id.
+
+    Args:
+        dataset (str): one of DATASETS.
+        start, end (str, optional): YYYY-MM-DD, inclusive, on created_at.
+        status (str, optional): dataset specific, see the `status` filters above.
+        area_id (str, optional): datasets with an `area` column only.
+
+    Raises:
+        ExportError: on an unknown dataset or a bad filter.
+    """
+    spec = DATASETS.get(dataset)
+    if spec is None:
+        raise ExportError(f"dataset must be one of {', '.join(DATASETS)}")
+    model = spec['model']
+    # deleted rows are exported too, flagged in their is_deleted column
+    stmt = sa.select(*spec['columns']).order_by(model.id).execution_options(include_deleted=True)
+    if start:
+        stmt = stmt.where(model.created_at >= _parse_day(start))
+    if end:
+        stmt = stmt.where(model.created_at <= _parse_day(end, end=True))
+    if status:
+        stmt = stmt.where(spec['status'](status))
+    if area_id:
+        if 'area' not in spec or not str(area_id).isdigit():
+            raise ExportError("area_id only applies to service_requests, as a number")
+        stmt = stmt.where(spec['area'] == int(area_id))
+    return stmt
+
+# a spreadsheet runs a cell starting with one of these as a formula (=HYPERLINK(...), =cmd|...)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"  # read as text
+    return value
+
+def iter_export(dataset, fmt='csv', chunk_rows=None, **filters):
+    """
+    Yield the export as text chunks of about `chunk_rows` rows.
+
+    Validates everything before the first chunk, so a bad request fails before a
+    response has started streaming.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of {', '.join(FORMATS)}")
+    stmt = build_query(dataset, **filters)
+    spec = DATASETS[dataset]
+    headers = [column.key for column in spec['columns']]
+    format_row = spec.get('format_row', lambda row: row)
+    chunk_rows = chunk_rows or current_app.config.get('EXPORT_CHUNK_ROWS', 1000)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(headers)
+
+        result = db.session.execute(stmt.execution_options(yield_per=chunk_rows))
+        for partition in result.partitions():
+            for values in partition:
+                row = format_row(dict(zip(headers, values)))
+                if fmt == 'csv':
+                    writer.writerow([_cell(row[key]) for key in headers])
+                else:
+                    buffer.write(json.dumps(row, default=str))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    return generate()
+
+def export_filename(dataset, fmt):
+    return f"{dataset}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+
+# background exports, state kept in a redis hash per job
+
+def _job_key(job_id):
+    return f"exports:job:{job_id}"
+
+def export_job(job_id):
+    """Job state dict (status, dataset, format, file, size, error), None when unknown or expired."""
+    job = redis.hgetall(_job_key(job_id))
+    if not job:
+        return None
+    return {key.decode(): value.decode() for key, value in job.items()}
+
+def write_export(job_id, dataset, fmt, filters):
+    """
+    Write an export to EXPORTS_LOCATION and record the outcome on the job.
+
+    The file is written under a temporary name and renamed when complete, so a
+    download never sees a partial file.
+    """
+    directory = current_app.config['EXPORTS_LOCATION']
+    filename = f"{job_id}-{export_filename(dataset, fmt)}"
+    path = os.path.join(directory, filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.part", 'w', newline='', encoding='utf-8') as out:
+            for chunk in iter_export(dataset, fmt, **filters):
+                out.write(chunk)
+        os.replace(f"{path}.part", path)
+        redis.hset(_job_key(job_id), mapping={'status': 'done', 'file': filename, 'size': os.path.getsize(path)})
+    except Exception as e:
+        traceback.print_exc()
+        redis.hset(_job_key(job_id), mapping={'status': 'failed', 'error': str(e)})
+        if os.path.exists(f"{path}.part"):
+            os.remove(f"{path}.part")
+
+def start_export_job(dataset, fmt='csv', requested_by=None, **filters):
+    """
+    Queue an export to a file on the task worker.
+
+    Returns:
+        str: job id, poll it with `export_job()`.
+    """
+    iter_export(dataset, fmt, **filters)  # validate now, the worker would only log it
+    job_id = secrets.token_urlsafe(12)
+    redis.hset(_job_key(job_id), mapping={
+        'status': 'running', 'dataset': dataset, 'format': fmt,
+        'requested_by': requested_by or '', 'started_at': int(time.time()),
+    })
+    redis.expire(_job_key(job_id), JOB_TTL)
+    build_export.delay(job_id, dataset, fmt, filters)
+    return job_id
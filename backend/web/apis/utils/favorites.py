@@ -0,0 +1,153 @@
+import traceback
+import sqlalchemy as sa
+from flask import session
+from sqlalchemy.exc import IntegrityError
+from web.extensions import db, redis
+from web.apis.models.favorites import Favorite
+
+FAVORITES_TTL = 7 * 24 * 3600  # seconds, idle sets expire and are rebuilt from the table on next use
+WARM_MARKER = '*'  # member present only in a fully loaded set, so "no favorites" is still a cache hit
+
+# SADD only into a warm set: a plain SADD on a missing key would create one with no
+# marker and no TTL, never read (favorite_ids rebuilds it) and never expired.
+ADD_IF_WARM_LUA = """
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('SADD', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_add_if_warm = None
+
+def _key(user_id):
+    return f"favorites:user:{user_id}"
+
+def _favorite_ids_from_db(user_id):
+    return set(db.session.scalars(
+        sa.select(Favorite.product_id).where(Favorite.user_id == user_id, Favorite.is_deleted == False)
+    ))
+
+def warm_favorites(user_id):
+    """
+    (Re)build a user's favorites set from the table.
+
+    Returns:
+        set: product ids the user has favorited.
+    """
+    product_ids = _favorite_ids_from_db(user_id)
+    try:
+        pipe = redis.pipeline()
+        pipe.delete(_key(user_id))
+        pipe.sadd(_key(user_id), WARM_MARKER, *product_ids)
+        pipe.expire(_key(user_id), FAVORITES_TTL)
+        pipe.execute()
+    except Exception:
+        traceback.print_exc()
+    return product_ids
+
+def favorite_ids(user_id):
+    """Every product id a user has favorited, from redis when the set is warm."""
+    try:
+        members = redis.smembers(_key(user_id))
+        if WARM_MARKER.encode() in members:
+            return {int(member) for member in members if member != WARM_MARKER.encode()}
+    except Exception:
+        traceback.print_exc()
+        return _favorite_ids_from_db(user_id)
+    return warm_favorites(user_id)
+
+def are_favorites(user_id, product_ids):
+    """
+    Bulk "is favorited" lookup for a page of products, in one redis round trip.
+
+    Args:
+        user_id (int): the viewer.
+        product_ids (list): ids to check.
+
+    Returns:
+        dict: {product_id: bool}
+    """
+    product_ids = list(product_ids)
+    if not user_id or not product_ids:
+        return {product_id: False for product_id in product_ids}
+
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.sismember(_key(user_id), WARM_MARKER)
+        for product_id in product_ids:
+            pipe.sismember(_key(user_id), product_id)
+        warm, *flags = pipe.execute()
+        if warm:
+            return {product_id: bool(flag) for product_id, flag in zip(product_ids, flags)}
+        favorited = warm_favorites(user_id)
+    except Exception:
+        traceback.print_exc()
+        favorited = _favorite_ids_from_db(user_id)
+
+    return {product_id: product_id in favorited for product_id in product_ids}
+
+def viewer_favorites(user, product_ids):
+    """are_favorites() for the current viewer, guests are answered from their session list."""
+    if user:
+        return are_favorites(user.id, product_ids)
+    guest_favorites = {str(product_id) for product_id in session.get('favorite', [])}
+    return {product_id: str(product_id) in guest_favorites for product_id in product_ids}
+
+def add_favorite(user_id, product_id):
+    """
+    Favorite a product, relying on the (user_id, product_id) unique constraint instead of a lookup first.
+
+    Returns:
+        bool: True when newly added, False when it was already a favorite.
+    """
+    try:
+        db.session.add(Favorite(user_id=user_id, product_id=product_id))
+        db.session.commit()
+        created = True
+    except IntegrityError:
+        db.session.rollback()
+        existing = db.session.scalar(
+            sa.select(Favorite).where(Favorite.user_id == user_id, Favorite.product_id == product_id)
+            .execution_options(include_deleted=True)  # an unfavorited row is brought back
+        )
+        if existing is None:
+            raise  # not a duplicate, e.g. the user or product doesn't exist
+        if existing.is_deleted:
+            existing.is_deleted = False
+            db.session.commit()
+        created = False
+
+    _remember(user_id, product_id, member=True)
+    return created
+
+def remove_favorite(user_id, product_id):
+    """
+    Returns:
+        bool: True when a favorite was removed.
+    """
+    removed = db.session.execute(
+        sa.delete(Favorite).where(Favorite.user_id == user_id, Favorite.product_id == product_id)
+    ).rowcount
+    db.session.commit()
+    _remember(user_id, product_id, member=False)
+    return bool(removed)
+
+def _remember(user_id, product_id, member):
+    # a cold key stays cold, the next read warms it from the table
+    global _add_if_warm
+    try:
+        if member:
+            if _add_if_warm is None:
+                _add_if_warm = redis.register_script(ADD_IF_WARM_LUA)
+            _add_if_warm(keys=[_key(user_id)], args=[WARM_MARKER, product_id])
+        else:
+            redis.srem(_key(user_id), product_id)
+    except Exception:
+        traceback.print_exc()
+        forget_favorites(user_id)
+
+def forget_favorites(user_id):
+    try:
+        redis.delete(_key(user_id))
+    except Exception:
+        traceback.print_exc()
@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+import sqlalchemy as sa
+from requests.adapters import HTTPAdapter
+
+from web.extensions import db
+from web.apis.models.addresses import Country, State, City
+from web.apis.utils.geo_reference import geo_snapshot
+
+class GeoNamesError(Exception):
+    """Raised when GeoNames answers with an error payload (bad username, hourly limit, ...)."""
+
+class GeoNamesClient:
+    """
+    Thin GeoNames client that is safe to share between importer threads.
+
+    Each thread gets its own requests.Session, so keep-alive connections are reused
+    without sharing a session across threads. `base_url` can point at a local fixture
+    server that serves the same `countryInfoJSON` / `childrenJSON` payloads.
+    """
+    def __init__(self, base_url='http://api.geonames.org', username='edet', timeout=30, retries=3, backoff=1.0):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_maxsize=1))
+            session.mount('https://', HTTPAdapter(pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def _get(self, endpoint, **params):
+        params['username'] = self.username
+        url = f"{self.base_url}/{endpoint}"
+        for attempt in range(1, self.retries + 1):
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                payload = response.json()
+                if 'status' in payload:
+                    raise GeoNamesError(payload['status'].get('message', 'GeoNames error'))
+                return payload.get('geonames', [])
+            except (requests.RequestException, ValueError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * attempt)
+
+    def countries(self):
+        return self._get('countryInfoJSON')
+
+    def children(self, geoname_id):
+        return self._get('childrenJSON', geonameId=geoname_id)
+
+class ImportCheckpoint:
+    """
+    Geoname ids of countries whose states and cities are fully stored.
+
+    Saved as a small json file after every finished country, so an interrupted
+    import picks up where it stopped instead of starting over.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f).get('countries', []))
+
+    def __contains__(self, geoname_id):
+        return geoname_id in self.done
+
+    def mark(self, geoname_id):
+        self.done.add(geoname_id)
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'countries': sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)  # never leave a half written checkpoint behind
+
+    def reset(self):
+        self.done = set()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def country_row(country):
+    code = country['countryCode']
+    return {
+        'geoname_id': country['geonameId'],
+        'name': country['countryName'],
+        'code': code,
+        'languages': country.get('languages'),
+        'iso_numeric': country.get('isoNumeric'),
+        'currency': country.get('currency', 'N/A'),
+        'currency_symbol': country.get('currencyCode', 'N/A'),
+        'logo_url': f"https://flagcdn.com/w320/{code.lower()}.png",
+        'flag_url': f"https://flagcdn.com/{code.lower()}.svg",
+    }
+
+def upsert_by_geoname(model, rows, parent_column=None, batch_size=1000):
+    """
+    Insert or update rows keyed on `geoname_id`, a batch at a time.
+
+    Every batch costs a fixed number of statements (one lookup, one bulk insert, one
+    bulk update and one id read back) no matter how many rows it holds. Rows stored
+    before geoname ids were tracked are matched by name (and parent), then adopted.
+
+    Args:
+        model: Country, State or City.
+        rows (list): dicts of column values, each with a `geoname_id`.
+        parent_column (str, optional): foreign key that scopes names, e.g. 'country_id'.
+        batch_size (int): rows per statement.
+
+    Returns:
+        dict: {geoname_id: primary key} for every row passed in.
+    """
+    # geonames sometimes lists the same child twice, the last copy wins
+    rows = list({row['geoname_id']: row for row in rows}.values())
+    ids = {}
+
+    for chunk in _chunks(rows, batch_size):
+        geoname_ids = [row['geoname_id'] for row in chunk]
+        existing = dict(db.session.execute(
+            sa.select(model.geoname_id, model.id).where(model.geoname_id.in_(geoname_ids))
+        ).all())
+
+        unmatched = [row for row in chunk if row['geoname_id'] not in existing]
+        legacy = {}
+        if unmatched:
+            names = {row['name'] for row in unmatched}
+            stmt = sa.select(model.id, model.name).where(model.geoname_id.is_(None), model.name.in_(names))
+            if parent_column:
+                parent = getattr(model, parent_column)
+                stmt = stmt.add_columns(parent).where(parent.in_({row[parent_column] for row in unmatched}))
+            for found in db.session.execute(stmt).all():
+                key = (found.name, getattr(found, parent_column)) if parent_column else found.name
+                legacy[key] = found.id
+
+        inserts, updates = [], []
+        for row in chunk:
+            key = (row['name'], row[parent_column]) if parent_column else row['name']
+            pk = existing.get(row['geoname_id']) or legacy.pop(key, None)
+            if pk:
+                updates.append({'id': pk, **row})
+            else:
+                inserts.append(row)
+
+        if updates:
+            db.session.execute(sa.update(model), updates)
+        if inserts:
+            db.session.execute(sa.insert(model), inserts)
+            existing.update(db.session.execute(
+                sa.select(model.geoname_id, model.id)
+                .where(model.geoname_id.in_([row['geoname_id'] for row in inserts]))
+            ).all())
+
+        ids.update(existing)
+        ids.update({update['geoname_id']: update['id'] for update in updates})
+
+    return ids
+
+class GeoImporter:
+    """
+    Imports the country -> state -> city hierarchy from GeoNames.
+
+    Network calls run on a bounded thread pool, one country tree per task, while the
+    calling thread (the only one touching the db session) upserts what comes back in
+    batches and commits once per country. Finished countries are checkpointed, so a
+    rerun skips them.
+
+    usage:
+        importer = GeoImporter.from_config(current_app.config)
+        importer.run(country_codes=['NG', 'GH'])
+    """
+    def __init__(self, client, workers=8, batch_size=1000, checkpoint=None, log=print):
+        self.client = client
+        self.workers = max(workers, 1)
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint or ImportCheckpoint()
+        self.log = log
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        client = GeoNamesClient(
+            base_url=overrides.pop('api_url', None) or config.get('GEONAMES_API_URL', 'http://api.geonames.org'),
+            username=overrides.pop('username', None) or config.get('GEONAMES_USERNAME', 'edet'),
+            timeout=config.get('GEONAMES_TIMEOUT', 30),
+        )
+        options = {
+            'workers': config.get('GEO_IMPORT_WORKERS', 8),
+            'batch_size': config.get('GEO_IMPORT_BATCH_SIZE', 1000),
+            'checkpoint': ImportCheckpoint(config.get('GEO_IMPORT_CHECKPOINT')),
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(client, **options)
+
+    def fetch_tree(self, country_geoname_id):
+        """Runs on a worker thread: the states of a country and the cities of each state."""
+        states = self.client.children(country_geoname_id)
+        return states, {state['geonameId']: self.client.children(state['geonameId']) for state in states}
+
+    def store_tree(self, country_id, states, cities):
+        """Upserts one country's states and cities. Returns (states, cities) stored."""
+        state_ids = upsert_by_geoname(
+            State,
+            [{'geoname_id': state['geonameId'], 'name': state['name'], 'country_id': country_id} for state in states],
+            parent_column='country_id', batch_size=self.batch_size,
+        )
+        city_rows = [
+            {'geoname_id': city['geonameId'], 'name': city['name'], 'state_id': state_ids[state_geoname_id]}
+            for state_geoname_id, children in cities.items() if state_geoname_id in state_ids
+            for city in children
+        ]
+        upsert_by_geoname(City, city_rows, parent_column='state_id', batch_size=self.batch_size)
+        return len(state_ids), len(city_rows)
+
+    def import_countries(self, country_codes=None):
+        countries = self.client.countries()
+        if country_codes:
+            wanted = {code.upper() for code in country_codes}
+            countries = [country for country in countries if country['countryCode'] in wanted]
+        country_ids = upsert_by_geoname(Country, [country_row(country) for country in countries], batch_size=self.batch_size)
+        db.session.commit()
+        geo_snapshot.bump()  # bulk statements don't fire the model events the snapshot watches
+        return countries, country_ids
+
+    def run(self, country_codes=None):
+        """
+        Import countries, then the states and cities of every country not yet checkpointed.
+
+        Returns:
+            dict: counts of countries, states and cities stored, plus countries skipped/failed.
+        """
+        countries, country_ids = self.import_countries(country_codes)
+        pending = [country['geonameId'] for country in countries if country['geonameId'] not in self.checkpoint]
+        stats = {'countries': len(country_ids), 'states': 0, 'cities': 0,
+                 'skipped': len(countries) - len(pending), 'failed': []}
+        self.log(f"[+] {len(country_ids)} countries stored, {len(pending)} to import with {self.workers} workers")
+
+        queue = iter(pending)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # keep only a couple of trees in flight per worker, so fetched data never piles up in memory
+            in_flight = {}
+            for geoname_id in queue:
+                in_flight[pool.submit(self.fetch_tree, geoname_id)] = geoname_id
+                if len(in_flight) >= self.workers * 2:
+                    break
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    geoname_id = in_flight.pop(future)
+                    try:
+                        states, cities = future.result()
+                        state_count, city_count = self.store_tree(country_ids[geoname_id], states, cities)
+                        db.session.commit()
+                        self.checkpoint.mark(geoname_id)
+                        stats['states'] += state_count
+                        stats['cities'] += city_count
+                        self.log(f"[+] country {geoname_id}: {state_count} states, {city_count} cities")
+                    except Exception:
+                        db.session.rollback()
+                        traceback.print_exc()
+                        stats['failed'].append(geoname_id)
+
+                    next_id = next(queue, None)
+                    if next_id is not None:
+                        in_flight[pool.submit(self.fetch_tree, next_id)] = next_id
+
+        geo_snapshot.bump()  # once at the end, rebuilding after every country would only churn the snapshot
+        return stats
@@ -0,0 +1,50 @@
+import sqlalchemy as sa
+from werkzeug.http import http_date
+from web.extensions import db
+from web.apis.models.addresses import Country, State, City
+from web.apis.utils.snapshots import VersionedSnapshot
+
+GEO_MAX_AGE = 3600  # seconds, geo data changes once in a blue moon and every write bumps the etag anyway
+
+def _summary(row):
+    return {
+        'id': row.id,
+        'name': row.name,
+        'created_at': http_date(row.created_at) if row.created_at else None,
+    }
+
+def build_geo_snapshot():
+    """
+    Every country, state and city as plain summaries, grouped by parent and sorted by name.
+
+    Three column-only selects, no ORM objects kept around.
+    """
+    countries = [
+        _summary(row) for row in db.session.execute(
+            sa.select(Country.id, Country.name, Country.created_at).order_by(Country.name)
+        )
+    ]
+
+    states_by_country = {}
+    for row in db.session.execute(
+        sa.select(State.id, State.name, State.created_at, State.country_id).order_by(State.name)
+    ):
+        states_by_country.setdefault(row.country_id, []).append(_summary(row))
+
+    cities_by_state = {}
+    for row in db.session.execute(
+        sa.select(City.id, City.name, City.created_at, City.state_id).order_by(City.name)
+    ):
+        cities_by_state.setdefault(row.state_id, []).append(_summary(row))
+
+    return {
+        'countries': countries,
+        'countries_by_id': {country['id']: country for country in countries},
+        'states_by_country': states_by_country,
+        'cities_by_state': cities_by_state,
+    }
+
+geo_snapshot = VersionedSnapshot('geo', build_geo_snapshot).watch(Country, State, City)
+
+def country_summary(country, selected_ids=frozenset()):
+    return {**country, 'is_selected': country['id'] in selected_ids}
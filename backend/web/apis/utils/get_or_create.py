@@ -1,5 +1,6 @@
 
 from sqlalchemy.sql import ClauseElement
+from web.apis.models.soft_delete import SoftDeleteMixin
 
 def get_or_create(session, model, defaults=None, **kwargs):
     """
@@ -13,11 +14,17 @@ def get_or_create(session, model, defaults=None, **kwargs):
 
     Returns:
     - Tuple of (instance, created), where `created` is a boolean indicating if a new instance was created.
+
+    A soft deleted match is brought back rather than created again, it still holds
+    the unique values (a tag or category name).
     """
-    # Query for an existing instance
-    instance = session.query(model).filter_by(**kwargs).first()
+    # Query for an existing instance, deleted ones included
+    instance = session.query(model).execution_options(include_deleted=True).filter_by(**kwargs).first()
     
     if instance:
+        if issubclass(model, SoftDeleteMixin) and instance.is_deleted:
+            instance.is_deleted = False
+            session.commit()
         return instance, False  # Instance found, not created
     else:
         # Prepare parameters for the new instance
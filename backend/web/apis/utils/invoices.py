@@ -0,0 +1,142 @@
+"""
+PDF invoices for orders and receipts for transactions.
+
+A document's file name is an HMAC-SHA256, keyed on SECRET_KEY, of the data it shows
+(plus the template version). Nobody without the key can derive it from order data,
+so the name works as the access check of the file url, like a signed url. And:
+    - an order that hasn't changed maps to a file that already exists, nothing is rendered;
+    - a changed order maps to a new name, the old file is never overwritten, and
+      `/api/invoices/files/<digest>.pdf` can be cached forever (immutable).
+
+Rendering (weasyprint) runs on the task worker. A redis NX lock per digest
+makes concurrent requests for the same document render it once.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import traceback
+from flask import current_app, render_template
+from web.extensions import db, redis
+from web.apis.models.orders import ORDER_STATUS, Order
+from web.apis.models.transactions import Transaction
+from web.tasks import render_document
+
+TEMPLATE_VERSION = 1  # bump when templates/invoices change, every document gets re-rendered on next request
+RENDER_LOCK_TTL = 300
+KINDS = ('order', 'transaction')
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def order_context(order):
+    items = [
+        {'name': item.name, 'quantity': item.quantity, 'price': item.price, 'total': item.price * item.quantity}
+        for item in order.order_items if not item.is_deleted
+    ]
+    address = order.address
+    return {
+        'kind': 'order',
+        'id': order.id,
+        'number': f"INV-{order.id:06d}",
+        'tracking_number': order.tracking_number,
+        'status': ORDER_STATUS[order.order_status] if order.order_status is not None else None,
+        'created_at': _iso(order.created_at),
+        'customer': {
+            'name': f"{address.first_name or ''} {address.last_name or ''}".strip(),
+            'email': order.user.email if order.user else None,
+            'street_address': address.street_address,
+            'zip_code': address.zip_code,
+            'phone_number': address.phone_number,
+            'city': address.city.name if address.city else None,
+        },
+        'items': items,
+        'total': sum(item['total'] for item in items),
+    }
+
+def transaction_context(transaction):
+    return {
+        'kind': 'transaction',
+        'id': transaction.id,
+        'number': f"RCT-{transaction.id:06d}",
+        'reference': transaction.reference,
+        'status': transaction.status,
+        'amount': transaction.amount,
+        'currency': transaction.currency,
+        'payment_method': transaction.payment_method,
+        'description': transaction.description,
+        'plan': transaction.plan.name if transaction.plan else None,
+        'created_at': _iso(transaction.created_at),
+        'customer': {
+            'name': transaction.user.name if transaction.user else None,
+            'email': transaction.user.email if transaction.user else None,
+        },
+    }
+
+def load_document(kind, object_id):
+    """(object, context) for an order or transaction id, (None, None) when it doesn't exist."""
+    if kind == 'order':
+        obj = db.session.get(Order, object_id)
+        return (obj, order_context(obj)) if obj and not obj.is_deleted else (None, None)
+    if kind == 'transaction':
+        obj = db.session.get(Transaction, object_id)
+        return (obj, transaction_context(obj)) if obj and not obj.is_deleted else (None, None)
+    raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+
+def document_digest(context):
+    payload = json.dumps({'v': TEMPLATE_VERSION, **context}, sort_keys=True, default=str)
+    key = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(key, payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def document_path(digest):
+    """Files are fanned out over 256 directories by the first two hex digits."""
+    return os.path.join(current_app.config['INVOICES_LOCATION'], digest[:2], f"{digest}.pdf")
+
+def render_pdf(context, path):
+    from weasyprint import HTML  # heavy import, only paid by the worker that renders
+
+    html = render_template(f"invoices/{context['kind']}.html", doc=context)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    HTML(string=html).write_pdf(f"{path}.part")
+    os.replace(f"{path}.part", path)  # never serve a half written pdf
+
+def request_document(kind, object_id, context=None):
+    """
+    Make sure the current version of a document exists, rendering it in the background if not.
+
+    Cheap enough to call right after a commit: one hash, one stat, and at most one
+    redis SET NX.
+
+    Returns:
+        tuple: (digest, ready). `ready` is False while the pdf is being rendered.
+            (None, False) when the order/transaction doesn't exist.
+    """
+    if context is None:
+        _, context = load_document(kind, object_id)
+        if context is None:
+            return None, False
+
+    digest = document_digest(context)
+    path = document_path(digest)
+    if os.path.exists(path):
+        return digest, True
+
+    lock_key = f"invoices:render:{digest}"
+    if not redis.set(lock_key, 1, nx=True, ex=RENDER_LOCK_TTL):
+        return digest, False  # already rendering
+
+    try:
+        render_document.delay(context, digest, lock_key=lock_key)
+    except Exception:
+        redis.delete(lock_key)
+        raise
+    return digest, False
+
+def queue_document(kind, object_id):
+    """`request_document` for hooks after a commit, a failure here never fails the request."""
+    try:
+        return request_document(kind, object_id)
+    except Exception:
+        traceback.print_exc()
+        return None, False
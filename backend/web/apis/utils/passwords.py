@@ -0,0 +1,98 @@
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+UNUSABLE_PASSWORD_PREFIX = '!'  # never produced by werkzeug, so such a hash can't match any password
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated and a caller waited too long for a slot."""
+
+def normalize_method(method):
+    """
+    Spell out werkzeug's defaults, so 'scrypt' and 'scrypt:32768:8:1' compare equal.
+
+    Args:
+        method (str): e.g. 'scrypt', 'scrypt:65536:8:1', 'pbkdf2', 'pbkdf2:sha256:600000'.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join([name, *args, *defaults[len(args):]])
+
+class PasswordHasher:
+    """
+    Password hashing on a small dedicated thread pool.
+
+    Hashing is CPU heavy by design. Running it on a bounded pool caps how many hashes
+    a worker computes at once (hashlib releases the GIL while it works), so a burst of
+    logins queues up here instead of starving every other request. When more than
+    PASSWORD_HASH_QUEUE hashes are waiting, callers get HashingBusy after
+    PASSWORD_HASH_TIMEOUT seconds rather than piling up.
+
+    Config:
+        PASSWORD_HASH_METHOD: werkzeug method string with its cost, e.g. 'scrypt:32768:8:1'.
+        PASSWORD_HASH_WORKERS: threads in the pool.
+        PASSWORD_HASH_QUEUE: hashes allowed in flight (running + waiting).
+        PASSWORD_HASH_TIMEOUT: seconds to wait for a slot.
+    """
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _config(self, key, default):
+        return current_app.config.get(key, default) if has_app_context() else default
+
+    @property
+    def method(self):
+        return normalize_method(self._config('PASSWORD_HASH_METHOD', 'scrypt'))
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = self._config('PASSWORD_HASH_WORKERS', 2)
+                    self._slots = threading.BoundedSemaphore(self._config('PASSWORD_HASH_QUEUE', workers * 8))
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _run(self, fn, *args):
+        pool = self._pool()
+        if not self._slots.acquire(timeout=self._config('PASSWORD_HASH_TIMEOUT', 10)):
+            raise HashingBusy("Too many sign-ins at once, please try again shortly.")
+        try:
+            return pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash or pwhash.startswith(UNUSABLE_PASSWORD_PREFIX):
+            return False  # guests and oauth-only accounts, nothing to hash
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when a stored hash was made with another method or cost than the configured one."""
+        if not pwhash or pwhash.startswith(UNUSABLE_PASSWORD_PREFIX):
+            return False
+        return normalize_method(pwhash.split('$', 1)[0]) != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+def make_unusable_password():
+    """Placeholder for accounts that sign in without a password (guests, oauth)."""
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(16)
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,85 @@
+import requests
+import sqlalchemy as sa
+from flask import current_app
+from web.extensions import db
+from web.apis.models.plans import Plan, Subscription
+from web.apis.models.transactions import Transaction
+
+VERIFY_ENDPOINT = "https://api.paystack.co/transaction/verify/{reference}"
+VERIFY_TIMEOUT = (5, 15)  # connect, read
+SUCCESSFUL = ("success", "successful")
+
+def verify_transaction(reference):
+    """
+    Verify a paystack payment and credit the plan's units to the payer's subscription.
+
+    Safe to run more than once for the same reference, even at the same time (the callback,
+    a reload of it and a queued retry): the status is flipped to successful by one
+    conditional UPDATE and only the caller whose UPDATE changed the row credits the units.
+
+    Returns:
+        tuple: (outcome, paystack data). outcome is one of
+            'already'    - verified earlier,
+            'updated'    - units added to the existing subscription,
+            'activated'  - a new subscription was created,
+            'failed'     - paystack reports the payment as not successful,
+            'unverified' - paystack did not answer with a 200.
+
+    Raises:
+        ValueError: unknown reference.
+        requests.ConnectionError, requests.Timeout: paystack unreachable, retry later.
+    """
+    transaction = Transaction.get_transaction(reference)
+    if transaction.status in SUCCESSFUL:
+        return 'already', {}
+
+    headers = {
+        "accept": "application/json",
+        "Authorization": f"Bearer {current_app.config['PAYSTACK_SK']}",
+        "Content-Type": "application/json"
+    }
+    response = requests.get(VERIFY_ENDPOINT.format(reference=reference), headers=headers, timeout=VERIFY_TIMEOUT)
+    if response.status_code != 200:
+        return 'unverified', {}
+
+    response_data = response.json().get('data', {})
+    if not (
+        response_data.get('status') == "success"
+        and response_data.get('amount') >= transaction.amount * 100  # Amount in kobo
+        and response_data.get('currency') == transaction.currency
+    ):
+        _set_status(transaction, response_data['status'])
+        db.session.commit()
+        return 'failed', response_data
+
+    if not _set_status(transaction, response_data['status']):
+        db.session.rollback()
+        return 'already', {}  # a concurrent verification got there first
+    plan_id = response_data['metadata']['plan_id']
+    units = db.session.get(Plan, plan_id).units
+
+    # Check for existing active subscription
+    existing_subscription = Subscription.query.filter_by(user_id=transaction.user_id).first()
+    if existing_subscription:
+        # Update existing subscription plan and add new units
+        existing_subscription.plan_id = plan_id
+        existing_subscription.total_units = Subscription.total_units + units
+        outcome = 'updated'
+    else:
+        db.session.add(Subscription(user_id=transaction.user_id, plan_id=plan_id, total_units=units, status='active'))
+        outcome = 'activated'
+
+    db.session.commit()
+    return outcome, response_data
+
+def _set_status(transaction, status):
+    """Set the status unless the transaction is already successful. True when this call changed it."""
+    changed = db.session.execute(
+        sa.update(Transaction)
+        .where(Transaction.id == transaction.id, Transaction.status.notin_(SUCCESSFUL))
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if changed:
+        transaction.status = status
+    return changed == 1
@@ -0,0 +1,196 @@
+"""
+Per-request instrumentation, off unless PROFILER_ENABLED is set.
+
+For every request it counts SQL statements, DB time and serialization time, adds them
+as a `Server-Timing` header (visible in the browser devtools) and logs one json line
+per request. A sample of requests also runs under cProfile, and the dump is kept only
+when the request turned out slow.
+
+Endpoints can declare how many queries they are allowed:
+
+    @product_bp.route('/products')
+    @query_budget(3)
+    def products(): ...
+
+and over-budget requests are logged, or fail outright with PROFILER_STRICT (tests).
+"""
+
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('web.profiler')
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request or a block runs more SQL statements than it declared."""
+
+def _stats():
+    if has_request_context():
+        return g.get('_profiler_stats')
+    return None
+
+# the start time rides on the statement's execution context: a failed statement never
+# reaches after_cursor_execute, and a stack on the connection would pair the next one
+# with its leftover entry
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _stats() is not None:
+        context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    started = getattr(context, '_query_start', None)
+    if stats is not None and started is not None:
+        stats['db_queries'] += 1
+        stats['db_ms'] += (time.perf_counter() - started) * 1000
+
+@contextmanager
+def timed(name):
+    """Add the block's wall time to the current request's `<name>_ms` (no-op when the profiler is off)."""
+    stats = _stats()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        key = f"{name}_ms"
+        stats[key] = stats.get(key, 0) + (time.perf_counter() - started) * 1000
+
+def query_budget(max_queries):
+    """
+    Declare the most SQL statements an endpoint should need, put it under the route decorator.
+
+    Checked by the profiler on every request when it is enabled.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if has_request_context():
+                g._profiler_budget = max_queries
+            return view(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+@contextmanager
+def nested_view():
+    """
+    Run a view inside the current request (a sub-request, web/apis/utils/subrequests.py).
+
+    Its `query_budget` is checked against the statements it ran itself, and the
+    request's own budget is put back afterwards.
+    """
+    stats = _stats()
+    outer_budget = g.pop('_profiler_budget', None) if has_request_context() else None
+    started = stats['db_queries'] if stats is not None else 0
+    try:
+        yield
+    finally:
+        budget = g.pop('_profiler_budget', None) if has_request_context() else None
+        if outer_budget is not None:
+            g._profiler_budget = outer_budget
+        ran = stats['db_queries'] - started if stats is not None else 0
+        if budget is not None and ran > budget:
+            logger.info(json.dumps({'path': request.path, 'endpoint': request.endpoint, 'db_queries': ran, 'query_budget': budget}))
+            if current_app.config.get('PROFILER_STRICT'):
+                raise QueryBudgetExceeded(f"{request.endpoint} ran {ran} queries, budget is {budget}")
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """
+    Fail when the block runs more than `max_queries` SQL statements, works without the profiler.
+
+    usage (e.g. in a test):
+        with assert_max_queries(4) as statements:
+            client.get('/api/comments/products/some-product-slug')
+    """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+
+    if len(statements) > max_queries:
+        listing = '\n'.join(f"  {i}. {statement}" for i, statement in enumerate(statements, 1))
+        raise QueryBudgetExceeded(f"{len(statements)} queries, budget is {max_queries}:\n{listing}")
+
+def _start_request():
+    config = current_app.config
+    g._profiler_stats = {'db_queries': 0, 'db_ms': 0.0}
+    g._profiler_started = time.perf_counter()
+    g._profiler_cprofile = None
+    if random.random() < config.get('PROFILER_SAMPLE_RATE', 0.05):
+        g._profiler_cprofile = cProfile.Profile()
+        g._profiler_cprofile.enable()
+
+def _finish_request(response):
+    stats = g.pop('_profiler_stats', None)
+    if stats is None:
+        return response
+
+    config = current_app.config
+    total_ms = (time.perf_counter() - g._profiler_started) * 1000
+    profile = g.pop('_profiler_cprofile', None)
+    if profile is not None:
+        profile.disable()
+
+    timings = [f'db;dur={stats["db_ms"]:.1f};desc="{stats["db_queries"]} queries"']
+    timings += [f"{key[:-3]};dur={value:.1f}" for key, value in stats.items() if key.endswith('_ms') and key != 'db_ms']
+    timings.append(f"total;dur={total_ms:.1f}")
+    response.headers.add('Server-Timing', ', '.join(timings))
+
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 1),
+        **{key: round(value, 1) if isinstance(value, float) else value for key, value in stats.items()},
+    }
+
+    budget = g.pop('_profiler_budget', None)
+    if budget is not None and stats['db_queries'] > budget:
+        record['query_budget'] = budget
+        if config.get('PROFILER_STRICT'):
+            raise QueryBudgetExceeded(f"{request.endpoint} ran {stats['db_queries']} queries, budget is {budget}")
+
+    if profile is not None and total_ms >= config.get('PROFILER_SLOW_REQUEST_MS', 500):
+        dump_dir = config.get('PROFILER_DUMP_DIR')
+        os.makedirs(dump_dir, exist_ok=True)
+        dump_path = os.path.join(dump_dir, f"{int(time.time())}-{(request.endpoint or 'unknown').replace('.', '_')}.prof")
+        profile.dump_stats(dump_path)
+        record['profile'] = dump_path  # open with `python -m pstats <file>` or snakeviz
+
+    logger.info(json.dumps(record))
+    return response
+
+def init_profiler(app):
+    """Wire the profiler into the app when PROFILER_ENABLED is set."""
+    if not app.config.get('PROFILER_ENABLED'):
+        return
+
+    # listen on the Engine class so every bind (and engines created later) is measured
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,163 @@
+"""
+Product rankings precomputed into redis sorted sets (product_id -> score).
+
+`refresh_rankings()` aggregates OrderItem, Favorite and Comment once per run and
+swaps fresh sets in with RENAME, so readers never see a half built ranking. It runs
+from celery beat every 10 minutes and by hand with `flask rankings refresh`, never in
+a request. Requests only read the sets: ZCARD + ZREVRANGE per page (ZMSCORE of the
+allowed ids for a filtered listing), never a live GROUP BY. Until a first build,
+`ranked_ids` returns None and listings fall back to newest first, the same as when
+redis can't be reached. Deleted products are left out of every ranking.
+"""
+
+import time
+import traceback
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from web.extensions import db, redis
+from web.apis.models.comments import Comment
+from web.apis.models.favorites import Favorite
+from web.apis.models.orders import OrderItem
+from web.apis.models.products import Product
+
+RANKINGS = ('bestselling', 'trending', 'rating')
+TRENDING_DAYS = 7
+TRENDING_WEIGHTS = {'sales': 3, 'favorites': 2, 'comments': 1}
+RATING_PRIOR = 5  # ratings a product "borrows" from the catalog average, so one 5 star review doesn't top the list
+
+def ranking_key(kind):
+    return f"rankings:{kind}"
+
+def _live_products(stmt, product_id):
+    """Restrict an aggregate to products that aren't soft deleted, listings can't show the others."""
+    return stmt.join(Product, Product.id == product_id).where(Product.is_deleted == False)
+
+def _bestselling_scores():
+    rows = db.session.execute(_live_products(
+        sa.select(OrderItem.product_id, sa.func.sum(OrderItem.quantity))
+        .where(OrderItem.is_deleted == False)
+        .group_by(OrderItem.product_id),
+        OrderItem.product_id,
+    ))
+    return {product_id: float(sold) for product_id, sold in rows if sold}
+
+def _trending_scores(since):
+    scores = {}
+    sources = (
+        ('sales', OrderItem.product_id, sa.select(OrderItem.product_id, sa.func.sum(OrderItem.quantity))
+            .where(OrderItem.is_deleted == False, OrderItem.created_at >= since).group_by(OrderItem.product_id)),
+        ('favorites', Favorite.product_id, sa.select(Favorite.product_id, sa.func.count(Favorite.id))
+            .where(Favorite.is_deleted == False, Favorite.created_at >= since).group_by(Favorite.product_id)),
+        ('comments', Comment.product_id, sa.select(Comment.product_id, sa.func.count(Comment.id))
+            .where(Comment.is_deleted == False, Comment.created_at >= since).group_by(Comment.product_id)),
+    )
+    for name, product_id_column, stmt in sources:
+        for product_id, value in db.session.execute(_live_products(stmt, product_id_column)):
+            scores[product_id] = scores.get(product_id, 0) + TRENDING_WEIGHTS[name] * float(value or 0)
+    return {product_id: score for product_id, score in scores.items() if score}
+
+def _rating_scores():
+    rows = db.session.execute(_live_products(
+        sa.select(Comment.product_id, sa.func.count(Comment.rating), sa.func.sum(Comment.rating))
+        .where(Comment.is_deleted == False, Comment.rating.isnot(None))
+        .group_by(Comment.product_id),
+        Comment.product_id,
+    )).all()
+    ratings = sum(count for _, count, _ in rows)
+    if not ratings:
+        return {}
+    mean = sum(float(total) for _, _, total in rows) / ratings
+    # bayesian average: pulled towards the catalog mean until a product has enough ratings
+    return {
+        product_id: (RATING_PRIOR * mean + float(total)) / (RATING_PRIOR + count)
+        for product_id, count, total in rows if count
+    }
+
+def _swap_in(kind, scores):
+    key = ranking_key(kind)
+    staging = f"{key}:building"
+    pipe = redis.pipeline()
+    pipe.delete(staging)
+    if scores:
+        pipe.zadd(staging, scores)
+        pipe.rename(staging, key)
+    else:
+        pipe.delete(key)
+    pipe.set(f"{key}:built_at", int(time.time()))
+    pipe.execute()
+
+def refresh_rankings(kinds=RANKINGS):
+    """
+    Recompute rankings and publish them.
+
+    Returns:
+        dict: {kind: number of ranked products}
+    """
+    since = datetime.utcnow() - timedelta(days=TRENDING_DAYS)
+    builders = {
+        'bestselling': _bestselling_scores,
+        'trending': lambda: _trending_scores(since),
+        'rating': _rating_scores,
+    }
+    counts = {}
+    for kind in kinds:
+        scores = builders[kind]()
+        _swap_in(kind, scores)
+        counts[kind] = len(scores)
+    return counts
+
+def unrank(product_id):
+    """Drop a deleted product from every ranking now rather than at the next refresh."""
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for kind in RANKINGS:
+            pipe.zrem(ranking_key(kind), product_id)
+        pipe.execute()
+    except Exception:
+        traceback.print_exc()
+
+def ranked_ids(kind, page=1, page_size=20, allowed_ids=None):
+    """
+    One page of product ids, best first.
+
+    Args:
+        kind (str): one of RANKINGS.
+        allowed_ids (set, optional): restrict to these products (e.g. a category's),
+            ranked order is kept.
+
+    Returns:
+        tuple: ([(product_id, score), ...], total ranked products), None when the
+            ranking was never built (fresh deploy, flushed redis) and beat hasn't run yet,
+            or redis can't be reached.
+    """
+    try:
+        return _ranked_page(ranking_key(kind), (page - 1) * page_size, page_size, allowed_ids)
+    except Exception:
+        traceback.print_exc()
+        return None
+
+def _ranked_page(key, start, page_size, allowed_ids):
+    if allowed_ids is None:
+        pipe = redis.pipeline()
+        pipe.exists(f"{key}:built_at")
+        pipe.zcard(key)
+        pipe.zrevrange(key, start, start + page_size - 1, withscores=True)
+        built, total, rows = pipe.execute()
+        if not built:
+            return None
+        return [(int(member), score) for member, score in rows], total
+
+    allowed_ids = list(allowed_ids)
+    pipe = redis.pipeline()
+    pipe.exists(f"{key}:built_at")
+    if allowed_ids:
+        pipe.zmscore(key, allowed_ids)  # scores of these members only, not the whole set
+    built, *scores = pipe.execute()
+    if not built:
+        return None
+    # ZREVRANGE order: score, then member, both descending
+    rows = sorted(
+        ((product_id, score) for product_id, score in zip(allowed_ids, scores[0] if scores else ()) if score is not None),
+        key=lambda row: (row[1], str(row[0])), reverse=True,
+    )
+    return rows[start:start + page_size], len(rows)
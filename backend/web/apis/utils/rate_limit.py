@@ -0,0 +1,183 @@
+"""
+Cost based rate limiting.
+
+Every caller (signed in user, else IP) has one token bucket in redis holding
+RATE_LIMIT_CAPACITY tokens and refilling at RATE_LIMIT_REFILL_RATE tokens a second.
+An endpoint declares what a call costs:
+
+    @user_bp.route("/users/signin", methods=['POST'])
+    @cost_limited(10)  # a password hash
+    def signin(): ...
+
+Reads cost nothing and never touch redis. Writes without a declared cost pay
+RATE_LIMIT_DEFAULT_WRITE_COST (see `init_rate_limit`).
+
+The bucket is updated by one Lua script, so concurrent workers can't both spend the
+last token. A caller far below the limit also gets a few spare tokens leased to the
+current process, and its next cheap calls are settled from that lease without a
+redis round trip.
+"""
+
+import logging
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_limiter.util import get_remote_address
+from web.extensions import redis
+from web.apis.utils.serializers import error_response
+
+logger = logging.getLogger('web.rate_limit')
+
+# KEYS[1] bucket; ARGV capacity, refill per second, cost, lease.
+# Returns {allowed, leased tokens, tokens left, seconds until `cost` is available}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed, leased, retry_after = 0, 0, 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+    -- only callers with more than half the bucket left get a lease
+    local spare = math.floor(tokens - capacity / 2)
+    if lease > 0 and spare > 0 then
+        leased = math.min(lease, spare)
+        tokens = tokens - leased
+    end
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, leased, tostring(tokens), tostring(retry_after)}
+"""
+
+class _Leases:
+    """Tokens reserved from redis by this process, short lived so they don't sit unused."""
+    def __init__(self):
+        self._leases = {}  # key -> [tokens, expires_at]
+        self._lock = threading.Lock()
+
+    def take(self, key, cost):
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is None or lease[1] < time.monotonic() or lease[0] < cost:
+                return False
+            lease[0] -= cost
+            return True
+
+    def give(self, key, tokens, ttl):
+        if tokens <= 0:
+            return
+        with self._lock:
+            if len(self._leases) > 10000:  # drop expired leases now and then
+                now = time.monotonic()
+                self._leases = {k: v for k, v in self._leases.items() if v[1] >= now}
+            self._leases[key] = [tokens, time.monotonic() + ttl]
+
+leases = _Leases()
+_script = None
+
+def _token_bucket():
+    global _script
+    if _script is None:
+        _script = redis.register_script(TOKEN_BUCKET_LUA)
+    return _script
+
+def caller_identity():
+    """`user:<id>` when signed in, `ip:<address>` otherwise."""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None  # expired/invalid token, counted against the IP
+    return f"user:{identity}" if identity else f"ip:{get_remote_address()}"
+
+def caller_key(bucket='api'):
+    """Redis key of the caller's bucket, per user when signed in, per IP otherwise."""
+    return f"ratelimit:{bucket}:{caller_identity()}"
+
+def spend(cost, bucket='api'):
+    """
+    Take `cost` tokens from the caller's bucket.
+
+    Returns:
+        tuple: (allowed, retry_after seconds). Fails open when redis is unreachable.
+    """
+    config = current_app.config
+    if not config.get('RATE_LIMIT_ENABLED', True) or cost <= 0:
+        return True, 0
+
+    key = caller_key(bucket)
+    if leases.take(key, cost):
+        return True, 0
+
+    try:
+        allowed, leased, remaining, retry_after = _token_bucket()(
+            keys=[key],
+            args=[config['RATE_LIMIT_CAPACITY'], config['RATE_LIMIT_REFILL_RATE'], cost, config['RATE_LIMIT_LEASE']],
+        )
+    except Exception:
+        logger.exception("rate limit check failed, letting the request through")
+        return True, 0
+
+    leases.give(key, int(leased), config['RATE_LIMIT_LEASE_TTL'])
+    g.rate_limit_remaining = int(float(remaining))
+    return bool(allowed), float(retry_after)
+
+def _too_many(retry_after):
+    response, status = error_response("Too many requests, please slow down.", status_code=429)
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response, status
+
+def cost_limited(weight, bucket='api'):
+    """
+    Charge `weight` tokens for every call of the view, put it under the route/jwt decorators.
+
+    Rough scale: 1 a plain write, 5 an upload, 10 a password hash, 20+ imports and exports.
+    `weight` can be a function of no arguments, for calls whose cost depends on the body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = spend(weight() if callable(weight) else weight, bucket)
+            if not allowed:
+                return _too_many(retry_after)
+            return view(*args, **kwargs)
+        wrapper.rate_limit_cost = weight
+        return wrapper
+    return decorator
+
+def _charge_default_write():
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or request.endpoint is None:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, 'rate_limit_cost', None) is not None:
+        return None  # the view charges its own cost
+    allowed, retry_after = spend(current_app.config['RATE_LIMIT_DEFAULT_WRITE_COST'])
+    if not allowed:
+        return _too_many(retry_after)
+    return None
+
+def _remaining_header(response):
+    remaining = g.pop('rate_limit_remaining', None)
+    if remaining is not None:
+        response.headers['X-RateLimit-Remaining'] = str(remaining)
+    return response
+
+def init_rate_limit(app):
+    """Charge the default cost to writes that don't declare one."""
+    app.before_request(_charge_default_write)
+    app.after_request(_remaining_header)
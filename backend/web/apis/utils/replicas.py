@@ -0,0 +1,86 @@
+"""
+Read replica routing.
+
+With SQLALCHEMY_REPLICA_URI set, reads of a request can go to the replica while
+writes stay on the primary (`RoutingSession` in web/extensions.py). A request reads
+from the replica when
+
+    - its view is marked `@use_replica`, or DB_REPLICA_ROUTING is 'method' and it is a GET/HEAD,
+    - and the caller hasn't written in the last DB_REPLICA_PIN_SECONDS.
+
+The second rule covers replication lag: a caller that just wrote is pinned to the
+primary for a few seconds (a redis key per user and per IP), so their next page
+shows what they saved. Only mark views that can live with data a few seconds old:
+
+    @product_bp.route('/products', methods=['GET'])
+    @jwt_required(optional=True)
+    @use_replica
+    def products(): ...
+
+Locally, point SQLALCHEMY_DATABASE_URI and SQLALCHEMY_REPLICA_URI at two sqlite files
+and run `flask schema sync-replica` to "replicate".
+"""
+
+import logging
+from flask import current_app, g, request
+from flask_limiter.util import get_remote_address
+from web.extensions import REPLICA_BIND, db, redis
+from web.apis.utils.rate_limit import caller_identity
+
+logger = logging.getLogger('web.replicas')
+
+READ_METHODS = ('GET', 'HEAD')
+
+def use_replica(view):
+    """Let the view read from the replica, put it under the route/jwt decorators."""
+    view.use_replica = True
+    return view
+
+def _pin_keys():
+    keys = {f"replica:pin:ip:{get_remote_address()}", f"replica:pin:{caller_identity()}"}
+    return sorted(keys)
+
+def pinned_to_primary():
+    """True when the caller wrote within DB_REPLICA_PIN_SECONDS, or when redis can't tell."""
+    try:
+        return bool(redis.exists(*_pin_keys()))
+    except Exception:
+        logger.exception("replica pin check failed, reading from the primary")
+        return True
+
+def pin_to_primary(seconds=None):
+    seconds = seconds or current_app.config['DB_REPLICA_PIN_SECONDS']
+    try:
+        pipe = redis.pipeline()
+        for key in _pin_keys():
+            pipe.set(key, 1, ex=seconds)
+        pipe.execute()
+    except Exception:
+        logger.exception("could not pin the caller to the primary")
+
+def replica_configured(app=None):
+    return REPLICA_BIND in (app or current_app).config.get('SQLALCHEMY_BINDS', {})
+
+def _wants_replica():
+    if request.method not in READ_METHODS or request.endpoint is None:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'use_replica', False):
+        return True
+    return current_app.config.get('DB_REPLICA_ROUTING') == 'method'
+
+def _route_reads():
+    if _wants_replica() and not pinned_to_primary():
+        g.db_replica = True
+
+def _pin_writers(response):
+    if db.session().info.get('wrote'):
+        pin_to_primary()
+    return response
+
+def init_replicas(app):
+    """Route reads to the replica bind, a no-op until SQLALCHEMY_REPLICA_URI is set."""
+    if not replica_configured(app):
+        return
+    app.before_request(_route_reads)
+    app.after_request(_pin_writers)
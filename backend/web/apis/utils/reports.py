@@ -0,0 +1,272 @@
+"""
+Sales, revenue and usage reports served from daily rollup tables (models/reports.py).
+
+`refresh_reports()` folds source rows newer than each source's watermark into the
+rollups, in id ranges of REPORTS_CHUNK_SIZE, committing the rollup rows together with
+the new watermark. So a run only reads what arrived since the last one and report
+queries scan one row per day (or per day and product) instead of every order item.
+
+Ids are handed out before commit, so a row can become visible after one with a higher
+id has been folded. A run therefore only goes up to the newest row older than
+REPORTS_SETTLE_SECONDS (by the database clock), the rest waits for the next run; only
+a transaction open longer than that can still slip under the watermark.
+
+Sources are treated as append-only. Edits after the fact (an order soft deleted, a
+usage row corrected) are picked up with `flask reports refresh --rebuild-from DAY`,
+which recomputes the days from DAY onwards.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import sqlalchemy as sa
+from flask import current_app
+from web.extensions import db, redis
+from web.apis.models.categories import Category, products_categories
+from web.apis.models.orders import Order, OrderItem
+from web.apis.models.plans import Plan, Subscription, Usage
+from web.apis.models.products import Product
+from web.apis.models.reports import DailyCategorySales, DailyProductSales, DailySales, DailyUsage, ReportWatermark
+
+REFRESH_LOCK_KEY = 'reports:refresh:lock'
+INTERVALS = ('day', 'week', 'month')
+SOURCES = {'orders': Order, 'order_items': OrderItem, 'usage': Usage}
+ROLLUPS = (DailySales, DailyProductSales, DailyCategorySales, DailyUsage)
+
+class ReportRefreshRunning(Exception):
+    """Another refresh holds the lock."""
+
+def _as_date(value):
+    # func.date() comes back as a date on postgres/mysql and as a string on sqlite
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _accumulate(model, key_column, rows):
+    """
+    Add `rows` ({(day, key): {column: delta}}) onto the rollup, creating missing rows.
+
+    Existing rows of the affected days are loaded in one query, the rest are inserts.
+    """
+    if not rows:
+        return
+    days = {day for day, _ in rows}
+    query = model.query.filter(model.day.in_(days))
+    if key_column:
+        query = query.filter(getattr(model, key_column).in_({key for _, key in rows}))
+    existing = {(row.day, getattr(row, key_column) if key_column else None): row for row in query}
+
+    for (day, key), deltas in rows.items():
+        row = existing.get((day, key))
+        if row is None:
+            row = model(day=day, **({key_column: key} if key_column else {}), **{column: 0 for column in deltas})
+            db.session.add(row)
+        for column, delta in deltas.items():
+            setattr(row, column, (getattr(row, column) or 0) + int(delta or 0))
+
+def _fold_orders(window):
+    rows = defaultdict(dict)
+    stmt = (
+        sa.select(sa.func.date(Order.created_at), sa.func.count(Order.id))
+        .where(window(Order), Order.is_deleted == False)
+        .group_by(sa.func.date(Order.created_at))
+    )
+    for day, count in db.session.execute(stmt):
+        rows[(_as_date(day), None)]['orders_count'] = count
+    _accumulate(DailySales, None, rows)
+
+def _fold_order_items(window):
+    day_expr = sa.func.date(OrderItem.created_at)
+    units = sa.func.sum(OrderItem.quantity)
+    revenue = sa.func.sum(OrderItem.price * OrderItem.quantity)
+    live = (window(OrderItem), OrderItem.is_deleted == False)
+
+    per_product, per_day = defaultdict(dict), defaultdict(lambda: {'items_sold': 0, 'revenue': 0})
+    stmt = sa.select(day_expr, OrderItem.product_id, units, revenue).where(*live).group_by(day_expr, OrderItem.product_id)
+    for day, product_id, sold, earned in db.session.execute(stmt):
+        day = _as_date(day)
+        per_product[(day, product_id)] = {'units': sold, 'revenue': earned}
+        per_day[(day, None)]['items_sold'] += int(sold or 0)
+        per_day[(day, None)]['revenue'] += int(earned or 0)
+
+    # a product in several categories counts towards each of them
+    per_category = {}
+    stmt = (
+        sa.select(day_expr, products_categories.c.category_id, units, revenue)
+        .join(products_categories, products_categories.c.product_id == OrderItem.product_id)
+        .where(*live)
+        .group_by(day_expr, products_categories.c.category_id)
+    )
+    for day, category_id, sold, earned in db.session.execute(stmt):
+        per_category[(_as_date(day), category_id)] = {'units': sold, 'revenue': earned}
+
+    _accumulate(DailyProductSales, 'product_id', per_product)
+    _accumulate(DailyCategorySales, 'category_id', per_category)
+    _accumulate(DailySales, None, per_day)
+
+def _fold_usage(window):
+    day_expr = sa.func.date(Usage.created_at)
+    plan_expr = sa.func.coalesce(Subscription.plan_id, 0)
+    stmt = (
+        sa.select(day_expr, plan_expr, sa.func.sum(Usage.units_used), sa.func.count(Usage.id))
+        .outerjoin(Subscription, Subscription.id == Usage.subscription_id)
+        .where(window(Usage), Usage.is_deleted == False)
+        .group_by(day_expr, plan_expr)
+    )
+    rows = {
+        (_as_date(day), plan_id): {'units_used': used, 'events': events}
+        for day, plan_id, used, events in db.session.execute(stmt)
+    }
+    _accumulate(DailyUsage, 'plan_id', rows)
+
+FOLDERS = {'orders': _fold_orders, 'order_items': _fold_order_items, 'usage': _fold_usage}
+
+def _watermark(source):
+    mark = db.session.get(ReportWatermark, source)
+    if mark is None:
+        mark = ReportWatermark(source=source, last_id=0)
+        db.session.add(mark)
+    return mark
+
+def _settled_high(model, settle_seconds):
+    """Highest id among rows older than `settle_seconds`, lower ids are no longer in flight."""
+    cutoff = db.session.scalar(sa.select(sa.func.now())) - timedelta(seconds=settle_seconds)
+    return db.session.scalar(sa.select(sa.func.max(model.id)).where(model.created_at < cutoff)) or 0
+
+def _refresh_source(source, chunk_size, settle_seconds):
+    model = SOURCES[source]
+    mark = _watermark(source)
+    high = _settled_high(model, settle_seconds)
+    folded = 0
+    while mark.last_id < high:
+        low, upto = mark.last_id, min(mark.last_id + chunk_size, high)
+        FOLDERS[source](lambda m: m.id.between(low + 1, upto))
+        folded += upto - low
+        mark.last_id = upto
+        mark.updated_at = datetime.utcnow()
+        db.session.commit()  # rollup rows and watermark move together
+    if not folded:
+        mark.updated_at = datetime.utcnow()
+        db.session.commit()
+    return folded
+
+def _locked(fn):
+    if not redis.set(REFRESH_LOCK_KEY, 1, nx=True, ex=3600):
+        raise ReportRefreshRunning("A report refresh is already running.")
+    try:
+        return fn()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        redis.delete(REFRESH_LOCK_KEY)
+
+def refresh_reports(chunk_size=None):
+    """
+    Fold new orders, order items and usage into the rollups.
+
+    Returns:
+        dict: {source: source ids covered by this run}
+    """
+    chunk_size = chunk_size or current_app.config.get('REPORTS_CHUNK_SIZE', 50000)
+    settle_seconds = current_app.config.get('REPORTS_SETTLE_SECONDS', 300)
+    return _locked(lambda: {source: _refresh_source(source, chunk_size, settle_seconds) for source in SOURCES})
+
+def rebuild_reports(since):
+    """
+    Recompute every rollup day from `since` (a date) up to the current watermarks.
+
+    For corrections to rows that were already folded in, the rest of history is untouched.
+    """
+    def rebuild():
+        start = datetime.combine(since, datetime.min.time())
+        for model in ROLLUPS:
+            db.session.execute(sa.delete(model).where(model.day >= since))
+        for source, model in SOURCES.items():
+            last_id = _watermark(source).last_id
+            FOLDERS[source](lambda m: sa.and_(m.created_at >= start, m.id <= last_id))
+        db.session.commit()
+        return {model.__tablename__: db.session.scalar(sa.select(sa.func.count()).select_from(model).where(model.day >= since)) for model in ROLLUPS}
+    return _locked(rebuild)
+
+def freshness():
+    """{source: last refresh time}, so callers can tell how current a report is."""
+    return {mark.source: mark.updated_at for mark in ReportWatermark.query}
+
+def parse_range(args, default_days=30):
+    """
+    `start`/`end` query args (YYYY-MM-DD, both inclusive), the last `default_days` days by default.
+
+    Raises:
+        ValueError: on a malformed date or start after end.
+    """
+    end = date.fromisoformat(args['end']) if args.get('end') else date.today()
+    start = date.fromisoformat(args['start']) if args.get('start') else end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError("start must be on or before end.")
+    return start, end
+
+def _bucket(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+def _series(rows, interval, columns):
+    buckets = {}
+    for row in rows:
+        bucket = buckets.setdefault(_bucket(row.day, interval), {column: 0 for column in columns})
+        for column in columns:
+            bucket[column] += getattr(row, column) or 0
+    return [{'period': period.isoformat(), **values} for period, values in sorted(buckets.items())]
+
+def sales_report(start, end, interval='day'):
+    columns = ('orders_count', 'items_sold', 'revenue')
+    rows = DailySales.query.filter(DailySales.day.between(start, end)).order_by(DailySales.day).all()
+    series = _series(rows, interval, columns)
+    totals = {column: sum(point[column] for point in series) for column in columns}
+    return {'series': series, 'totals': totals}
+
+def _top(model, key_column, name_model, start, end, order_by, limit):
+    key = getattr(model, key_column)
+    units, revenue = sa.func.sum(model.units).label('units'), sa.func.sum(model.revenue).label('revenue')
+    rows = db.session.execute(
+        sa.select(key, units, revenue)
+        .where(model.day.between(start, end))
+        .group_by(key)
+        .order_by((revenue if order_by == 'revenue' else units).desc())
+        .limit(limit)
+    ).all()
+    names = dict(db.session.execute(
+        sa.select(name_model.id, name_model.name).where(name_model.id.in_([row[0] for row in rows]))
+        .execution_options(include_deleted=True)  # sales of a since deleted product still get its name
+    ).all())
+    return [
+        {key_column: key_id, 'name': names.get(key_id), 'units': int(sold or 0), 'revenue': int(earned or 0)}
+        for key_id, sold, earned in rows
+    ]
+
+def product_report(start, end, order_by='revenue', limit=20):
+    return _top(DailyProductSales, 'product_id', Product, start, end, order_by, limit)
+
+def category_report(start, end, order_by='revenue', limit=50):
+    return _top(DailyCategorySales, 'category_id', Category, start, end, order_by, limit)
+
+def usage_report(start, end, interval='day', plan_id=None):
+    query = DailyUsage.query.filter(DailyUsage.day.between(start, end))
+    if plan_id is not None:
+        query = query.filter(DailyUsage.plan_id == plan_id)
+    rows = query.order_by(DailyUsage.day).all()
+
+    by_plan = defaultdict(lambda: {'units_used': 0, 'events': 0})
+    for row in rows:
+        by_plan[row.plan_id]['units_used'] += row.units_used
+        by_plan[row.plan_id]['events'] += row.events
+    names = dict(db.session.execute(sa.select(Plan.id, Plan.name).where(Plan.id.in_(list(by_plan)))).all())
+
+    return {
+        'series': _series(rows, interval, ('units_used', 'events')),
+        'plans': [{'plan_id': pid or None, 'name': names.get(pid), **values} for pid, values in sorted(by_plan.items())],
+    }
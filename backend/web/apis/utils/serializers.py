@@ -1,5 +1,6 @@
 from flask import request, jsonify, url_for
 from flask_sqlalchemy.pagination import QueryPagination
+from web.apis.utils.profiler import timed
 
 class PageSerializer:
     def __init__(self, pagination_obj=None, items=None, resource_name=None, summary_func=None, context_id=None, **kwargs):
@@ -55,7 +56,8 @@ class PageSerializer:
         if not isinstance(pagination_obj, QueryPagination):
             raise TypeError(f"Expected Pagination object of {QueryPagination}, got {type(pagination_obj)}")
         
-        self.items = [self.summary_func(resource, **kwargs) for resource in pagination_obj.items]
+        with timed('serialize'):
+            self.items = [self.summary_func(resource, **kwargs) for resource in pagination_obj.items]
         self.data['total_items_count'] = pagination_obj.total
         self.data['offset'] = (pagination_obj.page - 1) * pagination_obj.per_page
         self.data['requested_page_size'] = pagination_obj.per_page
@@ -65,14 +67,16 @@ class PageSerializer:
         self.data['has_prev_page'] = pagination_obj.has_prev
 
         # Construct URLs dynamically, including context_id if provided
+        # (the current url's own arguments, e.g. <tag_id>, are reused so routes with path arguments build too)
         base_url = request.path
+        view_args = request.view_args or {}
         self.data['next_page_url'] = (
-            url_for(request.endpoint, page=pagination_obj.next_num, page_size=pagination_obj.per_page, context_id=self.context_id)
+            url_for(request.endpoint, **view_args, page=pagination_obj.next_num, page_size=pagination_obj.per_page, context_id=self.context_id)
             if pagination_obj.has_next else None
         )
         
         self.data['prev_page_url'] = (
-            url_for(request.endpoint, page=pagination_obj.prev_num, page_size=pagination_obj.per_page, context_id=self.context_id)
+            url_for(request.endpoint, **view_args, page=pagination_obj.prev_num, page_size=pagination_obj.per_page, context_id=self.context_id)
             if pagination_obj.has_prev else None
         )
 
@@ -83,7 +87,8 @@ class PageSerializer:
         :param items: 
             A list of items to serialize.
         """
-        self.items = [self.summary_func(resource, **kwargs) for resource in items]
+        with timed('serialize'):
+            self.items = [self.summary_func(resource, **kwargs) for resource in items]
         self.data['total_items_count'] = len(items)
         self.data['offset'] = 0
         self.data['requested_page_size'] = len(items)
@@ -107,6 +112,28 @@ class PageSerializer:
             self.resource_name: self.items,
         }
 
+class PrefetchedPagination(QueryPagination):
+    """
+    QueryPagination built from items and a total that were already loaded.
+
+    Lets loaders that fetch a page their own way (window counts, cached rows,
+    ranked ids) still go through PageSerializer and keep the same page_meta.
+
+    usage:
+        pagination = PrefetchedPagination(items=rows, total=total, page=page, per_page=page_size)
+        data = PageSerializer(pagination_obj=pagination, resource_name="comments").get_data()
+    """
+    def __init__(self, items, total, page, per_page):
+        self._prefetched_items = list(items)
+        self._prefetched_total = total
+        super().__init__(page=page, per_page=per_page, max_per_page=None, error_out=False, count=True)
+
+    def _query_items(self):
+        return self._prefetched_items
+
+    def _query_count(self):
+        return self._prefetched_total
+
 # def success_response(messages, data=None, status_code=200, include_status_code=False):
 #     # Also allows a list of messages
 #     msgs = messages if not isinstance(messages, list) else [messages]
@@ -143,7 +170,7 @@ def success_response(messages, data=None, status_code=200):
 #         'error': msgs
 #     }), status_code
 
-def error_response(messages, status_code=500, include_status_code=False):
+def error_response(messages, status_code=500, include_status_code=False, data=None):
     # Also allows a list of messages/errors
     msgs = messages if not isinstance(messages, list) else [messages]
     response = {
@@ -155,6 +182,10 @@ def error_response(messages, status_code=500, include_status_code=False):
     if status_code is not None and include_status_code:
         response['status_code'] = status_code
 
+    # Extra members, e.g field level errors
+    if data:
+        response.update(data)
+
     response = jsonify(response)
     
     return response, status_code
@@ -0,0 +1,194 @@
+"""
+The service catalog (service categories, services, area prices) as one in-process snapshot.
+
+The tables are tiny and read on every service request form interaction, so every
+worker keeps them in memory (`VersionedSnapshot`, see utils/snapshots.py) and only
+reloads after a write to one of them. The listings get an etag from the snapshot
+version, and quotes are computed from memory without touching the database.
+"""
+
+from web.extensions import db
+from web.apis.models.services import Area, Service, ServiceCategory
+from web.apis.utils.snapshots import VersionedSnapshot
+
+CATALOG_MAX_AGE = 300  # seconds, every write bumps the etag anyway
+
+class QuoteError(ValueError):
+    """Unknown service or area, or a bad quantity."""
+
+def build_catalog():
+    categories = [category.get_summary() for category in ServiceCategory.query.order_by(ServiceCategory.name)]
+    services = [service.get_summary() for service in Service.query.order_by(Service.name)]
+    areas = [area.get_summary() for area in Area.query.order_by(Area.name)]
+    return {
+        'categories': categories,
+        'services': services,
+        'areas': areas,
+        'services_by_id': {service['id']: service for service in services},
+        'areas_by_id': {area['id']: area for area in areas},
+    }
+
+catalog_snapshot = VersionedSnapshot('service_catalog', build_catalog).watch(ServiceCategory, Service, Area)
+
+def quote(service_id, area_id, quantity):
+    """
+    Price of a service request: the area's price per item times the quantity.
+
+    Returns:
+        tuple: (quote dict, snapshot version)
+
+    Raises:
+        QuoteError: unknown service/area or a quantity below 1.
+    """
+    if quantity is None or quantity < 1:
+        raise QuoteError("quantity must be a whole number of at least 1")
+    catalog, version = catalog_snapshot.get()
+    service = catalog['services_by_id'].get(service_id)
+    if service is None:
+        raise QuoteError("Service not found.")
+    area = catalog['areas_by_id'].get(area_id)
+    if area is None:
+        raise QuoteError("Area not found.")
+    return {
+        'service_id': service_id,
+        'service': service['name'],
+        'area_id': area_id,
+        'area': area['area_name'],
+        'quantity': quantity,
+        'unit_price': area['price'],
+        'total': area['price'] * quantity,
+    }, version
+
+# Initial catalog, `flask catalog seed` inserts whatever is missing (matched by name)
+
+LAUNDRY_SERVICES = [
+    {
+        'name': 'Dry Cleaning',
+        'image': './static/img/laundry/services/dry-cleaning.png',
+        'description': 'Professional dry cleaning service.',
+        'link': './laundry',
+        'icon': None
+    },
+    {
+        'name': 'Stain Removal',
+        'image': './static/img/laundry/services/stain-remover.png',
+        'description': 'Remove tough stains from your clothes.',
+        'link': './laundry',
+        'icon': None
+    },
+    {
+        'name': 'Iron Only',
+        'image': './static/img/laundry/services/ironing.png',
+        'description': 'Ironing service for your clothes.',
+        'link': './laundry',
+        'icon': 'fi-dresser'
+    },
+    {
+        'name': 'Wash & Iron',
+        'image': './static/img/laundry/services/iron-board.png',
+        'description': 'Wash and ironing services combined.',
+        'link': './laundry',
+        'icon': 'fi-package'
+    },
+    {
+        'name': 'Volume Subscription (Enjoy-discount)',
+        'image': './static/img/laundry/services/transaction.png',
+        'description': 'Get a discount with volume subscriptions.',
+        'link': './laundry',
+        'icon': 'fi-gift'
+    },
+    {
+        'name': 'Adjustment & Alterations',
+        'image': './static/img/laundry/services/sewing-machine.png',
+        'description': 'Alterations and adjustments for your clothes.',
+        'link': './laundry',
+        'icon': 'fi-scissors'
+    },
+    {
+        'name': 'Pick-up & Delivery',
+        'image': './static/img/laundry/services/pickup.png',
+        'description': 'Convenient pick-up and delivery service.',
+        'link': './laundry',
+        'icon': 'fi-bicycle'
+    }
+]
+
+FASHION_SERVICES = [
+    {
+        "name": "Men's Ankaras",
+        'image': './static/img/fashion/02.jpg',
+        "description": "Stylish men's Ankaras.",
+        "link": "./fashion",
+        "icon": None
+    },
+    {
+        "name": "Women Ankaras",
+        'image': './static/img/fashion/services/women_native.jpg',
+        "description": "Elegant women's Ankaras.",
+        "link": "./fashion",
+        "icon": None
+    },
+    {
+        "name": "Children Natives",
+        'image': './static/img/fashion/03.jpg',
+        "description": "Traditional outfits for children.",
+        "link": "./fashion",
+        "icon": None
+    },
+    {
+        "name": "Men's Native Clothes",
+        'image': './static/img/fashion/02.jpg',
+        "description": "Classic men's native attire.",
+        "link": "./fashion",
+        "icon": None
+    }
+]
+
+AREAS_WITH_PRICES = {
+    "ajah": 2000,
+    "vgc": 4000,
+    "chevron": 3000,
+    "lekki": 4000,
+    "LBS": 10000,
+    "Sangotedo": 13000,
+    "Awoyaya": 11000,
+    "Ado Road": 0,  # Placeholder for dynamic pricing if needed
+    "Badore": 0,
+    "adesanya": 0,
+    "graceland": 0,
+    "Scheme 2": 0,
+    "ogombo": 0,
+}
+
+def seed_catalog():
+    """
+    Insert the categories, services and priced areas above that don't exist yet.
+
+    Returns:
+        dict: rows added per table.
+    """
+    added = {'service_categories': 0, 'services': 0, 'areas': 0}
+    existing = {name for (name,) in db.session.execute(
+        db.select(Service.name).execution_options(include_deleted=True)
+    )}
+    for category_name, services in (('Laundry', LAUNDRY_SERVICES), ('Fashion', FASHION_SERVICES)):
+        category = ServiceCategory.query.execution_options(include_deleted=True).filter_by(name=category_name).first()
+        if category is None:
+            category = ServiceCategory(name=category_name)
+            db.session.add(category)
+            added['service_categories'] += 1
+        for service in services:
+            if service['name'] not in existing:
+                db.session.add(Service(category=category, **service))
+                added['services'] += 1
+
+    existing = {name for (name,) in db.session.execute(
+        db.select(Area.name).execution_options(include_deleted=True)
+    )}
+    for area_name, price in AREAS_WITH_PRICES.items():
+        if price > 0 and area_name not in existing:  # only areas with a price
+            db.session.add(Area(name=area_name, price=price))
+            added['areas'] += 1
+
+    db.session.commit()
+    return added
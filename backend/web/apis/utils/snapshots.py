@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+import traceback
+from flask import make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from web.extensions import on_primary, redis
+
+class VersionedSnapshot:
+    """
+    Read-mostly data kept in process memory and rebuilt only when its version moves.
+
+    The version is a redis counter shared by every worker. Writes to the watched
+    models bump it after commit, and each worker rebuilds its copy the next time it
+    sees a newer version. When redis can't be reached the local copy is kept for
+    `fallback_ttl` seconds before rebuilding.
+
+    usage:
+        geo_snapshot = VersionedSnapshot('geo', build_geo)
+        geo_snapshot.watch(Country, State, City)
+        data, version = geo_snapshot.get()
+    """
+    def __init__(self, name, builder, fallback_ttl=300):
+        self.name = name
+        self.builder = builder
+        self.fallback_ttl = fallback_ttl
+        self._snapshot = None  # (data, version, built at), replaced whole so a reader never mixes two builds
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f"snapshot:{self.name}:version"
+
+    def current_version(self):
+        try:
+            version = redis.get(self.version_key)
+            return int(version) if version else 0
+        except Exception:
+            traceback.print_exc()
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot[2] < self.fallback_ttl:
+                return snapshot[1]
+            return -1  # forces a rebuild, but never matches a real version
+
+    def get(self):
+        """
+        Returns:
+            tuple: (data, version) of an up to date snapshot.
+        """
+        version = self.current_version()
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[1] != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot[1] != version:  # another thread may have rebuilt it meanwhile
+                    with on_primary():  # the copy is kept until the next bump, don't build it from a lagging replica
+                        data = self.builder()
+                    snapshot = (data, version, time.monotonic())
+                    self._snapshot = snapshot
+        return snapshot[0], snapshot[1]
+
+    def bump(self):
+        """Invalidate every worker's copy, call after committing a write the watched models can't see (bulk statements)."""
+        try:
+            redis.incr(self.version_key)
+        except Exception:
+            traceback.print_exc()
+        self._snapshot = None  # get() works on its own reference, dropping ours never pulls data from under it
+
+    def watch(self, *models):
+        """Bump the snapshot after any commit that inserted, updated or deleted one of `models`."""
+        def mark(mapper, connection, target):
+            session = object_session(target)
+            if session is not None:
+                session.info.setdefault('dirty_snapshots', {})[self.name] = self
+
+        for model in models:
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                event.listen(model, name, mark)
+        return self
+
+@event.listens_for(Session, 'after_commit')
+def _bump_dirty_snapshots(session):
+    for snapshot in session.info.pop('dirty_snapshots', {}).values():
+        snapshot.bump()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_dirty_snapshots(session):
+    session.info.pop('dirty_snapshots', None)
+
+def make_etag(*parts):
+    """Strong etag from whatever identifies a response: snapshot version, query args, viewer specific bits."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+
+def not_modified(etag):
+    """True when the client already holds the representation tagged `etag`."""
+    return etag in request.if_none_match
+
+def cacheable(response, etag, max_age=300, private=False):
+    """
+    Tag a response (or a (response, status) tuple) for client and proxy caching.
+
+    Use `private=True` when the body depends on the viewer (e.g. `is_selected`), so
+    only the browser keeps it.
+    """
+    response = make_response(response)
+    response.set_etag(etag)
+    response.cache_control.max_age = max_age
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.vary.update(('Authorization', 'Cookie'))
+    return response
+
+def not_modified_response(etag, max_age=300, private=False):
+    return cacheable(('', 304), etag, max_age=max_age, private=private)
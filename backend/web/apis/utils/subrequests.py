@@ -0,0 +1,99 @@
+"""
+Internal sub-requests: GETs of this API run inside the current request.
+
+Each sub-request gets its own request context (path, query string, view args) but
+runs in the outer request's app context, so `g` and the database session are shared:
+the signed in user is loaded once for all of them (`user_lookup_callback` keeps it
+in `g`), and so is the token blocklist check. Only the view runs, the before/after
+request hooks don't, the outer request has already been through them.
+
+    responses = run_all({'products': '/api/products?page_size=20', 'categories': '/api/categories'})
+    # {'products': {'status': 200, 'body': {...}}, 'categories': {...}}
+
+Only plain reads can be batched: views marked `@use_replica` (they can already live
+with a replica, so they don't write) and the ones marked `@batchable`. GETs that do
+more than read (signout, token processing, payment callbacks, streamed exports) are
+refused.
+"""
+
+import traceback
+from urllib.parse import urlsplit
+from flask import current_app, g, request
+from werkzeug.exceptions import HTTPException
+from web.apis.utils.profiler import nested_view
+from web.apis.utils.replicas import pinned_to_primary, replica_configured
+
+# what a sub-request sees of the outer request: the caller's token, session and language
+FORWARDED_HEADERS = ('Authorization', 'Cookie', 'Accept-Language', 'User-Agent')
+
+class SubrequestError(ValueError):
+    """A path that can't be run as a sub-request."""
+
+def batchable(view):
+    """Let a read-only GET view run as a sub-request, put it under the route/jwt decorators."""
+    view.batchable = True
+    return view
+
+def runs_subrequests(view):
+    """Mark a view that runs sub-requests, so it can't be one itself."""
+    view.runs_subrequests = True
+    return view
+
+def resolve(path):
+    """The view a GET of `path` goes to. Raises SubrequestError when there is none."""
+    url = urlsplit(path)
+    if url.scheme or url.netloc:
+        raise SubrequestError(f"{path}: only paths of this API can be batched.")
+    adapter = current_app.url_map.bind_to_environ(request.environ)
+    try:
+        endpoint, _ = adapter.match(url.path, method='GET')
+    except HTTPException:
+        raise SubrequestError(f"{path}: no GET route.")
+    view = current_app.view_functions[endpoint]
+    if getattr(view, 'runs_subrequests', False):
+        raise SubrequestError(f"{path}: batches can't be nested.")
+    if not (getattr(view, 'batchable', False) or getattr(view, 'use_replica', False)):
+        raise SubrequestError(f"{path}: can't be batched, request it on its own.")
+    return view
+
+def run(path):
+    """GET `path` through its view. Returns (status code, json body or None)."""
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    with current_app.test_request_context(
+        path, method='GET', base_url=request.url_root, headers=headers,
+        environ_base={'REMOTE_ADDR': request.remote_addr},
+    ):
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+            view = current_app.view_functions[request.url_rule.endpoint]
+            with nested_view():  # its query budget is its own, not the batch's
+                try:
+                    rv = view(**request.view_args)
+                except Exception as e:
+                    rv = current_app.handle_user_exception(e)  # jwt errors, aborts
+            response = current_app.make_response(rv)
+        except Exception as e:
+            traceback.print_exc()
+            return 500, {'success': False, 'message': [str(e)]}
+        return response.status_code, response.get_json(silent=True)
+
+def run_all(paths):
+    """
+    Run {name: path} one after the other in the current request.
+
+    Every path is resolved before any runs, so a bad one fails the whole call. When
+    all of them may read from the replica, they do (see web/apis/utils/replicas.py).
+
+    Returns:
+        dict: {name: {'status': code, 'body': json}}
+    """
+    views = [resolve(path) for path in paths.values()]
+    if replica_configured() and all(getattr(view, 'use_replica', False) for view in views) and not pinned_to_primary():
+        g.db_replica = True
+
+    responses = {}
+    for name, path in paths.items():
+        status, body = run(path)
+        responses[name] = {'status': status, 'body': body}
+    return responses
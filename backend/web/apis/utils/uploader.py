@@ -1,12 +1,12 @@
-from os import getenv, makedirs, path, listdir, sep
+from os import getenv, makedirs, path, listdir, replace, sep
 from pathlib import Path
-import re, hashlib, cv2
+import re, hashlib
 
-import numpy as np
 from werkzeug.utils import secure_filename
 from flask import jsonify, current_app, request
 
 from web.apis.utils.serializers import error_response
+from web.tasks import process_image
 
 # Define a regular expression pattern for valid filenames (excluding illegal characters)
 valid_filename_pattern = re.compile(r'^[a-zA-Z0-9_.]+$')
@@ -18,6 +18,66 @@ def clean_filename(filename):
     cleaned_filename = cleaned_filename.replace('-', '_')
     return cleaned_filename
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+IMAGE_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP', 'GIF', 'BMP')  # what Pillow calls them
+
+def verify_image(file):
+    """
+    Check that an upload named like an image is one, before it is stored or gets a url.
+    Only parses the headers and structure (cheap); the full decode happens on the worker.
+
+    Raises:
+        ValueError: when it isn't a readable image.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(file.stream) as image:
+            fmt = image.format
+            image.verify()
+    except Exception as e:  # UnidentifiedImageError, truncated files, decompression bombs
+        raise ValueError(f"{file.filename} is not a valid image.") from e
+    finally:
+        file.seek(0)
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"{file.filename}: unsupported image format {fmt}.")
+
+def discard_upload(file_path, url):
+    """Remove an upload that turned out not to be an image: the file and every row pointing at it. Returns rows deleted."""
+    from web.extensions import db
+    from web.apis.models.file_uploads import FileUpload
+
+    Path(file_path).unlink(missing_ok=True)
+    if not url:
+        return 0
+    table = FileUpload.__table__
+    deleted = db.session.execute(table.delete().where(table.c.file_path == url)).rowcount
+    db.session.commit()
+    return deleted
+
+def encode_image(file_path, dimensions=None):
+    """
+    Decode, optionally resize, and re-encode an uploaded image in place (runs on the task worker).
+
+    Raises:
+        ValueError: when the file isn't a readable image.
+    """
+    import cv2  # opencv + numpy cost hundreds of ms to import, only the worker resizing images pays it
+    import numpy as np
+
+    img = cv2.imdecode(np.fromfile(file_path, np.uint8), -1)
+    if img is None:
+        raise ValueError(f"Invalid image file: {file_path}")
+
+    # Resize if dimensions are provided, otherwise keep original size
+    if dimensions:
+        img = cv2.resize(img, tuple(dimensions))
+    root, ext = path.splitext(file_path)
+    tmp_path = f"{root}.part{ext}"  # keep the extension, cv2 picks the encoder from it
+    if not cv2.imwrite(tmp_path, img):
+        raise ValueError(f"Could not encode image: {file_path}")
+    replace(tmp_path, file_path)  # the url never serves a half written file
+
 def uploader(file, upload_subdir=None, dimensions=None):
     """
     Secure file upload handler with proper URL generation
@@ -47,6 +107,12 @@ def uploader(file, upload_subdir=None, dimensions=None):
         file_hash = hashlib.md5(file.read()).hexdigest()
         file.seek(0)  # Reset file pointer
 
+        if ext.lower() in IMAGE_EXTENSIONS:
+            try:
+                verify_image(file)
+            except ValueError as e:
+                return None, str(e)
+
         # Create unique filename
         unique_name = f"{name[:50]}_{file_hash[:8]}{ext.lower()}"
         save_path = upload_full_path / unique_name
@@ -58,23 +124,15 @@ def uploader(file, upload_subdir=None, dimensions=None):
             clean_url = f"/{clean_url}".replace('//', '/')
             return f"{host_url}{clean_url}", None
 
-        # Process and save file
-        if ext.lower() in ['.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp']:
-            img = cv2.imdecode(np.frombuffer(file.read(), np.uint8), -1)
-            if img is None:
-                raise ValueError("Invalid image file")
-            
-            # Resize if dimensions are provided, otherwise keep original size
-            if dimensions:
-                img = cv2.resize(img, dimensions)
-            cv2.imwrite(str(save_path), img)
-        else:  # Handle videos and other files
-            file.save(str(save_path))
-
         # Generate clean URL
         url_path = Path(current_app.config['MEDIA_LOCATION']) / upload_rel_path / unique_name
         clean_url = str(url_path).replace('\\', '/')
         clean_url = f"/{clean_url}".replace('//', '/')
+
+        # Save as uploaded (verified above), images are decoded/resized/re-encoded by the task worker in place
+        file.save(str(save_path))
+        if ext.lower() in IMAGE_EXTENSIONS:
+            process_image.delay(str(save_path), list(dimensions) if dimensions else None, f"{host_url}{clean_url}")
         return f"{host_url}{clean_url}", None
 
     except Exception as e:
@@ -245,6 +303,8 @@ def uploader(file, upload_subdir=None, dimensions=None):
 
 
 def uploader_BAK(file):
+    import cv2
+    import numpy as np
     try:
         """ 
         uploads any kind of file/media/image/format ['.jpg', '.jpeg', '.png', '.webp', '.svg' '.gif', '.bmp'] 
@@ -309,6 +369,8 @@ def uploader_BAK(file):
         })
 
 def uploader_BAK2(file, upload_dir=None):
+    import cv2
+    import numpy as np
     try:
         """ 
         Uploads any kind of file/media/image/format ['.jpg', '.jpeg', '.png', '.webp', '.svg', '.gif', '.bmp'] 
@@ -1,9 +1,14 @@
 # Helper function to handle email verification
 import traceback
-from jsonschema import ValidationError, validate
+import sqlalchemy as sa
+from jsonschema import ValidationError
+from sqlalchemy.orm import make_transient_to_detached
+from web.apis.utils.validation import schemas
 from web.apis.utils.serializers import success_response, error_response
 from web.extensions import db
 from web.apis.schemas.user import validTokenSchema
+from web.apis.models.users import User
+from web.apis.models.roles import Role
 
 def handle_verify_email(user):
     try:
@@ -23,7 +28,7 @@ def handle_reset_password(user, data):
     try:
        
         try:
-            validate(instance=data, schema=validTokenSchema)
+            schemas.validate(data, validTokenSchema)
         except ValidationError as e:
             return error_response(f"Validation error: {e.message}")
         
@@ -43,4 +48,81 @@ def handle_reset_password(user, data):
     except Exception as e:
         traceback.print_exc()
         return error_response(f"{str(e)}")
-  
\ No newline at end of file
+  
+# Single-query uniqueness checks for signup / profile updates
+
+UNIQUE_USER_FIELDS = {
+    'username': "Please use a different username.",
+    'email': "Please use a different email address.",
+    'phone': "Please use a different phone number.",
+}
+
+def find_user_conflicts(values, exclude_user_id=None, messages=None):
+    """
+    Resolve every taken unique field in one `SELECT ... WHERE username=:u OR email=:e OR phone=:p`.
+
+    Args:
+        values (dict): candidate values, e.g. {'username': 'ada', 'email': 'ada@x.ng', 'phone': None}.
+        exclude_user_id (int, optional): the user being updated, whose own values don't conflict.
+        messages (dict, optional): per-field messages, defaults to UNIQUE_USER_FIELDS.
+
+    Returns:
+        dict: {field: message} for each value already used by another user, in field order.
+    """
+    messages = messages or UNIQUE_USER_FIELDS
+    values = {field: value for field, value in values.items() if field in UNIQUE_USER_FIELDS and value}
+    if not values:
+        return {}
+
+    stmt = sa.select(User.username, User.email, User.phone).where(
+        sa.or_(*[getattr(User, field) == value for field, value in values.items()])
+    )
+    if exclude_user_id is not None:
+        stmt = stmt.where(User.id != exclude_user_id)
+
+    taken = set()
+    for row in db.session.execute(stmt):
+        taken.update(field for field, value in values.items() if getattr(row, field) == value)
+    return {field: messages[field] for field in values if field in taken}
+
+def integrity_conflicts(error, messages=None):
+    """
+    Map a unique-constraint IntegrityError (lost race after find_user_conflicts) to field errors.
+
+    Recognises sqlite ("UNIQUE constraint failed: users.email"), postgres ("Key (email)=...")
+    and mysql ("Duplicate entry ... for key 'users.email'" / 'ix_users_email') messages.
+    """
+    messages = messages or UNIQUE_USER_FIELDS
+    text = str(getattr(error, 'orig', error)).lower()
+    fields = {
+        field: messages[field] for field in UNIQUE_USER_FIELDS
+        if any(marker in text for marker in (f"users.{field}", f"({field})", f"ix_users_{field}", f"users_{field}_key"))
+    }
+    return fields
+
+_role_cache = {}  # name -> detached, clean Role
+
+def cached_role(name, description=None):
+    """
+    A Role attached to the current session without querying for it.
+
+    Roles are static, so each is read once per process and then merged back with
+    `load=False`, which emits no SQL. A role created here isn't cached: its row is only
+    flushed, and a rollback would leave the cache pointing at an id that never existed.
+    The next call reads it back once committed.
+    """
+    role = _role_cache.get(name)
+    if role is None:
+        found = db.session.scalar(sa.select(Role).where(Role.name == name))
+        if found is None:
+            found = Role(name=name, description=description)
+            db.session.add(found)
+            db.session.flush()
+            return found
+        role = Role(id=found.id, name=found.name, description=found.description)
+        make_transient_to_detached(role)
+        _role_cache[name] = role
+    return db.session.merge(role, load=False)
+
+def forget_cached_roles():
+    _role_cache.clear()
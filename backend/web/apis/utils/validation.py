@@ -0,0 +1,151 @@
+import importlib
+import pkgutil
+from functools import wraps
+from flask import g, request
+from jsonschema import ValidationError
+from jsonschema.validators import validator_for
+from web.apis.utils.helpers import strtobool_custom
+from web.apis.utils.serializers import error_response
+
+class SchemaRegistry:
+    """
+    Compiled validators for the json schemas in `web/apis/schemas`.
+
+    `jsonschema.validate()` builds a validator class and checks the schema itself on
+    every call. Here both happen once per schema, the first time it is registered,
+    and each request only runs the compiled validator.
+
+    usage:
+        schemas.validate(data, product_schema)  # raises jsonschema.ValidationError
+    """
+    def __init__(self):
+        self._validators = {}  # id(schema) -> validator
+        self._names = {}  # 'product.product_schema' -> schema
+
+    def register(self, schema, name=None):
+        key = id(schema)
+        if key not in self._validators:
+            cls = validator_for(schema)
+            cls.check_schema(schema)  # a broken schema fails at startup, not on the first request
+            self._validators[key] = cls(schema)  # no format checker, same as jsonschema.validate()
+        if name:
+            self._names[name] = schema
+        return self._validators[key]
+
+    def load(self, package='web.apis.schemas'):
+        """Register every `*_schema` / `*Schema` dict of every module in `package`."""
+        package_module = importlib.import_module(package)
+        for module_info in pkgutil.iter_modules(package_module.__path__):
+            module = importlib.import_module(f"{package}.{module_info.name}")
+            for attr, value in vars(module).items():
+                if isinstance(value, dict) and (attr.endswith('_schema') or attr.endswith('Schema')):
+                    self.register(value, name=f"{module_info.name}.{attr}")
+        return self
+
+    def validator(self, schema):
+        """Compiled validator for a schema dict or a registered name like 'product.product_schema'."""
+        if isinstance(schema, str):
+            schema = self._names[schema]
+        return self._validators.get(id(schema)) or self.register(schema)
+
+    def validate(self, instance, schema):
+        """
+        Fail fast on the first error instead of collecting every error to pick the best one.
+
+        Raises:
+            ValidationError: same exception `jsonschema.validate()` raises.
+        """
+        error = next(self.validator(schema).iter_errors(instance), None)
+        if error is not None:
+            raise error
+
+    def __len__(self):
+        return len(self._validators)
+
+schemas = SchemaRegistry()
+
+def _coerce(value, types):
+    if not isinstance(value, str):
+        return value
+    try:
+        if 'integer' in types:
+            return int(value)
+        if 'number' in types:
+            return float(value)
+        if 'boolean' in types:
+            return strtobool_custom(value)
+        if 'null' in types and value in ('', 'null'):
+            return None
+    except ValueError:
+        pass  # leave it as is, validation reports the wrong type
+    return value
+
+def coerce_types(data, schema):
+    """
+    Cast string values to the types their schema properties declare.
+
+    Form posts (multipart/form-data) only carry strings, so "12" becomes 12 for an
+    "integer" property and "false" becomes False for a "boolean" one.
+    """
+    properties = schema.get('properties', {})
+    coerced = dict(data)
+    for key, value in data.items():
+        declared = properties.get(key, {}).get('type')
+        if declared:
+            coerced[key] = _coerce(value, declared if isinstance(declared, list) else [declared])
+    return coerced
+
+def validated_body(schema, defaults=None, coerce=True, casts=None, allow_form=True, empty_message="No data received."):
+    """
+    Parse, coerce and validate the request body against `schema` before the view runs.
+
+    The clean body is available to the view as `g.validated_body`. Bad requests are
+    answered with a 400 and never reach the view.
+
+    Args:
+        schema (dict): one of the schemas in `web/apis/schemas`.
+        defaults (dict, optional): values for keys missing from the body.
+        coerce (bool): cast strings to the property types the schema declares.
+        casts (dict, optional): {key: callable} run on present values after coercion,
+            before validation, e.g. to keep accepting what a handler used to convert.
+        allow_form (bool): accept multipart/form-data and urlencoded bodies besides json.
+        empty_message (str): error returned for an empty body.
+    """
+    schemas.register(schema)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.is_json:
+                data = request.get_json(silent=True)
+            elif allow_form and request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+                data = request.form.to_dict()
+            else:
+                expected = "application/json or multipart/form-data" if allow_form else "application/json"
+                return error_response(f"Content-Type must be {expected}", status_code=400)
+
+            if not data:
+                return error_response(empty_message, status_code=400)
+            if not isinstance(data, dict):
+                return error_response("Request body must be a json object.", status_code=400)
+
+            data = {**(defaults or {}), **data}
+            if coerce:
+                data = coerce_types(data, schema)
+            for key, cast in (casts or {}).items():
+                if key in data:
+                    data[key] = cast(data[key])
+            try:
+                schemas.validate(data, schema)
+            except ValidationError as e:
+                return error_response(f"Validation error: {e.message}", status_code=400)
+
+            g.validated_body = data
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def init_validation(app):
+    """Compile every schema once at startup."""
+    schemas.load()
+    app.extensions['schemas'] = schemas
@@ -0,0 +1,135 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+geo_cli = AppGroup('geo', help='Country, state and city data.')
+
+@geo_cli.command('import')
+@click.option('--country', 'countries', multiple=True, help='ISO code to import, repeat for more (default: all).')
+@click.option('--workers', type=int, default=None, help='Concurrent GeoNames requests (GEO_IMPORT_WORKERS).')
+@click.option('--batch-size', type=int, default=None, help='Rows per upsert statement (GEO_IMPORT_BATCH_SIZE).')
+@click.option('--checkpoint', default=None, help='Checkpoint file (GEO_IMPORT_CHECKPOINT).')
+@click.option('--api-url', default=None, help='GeoNames base url, e.g. a local fixture server (GEONAMES_API_URL).')
+@click.option('--username', default=None, help='GeoNames username (GEONAMES_USERNAME).')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and import every country again.')
+def geo_import(countries, workers, batch_size, checkpoint, api_url, username, restart):
+    """Import countries, states and cities from GeoNames, resuming from the last checkpoint."""
+    from web.apis.utils.geo_import import GeoImporter, ImportCheckpoint
+
+    importer = GeoImporter.from_config(
+        current_app.config,
+        api_url=api_url,
+        username=username,
+        workers=workers,
+        batch_size=batch_size,
+        checkpoint=ImportCheckpoint(checkpoint) if checkpoint else None,
+        log=click.echo,
+    )
+    if restart:
+        importer.checkpoint.reset()
+
+    stats = importer.run(country_codes=list(countries) or None)
+    click.echo(
+        f"[+] Done: {stats['countries']} countries, {stats['states']} states, {stats['cities']} cities "
+        f"({stats['skipped']} already imported)"
+    )
+    if stats['failed']:
+        raise click.ClickException(f"{len(stats['failed'])} countries failed, rerun to retry them: {stats['failed']}")
+
+rankings_cli = AppGroup('rankings', help='Precomputed product rankings.')
+
+@rankings_cli.command('refresh')
+@click.option('--kind', 'kinds', multiple=True, type=click.Choice(['bestselling', 'trending', 'rating']),
+              help='Ranking to rebuild, repeat for more (default: all).')
+def rankings_refresh(kinds):
+    """Recompute bestselling, trending and rating rankings (run it every few minutes)."""
+    from web.apis.utils.rankings import RANKINGS, refresh_rankings
+
+    counts = refresh_rankings(kinds or RANKINGS)
+    for kind, count in counts.items():
+        click.echo(f"[+] {kind}: {count} products ranked")
+
+reports_cli = AppGroup('reports', help='Sales and usage report rollups.')
+
+@reports_cli.command('refresh')
+@click.option('--chunk-size', type=int, default=None, help='Source ids folded per transaction (REPORTS_CHUNK_SIZE).')
+@click.option('--rebuild-from', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Recompute the rollups from this day on, after orders or usage were edited.')
+def reports_refresh(chunk_size, rebuild_from):
+    """Fold orders and usage recorded since the last run into the daily rollups."""
+    from web.apis.utils.reports import rebuild_reports, refresh_reports
+
+    for source, folded in refresh_reports(chunk_size=chunk_size).items():
+        click.echo(f"[+] {source}: {folded} new ids folded")
+    if rebuild_from:
+        for table, rows in rebuild_reports(rebuild_from.date()).items():
+            click.echo(f"[+] {table}: {rows} rows rebuilt since {rebuild_from.date()}")
+
+catalog_cli = AppGroup('catalog', help='Service catalog: categories, services, area prices.')
+
+@catalog_cli.command('seed')
+def catalog_seed():
+    """Insert the initial service categories, services and priced areas that are missing."""
+    from web.apis.utils.service_catalog import seed_catalog
+
+    for table, added in seed_catalog().items():
+        click.echo(f"[+] {table}: {added} added")
+
+softdelete_cli = AppGroup('softdelete', help='Soft deleted rows.')
+
+@softdelete_cli.command('compact')
+@click.option('--older-than-days', type=int, default=None, help='Only rows deleted before this (SOFT_DELETE_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Rows archived per transaction (SOFT_DELETE_BATCH_SIZE).')
+@click.option('--table', 'tables', multiple=True, help='Table to compact, repeat for more (default: all).')
+def softdelete_compact(older_than_days, batch_size, tables):
+    """Move old soft deleted rows to the archive tables and remove their image files."""
+    from web.apis.utils.compaction import compact
+
+    for table, stats in compact(retention_days=older_than_days, batch_size=batch_size, tables=tables).items():
+        click.echo(f"[+] {table}: {stats['archived']} rows archived, {stats['files']} files removed")
+
+schema_cli = AppGroup('schema', help='Database schema outside of migrations.')
+
+@schema_cli.command('create')
+def schema_create():
+    """Create the tables of a fresh database and stamp it at the latest migration (existing databases: `flask db upgrade`)."""
+    from flask_migrate import stamp
+    from web.extensions import db
+
+    db.create_all()
+    stamp()  # create_all built the current schema, don't replay the revisions on it
+    click.echo("[+] Tables created, stamped at the latest migration")
+    if 'replica' in db.engines:
+        db.metadata.create_all(db.engines['replica'])  # a real replica gets these from replication
+        click.echo("[+] Replica tables created")
+
+@schema_cli.command('sync-replica')
+def schema_sync_replica():
+    """Copy the primary into the replica, stands in for replication when both are sqlite files."""
+    import sqlite3
+    from web.extensions import db
+
+    replica = db.engines.get('replica')
+    if replica is None:
+        raise click.ClickException("SQLALCHEMY_REPLICA_URI is not set")
+    if db.engine.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise click.ClickException("only for local sqlite files, a real replica is kept in sync by the database")
+
+    replica.dispose()
+    source = sqlite3.connect(db.engine.url.database)
+    target = sqlite3.connect(replica.url.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    click.echo(f"[+] {db.engine.url.database} copied to {replica.url.database}")
+
+def register_commands(app):
+    """Attach the `flask <group> <command>` commands to the app."""
+    app.cli.add_command(geo_cli)
+    app.cli.add_command(rankings_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(softdelete_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(schema_cli)
@@ -4,6 +4,12 @@ from os import getenv, path
 
 from web.apis.utils.helpers import strtobool_custom
 
+def pool_options(budget, processes, threads):
+    """pool_size/max_overflow of one process, so `processes` pools together stay within `budget` connections."""
+    share = max(1, budget // max(1, processes))
+    pool_size = max(1, min(threads, share))
+    return {'pool_size': pool_size, 'max_overflow': share - pool_size}
+
 class Config:
     
     # Security
@@ -40,25 +46,96 @@ class Config:
     REDIS_URI = getenv('REDIS_URI', "redis://localhost:6379/0")
     SQLALCHEMY_DATABASE_URI = getenv('SQLALCHEMY_DATABASE_URI') # or 'sqlite:///'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_POOL_SIZE = 20  # Increase if needed
-    SQLALCHEMY_MAX_OVERFLOW = 30  # Allow more connections to be create
-    SQLALCHEMY_POOL_TIMEOUT = 30
-    SQLALCHEMY_MAX_OVERFLOW = 20
-
-    # SQLALCHEMY_ENGINE_OPTIONS = {
-    # 'pool_size': 5,
-    # 'max_overflow': 10,
-    # 'pool_timeout': 30,
-    # 'pool_recycle': 1800,
-    # }
-
+    # One pool per process: a gunicorn worker (WEB_CONCURRENCY of them, exported by
+    # gunicorn.conf.py) keeps WEB_THREADS connections and may burst to its share of
+    # DB_CONNECTION_BUDGET, so all workers together never open more than the budget.
+    # Leave room under the server's max_connections for celery workers and migrations.
+    # Only gunicorn exports WEB_CONCURRENCY, anything else must set it or each process
+    # sizes its pool for the whole budget: under Passenger to PassengerMaxPoolSize, for
+    # a celery worker to its --concurrency with WEB_THREADS=1 (see worker.py).
+    DB_CONNECTION_BUDGET = int(getenv('DB_CONNECTION_BUDGET', 40))
+    WEB_CONCURRENCY = int(getenv('WEB_CONCURRENCY', 1))
+    WEB_THREADS = int(getenv('WEB_THREADS', 4))
     SQLALCHEMY_ENGINE_OPTIONS = {
-    'pool_size': 50,
-    'max_overflow': 30,
-    'pool_timeout': 30,
-    'pool_recycle': 1800,  # Recycle connections every 30 minutes
+        **pool_options(DB_CONNECTION_BUDGET, WEB_CONCURRENCY, WEB_THREADS),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,  # Recycle connections every 30 minutes
+    }
+    # Read replica (web/apis/utils/replicas.py): `@use_replica` views, or every GET with
+    # DB_REPLICA_ROUTING=method, read from it unless the caller wrote in the last few seconds.
+    SQLALCHEMY_REPLICA_URI = getenv('SQLALCHEMY_REPLICA_URI')
+    SQLALCHEMY_BINDS = {'replica': SQLALCHEMY_REPLICA_URI} if SQLALCHEMY_REPLICA_URI else {}
+    DB_REPLICA_ROUTING = getenv('DB_REPLICA_ROUTING', 'decorator')  # decorator | method
+    DB_REPLICA_PIN_SECONDS = int(getenv('DB_REPLICA_PIN_SECONDS', 5))  # longer than the worst replication lag
+
+    # Password hashing, runs on its own bounded pool (web/apis/utils/passwords.py).
+    # Changing the method/cost upgrades stored hashes as users sign in.
+    PASSWORD_HASH_METHOD = getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(getenv('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_TIMEOUT = float(getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # GeoNames import (`flask geo import`), point GEONAMES_API_URL at a fixture server to import offline
+    GEONAMES_API_URL = getenv('GEONAMES_API_URL', 'http://api.geonames.org')
+    GEONAMES_USERNAME = getenv('GEONAMES_USERNAME', 'edet')
+    GEO_IMPORT_WORKERS = int(getenv('GEO_IMPORT_WORKERS', 8))
+    GEO_IMPORT_BATCH_SIZE = int(getenv('GEO_IMPORT_BATCH_SIZE', 1000))
+    GEO_IMPORT_CHECKPOINT = getenv('GEO_IMPORT_CHECKPOINT', path.join(path.abspath(path.dirname(__file__)), '..', 'geo_import.checkpoint.json'))
+
+    # Request profiler (Server-Timing headers, query counts, sampled cProfile dumps of slow requests)
+    PROFILER_ENABLED = bool(strtobool_custom(getenv('PROFILER_ENABLED', 'False')))
+    PROFILER_STRICT = bool(strtobool_custom(getenv('PROFILER_STRICT', 'False')))  # fail requests over their query budget
+    PROFILER_SAMPLE_RATE = float(getenv('PROFILER_SAMPLE_RATE', 0.05))
+    PROFILER_SLOW_REQUEST_MS = int(getenv('PROFILER_SLOW_REQUEST_MS', 500))
+    PROFILER_DUMP_DIR = getenv('PROFILER_DUMP_DIR', path.join(path.abspath(path.dirname(__file__)), '..', 'profiles'))
+
+    # Report rollups (`flask reports refresh`), source ids folded per transaction
+    REPORTS_CHUNK_SIZE = int(getenv('REPORTS_CHUNK_SIZE', 50000))
+    REPORTS_SETTLE_SECONDS = int(getenv('REPORTS_SETTLE_SECONDS', 300))  # rows younger than this wait for the next run
+
+    # Exports (web/apis/utils/exports.py), background dumps land in EXPORTS_LOCATION, outside static/ on purpose
+    EXPORTS_LOCATION = getenv('EXPORTS_LOCATION', path.join(path.abspath(path.dirname(__file__)), '..', 'media', 'exports'))
+    EXPORT_CHUNK_ROWS = int(getenv('EXPORT_CHUNK_ROWS', 1000))
+
+    # Invoices and receipts (web/apis/utils/invoices.py), content addressed pdfs
+    INVOICES_LOCATION = getenv('INVOICES_LOCATION', path.join(path.abspath(path.dirname(__file__)), '..', 'media', 'invoices'))
+
+    # Task queue (web/tasks.py). The sqlite broker needs no extra service, point CELERY_BROKER_URL at
+    # REDIS_URI in production, or 'filesystem://' to pass messages through CELERY_FILESYSTEM_FOLDER.
+    # Without CELERY_BROKER_URL set, nothing says a worker is running (e.g. passenger alone), so
+    # tasks run inline in the process that queues them instead of piling up in the sqlite broker.
+    CELERY_BROKER_URL = getenv('CELERY_BROKER_URL', 'sqla+sqlite:///' + path.join(path.abspath(path.dirname(__file__)), '..', 'celery-broker.sqlite'))
+    CELERY_RESULT_BACKEND = getenv('CELERY_RESULT_BACKEND', 'db+sqlite:///' + path.join(path.abspath(path.dirname(__file__)), '..', 'celery-results.sqlite'))
+    CELERY_FILESYSTEM_FOLDER = getenv('CELERY_FILESYSTEM_FOLDER', path.join(path.abspath(path.dirname(__file__)), '..', 'celery-queue'))
+    CELERY_TASK_ALWAYS_EAGER = bool(strtobool_custom(getenv('CELERY_TASK_ALWAYS_EAGER', 'False' if getenv('CELERY_BROKER_URL') else 'True')))  # run tasks inline, no worker
+    CELERY_TASK_EAGER_PROPAGATES = False  # an inline task failing doesn't fail the request that queued it
+    CELERY_BEAT_SCHEDULE = {
+        'refresh-rankings': {'task': 'web.tasks.refresh_rankings', 'schedule': 600.0},
+        'refresh-reports': {'task': 'web.tasks.refresh_reports', 'schedule': 900.0},
+        'compact-deleted': {'task': 'web.tasks.compact_deleted', 'schedule': 86400.0},
+        'release-stale-dispatch': {'task': 'web.tasks.release_stale_dispatch', 'schedule': 300.0},
     }
 
+    # Service request dispatch (web/apis/utils/dispatch.py)
+    DISPATCH_BATCH_SIZE = int(getenv('DISPATCH_BATCH_SIZE', 20))  # requests per claimed pickup round
+    DISPATCH_CLAIM_TIMEOUT_MINUTES = int(getenv('DISPATCH_CLAIM_TIMEOUT_MINUTES', 240))  # open batches older than this are requeued
+
+    # Soft deleted rows older than this move to <table>_archive (web/apis/utils/compaction.py)
+    SOFT_DELETE_RETENTION_DAYS = int(getenv('SOFT_DELETE_RETENTION_DAYS', 30))
+    SOFT_DELETE_BATCH_SIZE = int(getenv('SOFT_DELETE_BATCH_SIZE', 500))
+
+    # Cost based rate limiting (web/apis/utils/rate_limit.py), one token bucket per user/IP
+    RATE_LIMIT_ENABLED = bool(strtobool_custom(getenv('RATE_LIMIT_ENABLED', 'True')))
+    RATE_LIMIT_CAPACITY = int(getenv('RATE_LIMIT_CAPACITY', 60))  # burst
+    RATE_LIMIT_REFILL_RATE = float(getenv('RATE_LIMIT_REFILL_RATE', 1))  # tokens per second
+    RATE_LIMIT_DEFAULT_WRITE_COST = int(getenv('RATE_LIMIT_DEFAULT_WRITE_COST', 1))
+    RATE_LIMIT_SUBREQUEST_COST = int(getenv('RATE_LIMIT_SUBREQUEST_COST', 1))  # per GET run by /batch
+    RATE_LIMIT_LEASE = int(getenv('RATE_LIMIT_LEASE', 5))  # tokens a process may settle locally
+    RATE_LIMIT_LEASE_TTL = float(getenv('RATE_LIMIT_LEASE_TTL', 2))
+
+    # Create missing tables when the app boots, off by default: every worker start would pay for it
+    AUTO_CREATE_SCHEMA = bool(strtobool_custom(getenv('AUTO_CREATE_SCHEMA', 'False')))
+
     # Mail configuration
     MAIL_SERVER = getenv('MAIL_SERVER', 'localhost')
     MAIL_PORT = int(getenv('MAIL_PORT', 25))
@@ -106,7 +183,18 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     """Testing-specific configuration."""
     # TESTING = True
+    PROFILER_ENABLED = True
+    PROFILER_STRICT = True  # endpoints over their declared query budget fail
+    PROFILER_SAMPLE_RATE = 0
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # cheap hashes keep tests fast
+    CELERY_TASK_ALWAYS_EAGER = True  # tasks run inline and their errors surface in the test
+    CELERY_TASK_EAGER_PROPAGATES = True
+    RATE_LIMIT_ENABLED = False
+    AUTO_CREATE_SCHEMA = True  # in memory database, nothing to migrate
+    CELERY_BROKER_URL = 'memory://'
+    CELERY_RESULT_BACKEND = 'cache+memory://'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///'  # In-memory database for tests
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # one shared connection (StaticPool), pool_size/max_overflow would be rejected
     
     # configuration of mail  
     MAIL_PORT = int(getenv('MAIL_PORT', 587))  # Ensure this is an integer
@@ -5,6 +5,7 @@ from flask_moment import Moment
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
+import os
 from os import getenv
 
 # Initialize extensions
@@ -18,8 +19,59 @@ oauth = OAuth()
 from flask_wtf.csrf import CSRFProtect
 csrf = CSRFProtect()
 
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+
+class RoutingSession(Session):
+    """
+    Sends reads to the `replica` bind (SQLALCHEMY_BINDS) when the request asked for it
+    (`g.db_replica`, set by web/apis/utils/replicas.py), everything else to the primary.
+
+    Flushes, INSERT/UPDATE/DELETE statements and SELECT ... FOR UPDATE always go to the
+    primary, and once the session has written, the rest of the request reads from the
+    primary too so it sees its own writes.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return primary
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+            return primary
+        if self.info.get('wrote') or getattr(clause, '_for_update_arg', None) is not None:
+            return primary
+        if not (has_app_context() and g.get('db_replica')):
+            return primary
+        replica = self._db.engines.get(REPLICA_BIND)
+        if replica is None or primary is not self._db.engine:
+            return primary  # tables on another bind have no replica
+        return replica
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+from contextlib import contextmanager
+
+@contextmanager
+def on_primary():
+    """
+    Read from the primary inside the block, even in a replica request.
+
+    For data that outlives the request (snapshots, redis caches keyed on a version a
+    write just bumped): built from a lagging replica it would be kept under the new
+    version until the next bump.
+    """
+    if not (has_app_context() and g.get('db_replica')):
+        yield
+        return
+    g.db_replica = False
+    try:
+        yield
+    finally:
+        g.db_replica = True
 
 from flask_bcrypt import Bcrypt
 bcrypt = Bcrypt()
@@ -31,9 +83,33 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from redis import Redis
+import threading
+from werkzeug.local import LocalProxy
+
+def lazy(factory):
+    """
+    Module level object built on first use, e.g. `redis` and `fake` below.
+
+    Keeps process start (every passenger/gunicorn worker) from paying for clients a
+    worker may never touch.
+    """
+    instance = []
+    lock = threading.Lock()
+
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    return LocalProxy(get)
+
+def _redis_client():
+    from redis import Redis
+    return Redis.from_url(getenv('REDIS_URI'))
+
 # Initialize Redis client
-redis = Redis.from_url(getenv('REDIS_URI'))
+redis = lazy(_redis_client)
 # import redis
 # redis = redis.Redis(
 #     host=getenv('REDIS_HOST'),
@@ -49,15 +125,68 @@ from flask_limiter.util import get_remote_address
 limiter = Limiter(
     key_func=get_remote_address,
     # default_limits=["200 per day", "50 per hour"]
-    default_limits=["1 per second", "5 per minute"],  # Allow up to 1 request per second or a burst of 5 in a minute
+    # default_limits=["1 per second", "5 per minute"],  # Allow up to 1 request per second or a burst of 5 in a minute
+    # No default limits: reads are free, writes pay a cost instead (web/apis/utils/rate_limit.py)
+    default_limits=[],
     storage_uri=getenv('REDIS_URI', 'redis://localhost:6379/0')  # Ensure the Redis URL is correct
 )
 
 from flask_jwt_extended import JWTManager #, create_access_token, jwt_required, get_jwt_identity
 jwt = JWTManager()
 
-from faker import Faker
-fake = Faker()
+def _faker():
+    from faker import Faker  # loads locale providers, slow to import
+    return Faker()
+
+fake = lazy(_faker)
+
+from celery import Celery, Task
+
+class AppContextTask(Task):
+    """Runs every task inside the Flask app context, so tasks use db, mail, config as views do."""
+    abstract = True
+
+    def __call__(self, *args, **kwargs):
+        if has_app_context():  # eager mode, already inside a request or the cli
+            return super().__call__(*args, **kwargs)
+        with self.app.flask_app.app_context():
+            return super().__call__(*args, **kwargs)
+
+celery = Celery('web', task_cls=AppContextTask)
+
+def init_celery(app):
+    """
+    Configure the task queue from CELERY_* settings (web/config.py) and bind it to `app`.
+
+    Tasks live in web/tasks.py. Run a worker with `celery -A worker worker -B` from backend/,
+    with CELERY_BROKER_URL set in the web processes too, or they run every task inline.
+    """
+    config = app.config
+    celery.conf.update(
+        broker_url=config['CELERY_BROKER_URL'],
+        result_backend=config['CELERY_RESULT_BACKEND'],
+        task_always_eager=config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        task_eager_propagates=config.get('CELERY_TASK_EAGER_PROPAGATES', False),
+        task_ignore_result=True,  # callers poll redis/db state, not celery results
+        task_acks_late=True,  # a task killed mid-way is redelivered, tasks are written to be idempotent
+        worker_prefetch_multiplier=1,
+        beat_schedule=config.get('CELERY_BEAT_SCHEDULE', {}),
+        include=['web.tasks'],
+    )
+    if config['CELERY_BROKER_URL'].startswith('filesystem://'):
+        folder = config['CELERY_FILESYSTEM_FOLDER']
+        for sub in ('out', 'processed'):
+            os.makedirs(os.path.join(folder, sub), exist_ok=True)
+        celery.conf.broker_transport_options = {
+            'data_folder_in': os.path.join(folder, 'out'),
+            'data_folder_out': os.path.join(folder, 'out'),
+            'data_folder_processed': os.path.join(folder, 'processed'),
+        }
+    if config.get('CELERY_TASK_ALWAYS_EAGER') and not app.testing:
+        app.logger.warning("CELERY_TASK_ALWAYS_EAGER: tasks run inline in the request, set CELERY_BROKER_URL to hand them to a worker")
+    celery.flask_app = app
+    app.extensions['celery'] = celery
+    return celery
 
 def config_app(app, config_name):
     """Configure app settings based on environment."""
@@ -99,6 +228,7 @@ def init_ext(app):
     oauth.init_app(app)
     # socketio.init_app(app)
     csrf.init_app(app)
+    init_celery(app)
 
 def make_available():
     """Provide application metadata."""
@@ -0,0 +1,103 @@
+"""
+Background tasks, run by a celery worker (`celery -A worker worker -B` from backend/).
+
+Every task runs inside the app context (see AppContextTask in web/extensions.py) and
+imports what it needs when it runs, so importing this module stays cheap for the web
+process. With CELERY_TASK_ALWAYS_EAGER (tests) `.delay()` runs the task inline.
+"""
+
+import traceback
+from smtplib import SMTPException
+from requests.exceptions import ConnectionError, Timeout
+from web.extensions import celery, redis
+
+@celery.task(autoretry_for=(SMTPException, OSError), retry_backoff=True, retry_backoff_max=600, max_retries=5, rate_limit='60/m')
+def send_email(subject, sender, recipients, text_body='', html_body=''):
+    from flask_mail import Message
+    from web.extensions import mail
+
+    msg = Message(subject, sender=sender, recipients=recipients)
+    msg.body = text_body
+    msg.html = html_body
+    mail.send(msg)
+
+@celery.task(autoretry_for=(ConnectionError, Timeout), retry_backoff=30, retry_backoff_max=1800, max_retries=8, rate_limit='30/m')
+def verify_paystack(reference):
+    """Retry a paystack verification the callback couldn't finish (paystack unreachable)."""
+    from web.apis.utils.invoices import queue_document
+    from web.apis.utils.paystack import verify_transaction
+    from web.apis.models.transactions import Transaction
+
+    outcome, _ = verify_transaction(reference)
+    if outcome in ('updated', 'activated'):
+        queue_document('transaction', Transaction.get_transaction(reference).id)
+    return outcome
+
+@celery.task(acks_late=False)  # a crawl takes hours, a redelivery would start it over (the checkpoint skips finished countries anyway)
+def geo_import(country_codes=None, lock_key=None):
+    from flask import current_app
+    from web.apis.utils.geo_import import GeoImporter
+
+    try:
+        return GeoImporter.from_config(current_app.config).run(country_codes=country_codes)
+    finally:
+        if lock_key:
+            redis.delete(lock_key)
+
+@celery.task
+def build_export(job_id, dataset, fmt, filters):
+    from web.apis.utils.exports import write_export
+
+    write_export(job_id, dataset, fmt, filters)
+
+@celery.task(autoretry_for=(OSError,), max_retries=2)
+def render_document(context, digest, lock_key=None):
+    from web.apis.utils.invoices import document_path, render_pdf
+
+    try:
+        render_pdf(context, document_path(digest))
+    finally:
+        if lock_key:
+            redis.delete(lock_key)
+
+@celery.task(bind=True, rate_limit='120/m', max_retries=3)
+def process_image(self, file_path, dimensions=None, url=None):
+    from os import path
+    from web.apis.utils.uploader import discard_upload, encode_image
+
+    if path.exists(file_path):
+        try:
+            encode_image(file_path, dimensions)
+            return 'encoded'
+        except ValueError:
+            traceback.print_exc()  # passed the upload check but doesn't decode, never serve it
+    if not discard_upload(file_path, url) and url and self.request.retries < self.max_retries:
+        raise self.retry(countdown=30)  # the upload's row may not be committed yet
+    return 'discarded'
+
+@celery.task
+def refresh_rankings():
+    from web.apis.utils.rankings import refresh_rankings as refresh
+
+    return refresh()
+
+@celery.task
+def refresh_reports():
+    from web.apis.utils.reports import ReportRefreshRunning, refresh_reports as refresh
+
+    try:
+        return refresh()
+    except ReportRefreshRunning:
+        return None  # the previous run is still going, skip this beat
+
+@celery.task
+def compact_deleted():
+    from web.apis.utils.compaction import compact
+
+    return compact()
+
+@celery.task
+def release_stale_dispatch():
+    from web.apis.utils.dispatch import release_stale_batches
+
+    return release_stale_batches()
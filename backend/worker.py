@@ -0,0 +1,19 @@
+"""
+Celery entry point, run from backend/:
+
+    celery -A worker worker -B --loglevel=info
+
+`-B` also runs the beat scheduler (CELERY_BEAT_SCHEDULE), use a separate
+`celery -A worker beat` when running more than one worker.
+
+Each worker process opens its own db pool, sized from WEB_CONCURRENCY (web/config.py).
+Set it to the worker's concurrency, one thread per process:
+
+    WEB_CONCURRENCY=4 WEB_THREADS=1 celery -A worker worker --concurrency=4 -B --loglevel=info
+"""
+from os import getenv
+from web import create_app
+
+app = create_app(getenv('FLASK_CONFIG', 'production'))
+celery = app.extensions['celery']
+celery.conf.task_always_eager = False  # eager only applies to web processes, beat here queues through the broker
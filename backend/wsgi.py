@@ -0,0 +1,30 @@
+"""
+Production entry point, run from backend/:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+gunicorn.conf.py preloads this module in the master process, so blueprints, compiled
+json schemas, SQLAlchemy mappers and templates are built once and every forked worker
+shares those pages copy-on-write instead of building (and holding) its own copy.
+Each worker still opens its own db pool after the fork, sized from DB_CONNECTION_BUDGET
+(web/config.py).
+"""
+import gc
+from app import app as application
+
+def warm(app):
+    """Build now what workers would otherwise build on their first requests."""
+    from sqlalchemy.orm import configure_mappers
+    configure_mappers()
+
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)  # compiled templates stay in the env cache
+        except Exception as e:
+            app.logger.warning(f"template {name} not precompiled: {e}")
+
+warm(application)
+
+# Objects built so far live as long as the app. Moving them out of the collector's
+# generations keeps gc runs in the workers from writing to (and so copying) the shared pages.
+gc.freeze()
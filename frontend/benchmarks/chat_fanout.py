@@ -0,0 +1,86 @@
+"""
+Cost of a chat message to a group: per member lookups vs one emit to the group's room.
+
+    cd frontend && python -m benchmarks.chat_fanout [--users 5000] [--group-sizes 10,100,1000] [--messages 200]
+
+Registers --users online users (web/apis/utils/presence.py), two sockets each, in
+its own redis database (--redis-url, flushed first), then sends --messages messages
+to groups of each size three ways, through a ConnectionManager (web/apis/utils/chats.py)
+on that redis and a write only Flask-SocketIO emitter on its message queue:
+
+    per member   a presence lookup per member, then an emit per socket (the old notify_group)
+    pipelined    one pipelined lookup of all members, then an emit per socket
+    room         ConnectionManager.notify_group itself, one emit to the group's room
+
+and prints, per message, the redis commands the server processed (INFO stats) and the
+time taken. The room column should stay at one command whatever the group size.
+"""
+import argparse
+import time
+from redis import Redis
+from web.apis.utils.chats import NAMESPACE, ConnectionManager
+
+CHANNEL = 'flask-socketio'  # Flask-SocketIO's default message queue channel
+
+def commands(redis):
+    return redis.info('stats')['total_commands_processed']
+
+def per_member(manager, members, message):
+    for member in members:
+        for sid in manager.presence.sockets([member]).get(member, ()):
+            manager.sio.emit('message', message, room=sid, namespace=NAMESPACE)
+
+def pipelined(manager, members, message):
+    for sockets in manager.get_sockets(members).values():
+        for sid in sockets:
+            manager.sio.emit('message', message, room=sid, namespace=NAMESPACE)
+
+def room(manager, members, message):
+    manager.notify_group('message', message, 1)
+
+STRATEGIES = (('per member', per_member), ('pipelined', pipelined), ('room', room))
+
+def measure(redis, strategy, manager, members, messages):
+    """(redis commands, milliseconds) per message."""
+    first = commands(redis)
+    info_cost = commands(redis) - first  # what reading the counter adds to it
+    before = commands(redis)
+    started = time.perf_counter()
+    for n in range(messages):
+        strategy(manager, members, {'group_id': 1, 'content': f"message {n}"})
+    elapsed = time.perf_counter() - started
+    spent = commands(redis) - before - info_cost
+    return spent / messages, elapsed * 1000 / messages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15', help='database to use, it is flushed')
+    parser.add_argument('--users', type=int, default=5000, help='online users')
+    parser.add_argument('--group-sizes', default='10,100,1000', help='comma separated group sizes')
+    parser.add_argument('--messages', type=int, default=200, help='messages per group size and strategy')
+    args = parser.parse_args()
+
+    from flask_socketio import SocketIO
+    redis = Redis.from_url(args.redis_url)
+    redis.flushdb()
+    # no app: a write only emitter on the message queue, like a worker process
+    manager = ConnectionManager(redis, SocketIO(message_queue=args.redis_url, channel=CHANNEL))
+    presence = manager.presence
+
+    for n in range(args.users):
+        presence.heartbeat(f"user{n}", f"sid{n}a")
+        presence.heartbeat(f"user{n}", f"sid{n}b")
+    print(f"{presence.count()} users online\n")
+
+    print(f"{'group size':>10}" + ''.join(f"{name + ' cmds':>18}{name + ' ms':>16}" for name, _ in STRATEGIES))
+    for size in (int(size) for size in args.group_sizes.split(',')):
+        members = [f"user{n}" for n in range(min(size, args.users))]
+        row = f"{size:>10}"
+        for _, strategy in STRATEGIES:
+            spent, ms = measure(redis, strategy, manager, members, args.messages)
+            row += f"{spent:>18.1f}{ms:>16.3f}"
+        print(row)
+    redis.flushdb()
+
+if __name__ == '__main__':
+    main()
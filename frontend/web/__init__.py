@@ -11,6 +11,10 @@ def create_app(config_name=None):
         config_app(app, config_name)
         init_ext(app)
         app.context_processor(make_available) # make some-data available in the context through-out
+
+        # fingerprinted static files, when built
+        from web.apis.utils.assets import init_assets
+        init_assets(app)
         
         # Register Blueprints(front-pages)
         from web.apis import api_bp
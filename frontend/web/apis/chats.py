@@ -1,5 +1,7 @@
-from flask import render_template
+from flask import render_template, request
 import traceback
+from web.extensions import socketio
+from web.apis.utils.chats import NAMESPACE, connection_manager
 from web.apis.utils.serializers import error_response
 from web.apis import api_bp as chats_bp
 
@@ -11,4 +13,20 @@ def chat():
     except Exception as e:
         traceback.format_exc()
         return error_response(str(e))
-    
\ No newline at end of file
+    
+
+# Chat sockets: io('/api/chats', {auth: {group_ids: [...]}}), then a 'heartbeat' event
+# every HEARTBEAT_INTERVAL seconds (web/apis/utils/presence.py) to stay online.
+
+@socketio.on('connect', namespace=NAMESPACE)
+def chat_connect(auth=None):
+    group_ids = (auth or {}).get('group_ids') or request.args.getlist('group_id')
+    connection_manager.connect(request.sid, group_ids)
+
+@socketio.on('heartbeat', namespace=NAMESPACE)
+def chat_heartbeat():
+    connection_manager.heartbeat(request.sid)
+
+@socketio.on('disconnect', namespace=NAMESPACE)
+def chat_disconnect(reason=None):
+    connection_manager.disconnect(request.sid)
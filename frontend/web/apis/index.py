@@ -2,8 +2,26 @@
 from flask import render_template
 import traceback
 from web.apis.utils.serializers import error_response
+from web.apis.utils.api_client import prefetch, render_deadline
 from web.apis import api_bp as index_bp
 
+FASHION_PAGE_SIZE = 20  # what web/static/js/pages/fashion.js asks for
+CRUD_PAGE_SIZE = 5  # the first page of the fashion-crud table
+
+def fashion_data():
+    """Categories, the first products, and the first products of every category, for /fashion."""
+    deadline = render_deadline()  # one budget for both rounds
+    data = prefetch({
+        'categories': ('/categories', {}),
+        'products': ('/products', {'page_size': FASHION_PAGE_SIZE}),
+    }, deadline)
+    categories = (data['categories'] or {}).get('categories') or []
+    data['category_products'] = prefetch({
+        category['id']: ('/products', {'page_size': FASHION_PAGE_SIZE, 'category_id': category['id']})
+        for category in categories if category.get('id')
+    }, deadline)
+    return data
+
 @index_bp.route('/fashion-bak')
 def fashion_bak():
     try:
@@ -17,7 +35,7 @@ def fashion_bak():
 @index_bp.route('/index')
 def index():
     try:
-        context= {}
+        context= {'initial_data': fashion_data()}  # the fashion tabs are on the home page too
         return render_template('index.html', **context)
     except Exception as e:
         traceback.format_exc() 
@@ -26,7 +44,7 @@ def index():
 @index_bp.route('/fashion')
 def fashion():
     try:
-        context= {}
+        context= {'initial_data': fashion_data()}
         return render_template('fashion.html', **context)
     except Exception as e:
         traceback.format_exc()
@@ -35,7 +53,10 @@ def fashion():
 @index_bp.route('/fashion-crud')
 def fashion_crud():
     try:
-        context= {}
+        context= {'initial_data': prefetch({
+            'categories': ('/categories', {}),
+            'products': ('/products', {'page': 1, 'page_size': CRUD_PAGE_SIZE}),
+        })}
         return render_template('fashion_crud.html', **context)
     except Exception as e:
         traceback.format_exc()
@@ -0,0 +1,139 @@
+"""
+Server side calls to the backend API, so pages render with their data in place.
+
+Pages like /fashion used to render an empty shell and have the browser call the API,
+one request after the other. Their views now fetch what the page shows first:
+
+    initial_data = prefetch({
+        'categories': ('/categories', {}),
+        'products': ('/products', {'page_size': 20}),
+    })
+
+and the template embeds it for the page script, which reads it before going to the network:
+
+    <script id="initial-data" type="application/json">{{ initial_data|tojson }}</script>
+
+- one pooled requests.Session per process (keep-alive, up to API_POOL_SIZE connections),
+- the calls of a page run in parallel,
+- results are kept API_FRAGMENT_TTL seconds, keyed on path and query args,
+- a page waits API_RENDER_BUDGET seconds at most for all of its calls, rounds included
+  (pass the same `deadline` to every prefetch of the page),
+- a call that fails or doesn't make the budget comes back as None, and the page script
+  fetches that part itself like before. One still running goes on in the background
+  and fills the cache for the next render.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import current_app
+
+logger = logging.getLogger('web.api_client')
+
+MAX_CACHED = 512  # query args come from the browser, keep the cache bounded
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+_cache = {}  # (path, sorted params) -> (expires at, data)
+
+def api_session():
+    """The process wide session, created on first use (after the worker forked)."""
+    global _session, _executor
+    if _session is None:
+        with _lock:
+            if _session is None:
+                size = current_app.config['API_POOL_SIZE']
+                retry = Retry(total=1, backoff_factor=0.1, status_forcelist=(502, 503, 504), allowed_methods=frozenset({'GET'}))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Accept'] = 'application/json'
+                _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='api')
+                _session = session
+    return _session
+
+def _get(session, url, params, timeout):
+    try:
+        response = session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.warning(f"GET {url} failed, left to the browser: {e}")
+        return None
+
+def _cached(key):
+    entry = _cache.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+def _store(key, data, ttl):
+    now = time.monotonic()
+    with _lock:
+        if len(_cache) >= MAX_CACHED:
+            for stale in [k for k, (expires, _) in _cache.items() if expires <= now]:
+                del _cache[stale]
+            while len(_cache) >= MAX_CACHED:
+                del _cache[next(iter(_cache))]  # oldest first
+        _cache[key] = (now + ttl, data)
+
+def render_deadline():
+    """When the page stops waiting for the API, API_RENDER_BUDGET seconds from now."""
+    return time.monotonic() + current_app.config['API_RENDER_BUDGET']
+
+def _cache_when_done(key, ttl):
+    def store(future):
+        data = None if future.cancelled() else future.result()
+        if data is not None:
+            _store(key, data, ttl)
+    return store
+
+def prefetch(calls, deadline=None):
+    """
+    GET several API paths at once.
+
+    Args:
+        calls (dict): {name: (path, query args)}
+        deadline (float, optional): time.monotonic() to give up at, `render_deadline()`
+            by default; share one between the prefetches of a page.
+
+    Returns:
+        dict: {name: the response json, None when the call failed or missed the deadline}
+    """
+    config = current_app.config
+    session = api_session()
+    base_url = config['API_URL'].rstrip('/')
+    ttl = config['API_FRAGMENT_TTL']
+    deadline = deadline or render_deadline()
+
+    results, pending = {}, {}
+    for name, (path, params) in calls.items():
+        key = (path, tuple(sorted(params.items())))
+        data = _cached(key) if ttl else None
+        if data is not None:
+            results[name] = data
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            results[name] = None
+            continue
+        future = _executor.submit(_get, session, f"{base_url}{path}", params, min(config['API_TIMEOUT'], remaining))
+        if ttl:
+            future.add_done_callback(_cache_when_done(key, ttl))
+        pending[name] = future
+
+    if pending:
+        wait(pending.values(), timeout=max(0, deadline - time.monotonic()))
+    for name, future in pending.items():
+        if future.done():
+            results[name] = future.result()
+        else:
+            future.cancel()  # still queued: never starts; already running: caches its result when it lands
+            results[name] = None
+    return results
@@ -0,0 +1,265 @@
+"""
+Static assets: fingerprinted names, precompressed copies and modern image formats.
+
+`flask assets build` copies web/static into ASSETS_DIST with a content hash in every
+file name (css/theme.min.css -> css/theme.min.3f2a9c1b7e0d.css) and writes
+manifest.json, original name -> hashed name. Next to each hashed file it writes
+
+    - .br (brotli) and .gz (zopfli, plain gzip without it) copies of text assets,
+    - .avif and .webp conversions of jpg/png images,
+
+each kept only when smaller than the original. Stylesheets get their url(...)
+references rewritten to the hashed names too.
+
+With a manifest present, `url_for('static', filename=...)` returns the hashed name, and
+hashed names are served with a year long immutable Cache-Control: a new build means new
+names, so browsers never revalidate. The best variant the request's Accept-Encoding /
+Accept allows is sent under the same url, with Vary set. Anything not in the manifest
+(no build yet, paths built in js) is served from web/static like before.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import posixpath
+import re
+import shutil
+from pathlib import Path, PurePosixPath
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+logger = logging.getLogger('web.assets')
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico', '.ttf', '.otf', '.eot'}
+CONVERTIBLE = {'.jpg', '.jpeg', '.png'}
+
+# best first: (file suffix, Accept-Encoding token)
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+# best first: (file suffix, mimetype, Pillow format, save options)
+IMAGE_FORMATS = (
+    ('.avif', 'image/avif', 'AVIF', {'quality': 60}),
+    ('.webp', 'image/webp', 'WEBP', {'quality': 80, 'method': 6}),
+)
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+# Build
+
+def hashed_name(name, content):
+    """css/site.css -> css/site.<first HASH_LENGTH hex of sha256>.css"""
+    path = PurePosixPath(name)
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}"))
+
+def rewrite_css(name, css, manifest):
+    """Point the relative url(...) references of stylesheet `name` at their hashed names."""
+    base = posixpath.dirname(name) or '.'
+
+    def replace(match):
+        quote, target = match.groups()
+        if target.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', target).groups()
+        hashed = manifest.get(posixpath.normpath(posixpath.join(base, path)))
+        if hashed is None:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(hashed, base)}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+def _write(dist, name, content):
+    hashed = hashed_name(name, content)
+    target = dist / hashed
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(content)
+    return hashed
+
+def _gzip(data):
+    try:
+        import zopfli.gzip
+        return zopfli.gzip.compress(data)
+    except ImportError:
+        return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+def compress(path):
+    """Write the .br/.gz copies of `path` that come out smaller. Returns how many."""
+    data = path.read_bytes()
+    written = 0
+    for suffix, compressed in (('.br', _brotli(data)), ('.gz', _gzip(data))):
+        if compressed is not None and len(compressed) < len(data):
+            Path(f"{path}{suffix}").write_bytes(compressed)
+            written += 1
+    return written
+
+def convert(path, unsupported):
+    """
+    Write the .avif/.webp conversions of `path` that come out smaller. Returns how many.
+    Formats this Pillow can't encode are added to `unsupported` and skipped from then on.
+    """
+    from PIL import Image
+
+    size = path.stat().st_size
+    written = 0
+    with Image.open(path) as image:
+        if image.mode not in ('RGB', 'RGBA'):
+            transparent = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+        for suffix, _, fmt, options in IMAGE_FORMATS:
+            if fmt in unsupported:
+                continue
+            target = Path(f"{path}{suffix}")
+            try:
+                image.save(target, fmt, **options)
+            except (KeyError, OSError):  # Pillow built without the encoder
+                target.unlink(missing_ok=True)
+                unsupported.add(fmt)
+                logger.warning(f"Pillow can't write {fmt}, skipping {suffix} variants")
+                continue
+            if target.stat().st_size >= size:
+                target.unlink()
+            else:
+                written += 1
+    return written
+
+def build(source, dist, precompress=True, images=True):
+    """
+    Fingerprint every file of `source` into `dist` (emptied first) and write the manifest.
+
+    Returns:
+        dict: {'files': n, 'compressed': n, 'converted': n}
+    """
+    source, dist = Path(source).resolve(), Path(dist).resolve()
+    if dist == source or dist in source.parents:
+        raise ValueError("The build directory can't contain the static folder.")
+    if dist.exists():
+        shutil.rmtree(dist)
+
+    files = sorted(
+        path for path in source.rglob('*')
+        if path.is_file() and dist not in path.parents and not path.name.startswith('.')
+    )
+    manifest, stylesheets = {}, []
+    for path in files:
+        name = path.relative_to(source).as_posix()
+        if path.suffix.lower() == '.css':
+            stylesheets.append((name, path))  # after what they point at
+        else:
+            manifest[name] = _write(dist, name, path.read_bytes())
+    for name, path in stylesheets:
+        css = rewrite_css(name, path.read_text(encoding='utf-8', errors='surrogateescape'), manifest)
+        manifest[name] = _write(dist, name, css.encode('utf-8', errors='surrogateescape'))
+
+    stats = {'files': len(manifest), 'compressed': 0, 'converted': 0}
+    unsupported = set()
+    for hashed in manifest.values():
+        path = dist / hashed
+        suffix = path.suffix.lower()
+        if precompress and suffix in COMPRESSIBLE:
+            stats['compressed'] += compress(path)
+        elif images and suffix in CONVERTIBLE:
+            try:
+                stats['converted'] += convert(path, unsupported)
+            except OSError as e:  # not an image after all
+                logger.warning(f"{hashed} not converted: {e}")
+
+    (dist / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return stats
+
+@click.group('assets')
+def assets_cli():
+    """Static asset pipeline."""
+
+@assets_cli.command('build')
+@click.option('--no-compress', is_flag=True, help="Skip the .br/.gz copies.")
+@click.option('--no-images', is_flag=True, help="Skip the .avif/.webp conversions.")
+@with_appcontext
+def build_command(no_compress, no_images):
+    """Fingerprint web/static into ASSETS_DIST."""
+    dist = current_app.config['ASSETS_DIST']
+    stats = build(current_app.static_folder, dist, precompress=not no_compress, images=not no_images)
+    click.echo(
+        f"{stats['files']} files fingerprinted into {dist}, "
+        f"{stats['compressed']} precompressed copies, {stats['converted']} image conversions."
+    )
+
+
+# Serving
+
+def _accepts(accept, value):
+    """True when the header names `value` itself, wildcards don't count (*/* is no promise of avif)."""
+    return any(item == value and quality > 0 for item, quality in accept)
+
+def _hashed_url(endpoint, values):
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    hashed = current_app.extensions['assets']['manifest'].get(values['filename'].lstrip('/'))
+    if hashed is not None:
+        values['filename'] = hashed
+
+def _pick_variant(filename, variants):
+    """(file to send, its mimetype, Content-Encoding or None, header to Vary on or None)"""
+    mimetype = mimetypes.guess_type(filename)[0]
+    available = variants.get(filename, ())
+    for suffix, token in ENCODINGS:
+        if suffix in available and _accepts(request.accept_encodings, token):
+            return f"{filename}{suffix}", mimetype, token, 'Accept-Encoding'
+    for suffix, image_type, _, _ in IMAGE_FORMATS:
+        if suffix in available and _accepts(request.accept_mimetypes, image_type):
+            return f"{filename}{suffix}", image_type, None, 'Accept'
+    if any(suffix in available for suffix, _ in ENCODINGS):
+        return filename, mimetype, None, 'Accept-Encoding'
+    return filename, mimetype, None, 'Accept' if available else None
+
+def serve_static(filename):
+    assets = current_app.extensions['assets']
+    if filename not in assets['variants']:
+        return current_app.send_static_file(filename)
+
+    path, mimetype, encoding, vary = _pick_variant(filename, assets['variants'])
+    response = send_from_directory(assets['dist'], path, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if vary:
+        response.vary.add(vary)
+    return response
+
+def load_manifest(dist):
+    """The manifest in `dist`, and {hashed name: suffixes of the variants it has} for its files."""
+    manifest = json.loads((dist / MANIFEST).read_text())
+    suffixes = [suffix for suffix, _ in ENCODINGS] + [suffix for suffix, *_ in IMAGE_FORMATS]
+    variants = {
+        hashed: tuple(suffix for suffix in suffixes if (dist / f"{hashed}{suffix}").is_file())
+        for hashed in manifest.values()
+    }
+    return manifest, variants
+
+def init_assets(app):
+    """Serve fingerprinted assets once `flask assets build` has run, web/static as is until then."""
+    app.cli.add_command(assets_cli)
+    if not app.config.get('ASSETS_ENABLED'):
+        return
+    dist = Path(app.config['ASSETS_DIST'])
+    try:
+        manifest, variants = load_manifest(dist)
+    except FileNotFoundError:
+        logger.warning(f"No {MANIFEST} in {dist}, serving unversioned static files (run `flask assets build`)")
+        return
+    app.extensions['assets'] = {'dist': dist, 'manifest': manifest, 'variants': variants}
+    app.url_defaults(_hashed_url)
+    app.view_functions['static'] = serve_static
@@ -1,130 +1,144 @@
 
+import logging
 from flask import request
-from flask_jwt_extended import current_user, get_jwt, get_jwt_identity, jwt_required
+from flask_jwt_extended import current_user, get_jwt_identity, jwt_required
+from flask_socketio import join_room, leave_room
 from web.extensions import socketio as sio, redis as redis_client
+from web.apis.utils.presence import Presence
+
+logger = logging.getLogger('web.chats')
+
+NAMESPACE = '/api/chats'
+
+def user_room(username):
+    return f"user:{username}"
+
+def group_room(group_id):
+    return f"group:{group_id}"
+
+def member_group_ids(identity, group_ids):
+    """
+    The ids among `group_ids` whose Group.users include `identity` (a user id, username
+    or email, whatever the token's sub is). None of them when the chat models aren't
+    available: a socket never joins a group on the client's word alone.
+    """
+    group_ids = {int(group_id) for group_id in group_ids if str(group_id).isdigit()}
+    if not group_ids:
+        return set()
+    if Group is None:
+        logger.warning("chat models unavailable, socket joins no groups")
+        return set()
+    from sqlalchemy import or_
+    from web.apis.models.users import User
+    member = or_(User.username == identity, User.email == identity)
+    if identity.isdigit():
+        member = or_(member, User.id == int(identity))
+    rows = db.session.execute(db.select(Group.id).where(Group.id.in_(group_ids), Group.users.any(member)))
+    return {group_id for (group_id,) in rows}
 
-# Initialize Redis connection
 class ConnectionManager:
-    def __init__(self):
-        self.redis_key = 'active_connections'
-
-    @jwt_required(optional=True)
-    def connect_x(self, socket_id):
+    """
+    Sockets of the chat namespace.
+
+    Every socket joins a room for its user and one for each of its groups, so a message
+    to a user or a group is one emit to a room, whatever the number of members and
+    sockets behind it. With socketio's message_queue pointed at redis that emit is one
+    PUBLISH, and each worker delivers it to the sockets it holds.
+
+    Who is online is kept per user by `Presence` (web/apis/utils/presence.py); clients
+    send a 'heartbeat' event every HEARTBEAT_INTERVAL seconds to stay listed.
+    """
+    def __init__(self, redis=None, socketio=None):
+        self.presence = Presence(redis if redis is not None else redis_client)
+        self.sio = socketio if socketio is not None else sio
+        self._usernames = {}  # socket id -> username, for the sockets of this process
+
+    def _username(self, socket_id):
+        """(username, signed in) of the socket's caller, anonymous sockets are `anon:<socket id>`."""
         # Attempt to get the current user's identity from the JWT token
         user = get_jwt_identity()  # This will return None if the user is not authenticated
-
         if user:
-            username = str(user)  # Use the user's identity (e.g., username)
-            print("Authenticated user:", username)
-        else:
-            # If no user is found, retrieve all claims
-            claims = get_jwt()  # Get all claims from the JWT
-            username = str(claims.get('username', request.remote_addr))  # Fallback to IP if username not found
-            print("No authenticated user, using claims or IP:", username)
-
-        # Check if the username already exists in Redis
-        existing_username = redis_client.hget(self.redis_key, request.remote_addr)
-
-        # If the user was previously connected with IP, update the socket ID for the new username
-        if existing_username:
-            print(f"Existing connection found for IP: {request.remote_addr}. Updating socket ID for username: {username}")
-            redis_client.hset(self.redis_key, username, socket_id)  # Update the new username's socket ID
-            # Optionally, remove the old entry if needed
-            redis_client.hdel(self.redis_key, existing_username)  # Remove old entry if username is different
-        else:
-            # Store the socket ID in Redis for the new username
-            redis_client.hset(self.redis_key, username, socket_id)
-
-        redis_client.expire(self.redis_key, 3600)  # Set expiration for the connection
+            return str(user), True  # Use the user's identity (e.g., username)
+        # never the IP: everybody behind one NAT would share a room and a presence entry
+        return f"anon:{socket_id}", False
 
     @jwt_required(optional=True)
-    def connect(self, socket_id):
-        # Attempt to get the current user's identity from the JWT token
-        user = get_jwt_identity()  # This will return None if the user is not authenticated
-
-        if user:
-            username = str(user)  # Use the user's identity (e.g., username)
-            print("Authenticated user:", username)
-        else:
-            # If no user is found, retrieve all claims
-            claims = get_jwt()  # Get all claims from the JWT
-            username = str(claims.get('username', request.remote_addr))  # Fallback to IP if username not found
-            print("No authenticated user, using claims or IP:", username)
-
-        # Check if the user is already connected with the same IP
-        existing_username = redis_client.hget(self.redis_key, request.remote_addr)
-
-        if existing_username:
-            # If the existing username is the same as the current one, update the socket ID
-            # if existing_username == username:
-            if existing_username.decode('utf-8') == username:
-                print(f"User {username} is already connected. Updating socket ID.")
-                redis_client.hset(self.redis_key, username, socket_id)  # Update socket ID
-            else:
-                print(f"Connection conflict: {existing_username} is already connected from IP: {request.remote_addr}.")
-                # Here you can either reject the new connection or handle it as needed
-                return {"message": "Connection conflict. User already connected."}, 409
-        else:
-            # Store the socket ID in Redis for the new username
-            redis_client.hset(self.redis_key, username, socket_id)
-
-        redis_client.expire(self.redis_key, 3600)  # Set expiration for the connection
-
-    def disconnect(self, username):
+    def connect(self, socket_id, group_ids=()):
+        """
+        Register a new socket: its rooms and its presence. Returns the username it runs as.
+
+        Only the `group_ids` the user is a member of are joined, anonymous sockets join none.
+        """
+        username, signed_in = self._username(socket_id)
+        join_room(user_room(username), sid=socket_id, namespace=NAMESPACE)
+        if signed_in:
+            self.join_groups(member_group_ids(username, group_ids), socket_id)
+        self._usernames[socket_id] = username
+        self.presence.heartbeat(username, socket_id)
+        return username
+
+    def heartbeat(self, socket_id=None):
+        socket_id = socket_id or request.sid
+        username = self._usernames.get(socket_id)
         if username is not None:
-            redis_client.hdel(self.redis_key, username)
+            self.presence.heartbeat(username, socket_id)
+
+    def disconnect(self, socket_id=None):
+        """Forget a socket (socketio takes it out of its rooms). Returns its username."""
+        socket_id = socket_id or request.sid
+        self._usernames.pop(socket_id, None)
+        return self.presence.leave(socket_id)
+
+    def join_groups(self, group_ids, socket_id=None):
+        """Join rooms of groups already checked with `member_group_ids`."""
+        for group_id in group_ids:
+            join_room(group_room(group_id), sid=socket_id or request.sid, namespace=NAMESPACE)
+
+    def leave_group(self, group_id, socket_id=None):
+        leave_room(group_room(group_id), sid=socket_id or request.sid, namespace=NAMESPACE)
 
     def get_socket(self, username):
-        socket_id = redis_client.hget(self.redis_key, username)
-        # Decode bytes to string if socket_id is not None and is of type bytes
-        if socket_id and isinstance(socket_id, bytes):
-            socket_id = socket_id.decode('utf-8')
-        return socket_id
-    
+        """Newest live socket of the user, None when offline."""
+        sockets = self.presence.sockets([username]).get(username)
+        return sockets[0] if sockets else None
+
+    def get_sockets(self, usernames):
+        """{username: live socket ids} for many users, one redis round trip."""
+        return self.presence.sockets(usernames)
+
     def notify(self, event, data, username=None):
-        if username is None:
-            username = request.remote_addr  # Use user's IP address as a fallback
-        socket_id = self.get_socket(username) or request.sid
-        # socket_id = self.get_socket(username)
-        if socket_id:
-            print(f"Emitting event '{event}' to socket ID: {socket_id} for user {username} with data {data}")
-            try:
-                sio.emit(event, data, room=socket_id, namespace='/api/chats')
-                return True
-            except Exception as e:
-                print(f"Error emitting event: {e}")
-                return False
-        else:
-            print(f"No socket ID found for username: {username}")
-            return None
+        """Emit to every socket of `username`, or to the current socket when None."""
+        room = user_room(username) if username is not None else request.sid
+        try:
+            self.sio.emit(event, data, room=room, namespace=NAMESPACE)
+            return True
+        except Exception as e:
+            print(f"Error emitting event: {e}")
+            return False
 
     def notify_group(self, event, data, group_id):
-        # Get all users in the group
-        group = Group.query.get(group_id)
-        if not group:
-            return  # Group does not exist
-
-        # Get all active connections for users in the group
-        for user in group.users:
-            # Attempt to get the socket ID using username first, then email
-            socket_id = self.get_socket(user.username) or self.get_socket(user.email)
-        
-            if socket_id:
-                print(f"Emitting group event '{event}' to socket ID: {socket_id} for users {user.username} with data {data}")
-                # sio.emit(event, data, room=socket_id)
-                sio.emit(event, data, room=socket_id, namespace='/api/chats')
-                
+        """Emit to every socket in the group: one emit, no lookup of its members."""
+        try:
+            self.sio.emit(event, data, room=group_room(group_id), namespace=NAMESPACE)
+            return True
+        except Exception as e:
+            print(f"Error emitting group event: {e}")
+            return False
+
     def current_socket_id(self):
         return request.sid
-    
+
     def get_active_connections(self):
-        # Return all active connections
-        return redis_client.hgetall(self.redis_key)
+        """{username: live socket ids} of everybody online."""
+        return self.presence.sockets(self.presence.online())
 
 connection_manager = ConnectionManager()
 
-from web.extensions import db
-from web.apis.models.chats import Chat, Group
+try:
+    from web.extensions import db
+    from web.apis.models.chats import Chat, Group
+except ImportError:  # the chat models live with the api, this app has no database of its own yet
+    db = Chat = Group = None
 
 def create_chat(user_id, group_id, media_type, media_url):
     chat = Chat(
@@ -0,0 +1,93 @@
+"""
+Chat presence: who is online, and on which sockets.
+
+    presence:user:<username>   hash, socket id -> last heartbeat (unix time)
+    presence:sid:<socket id>   username of the socket
+    presence:online            sorted set, username -> last heartbeat
+
+Sockets send a heartbeat every HEARTBEAT_INTERVAL seconds. A heartbeat refreshes the
+keys of its own user only, in one pipelined round trip, and they expire PRESENCE_TTL
+seconds after the last one: a socket whose worker died drops out on its own. Lookups
+for many users are one pipelined round trip too, whatever the count.
+
+    presence = Presence(redis)
+    presence.heartbeat('ada', sid)
+    presence.sockets(['ada', 'bob'])  # {'ada': [sid]}, bob is offline
+"""
+
+import time
+
+PRESENCE_TTL = 90
+HEARTBEAT_INTERVAL = 30
+
+USER_KEY = 'presence:user:{}'
+SID_KEY = 'presence:sid:{}'
+ONLINE_KEY = 'presence:online'
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+class Presence:
+    def __init__(self, redis, ttl=PRESENCE_TTL):
+        self.redis = redis
+        self.ttl = ttl
+
+    def heartbeat(self, username, socket_id, now=None):
+        """Mark the socket alive, on connect and on every heartbeat."""
+        now = now or time.time()
+        key = USER_KEY.format(username)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(key, socket_id, now)
+        pipe.expire(key, self.ttl)
+        pipe.set(SID_KEY.format(socket_id), username, ex=self.ttl)
+        pipe.zadd(ONLINE_KEY, {username: now})
+        pipe.execute()
+
+    def leave(self, socket_id):
+        """Forget a socket. Returns its username, None when it was unknown or expired."""
+        username = _text(self.redis.get(SID_KEY.format(socket_id)))
+        if username is None:
+            return None
+        key = USER_KEY.format(username)
+        pipe = self.redis.pipeline()
+        pipe.hdel(key, socket_id)
+        pipe.delete(SID_KEY.format(socket_id))
+        pipe.hlen(key)
+        left = pipe.execute()[-1]
+        if not left:
+            self.redis.zrem(ONLINE_KEY, username)
+        return username
+
+    def _live(self, sockets, now):
+        """Socket ids heard from within the ttl, newest first (a dead worker's sockets linger in the hash)."""
+        cutoff = now - self.ttl
+        seen = sorted(((float(at), _text(sid)) for sid, at in sockets.items()), reverse=True)
+        return [sid for at, sid in seen if at > cutoff]
+
+    def sockets(self, usernames, now=None):
+        """{username: live socket ids, newest first}, users without one left out."""
+        usernames = list(usernames)
+        if not usernames:
+            return {}
+        now = now or time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for username in usernames:
+            pipe.hgetall(USER_KEY.format(username))
+        found = {}
+        for username, sockets in zip(usernames, pipe.execute()):
+            live = self._live(sockets, now)
+            if live:
+                found[username] = live
+        return found
+
+    def online(self, now=None):
+        """Usernames with a heartbeat within the ttl, dropping the older ones from the set."""
+        now = now or time.time()
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(ONLINE_KEY, '-inf', now - self.ttl)
+        pipe.zrange(ONLINE_KEY, 0, -1)
+        return [_text(username) for username in pipe.execute()[-1]]
+
+    def count(self, now=None):
+        now = now or time.time()
+        return self.redis.zcount(ONLINE_KEY, f"({now - self.ttl}", '+inf')
@@ -64,6 +64,17 @@ class Config:
     MAX_CONTENT_PATH = int(getenv('MAX_CONTENT_PATH') or 1024 * 1024)  # Default to 1MB
     ALLOWED_EXTENSIONS = getenv('ALLOWED_EXTENSIONS', 'jpg, jpeg, png, gif, mov, mp4').split(',')
 
+    # Backend API, called server side to render pages with their data (web/apis/utils/api_client.py)
+    API_URL = getenv('API_URL', 'http://localhost:5001/api')
+    API_TIMEOUT = float(getenv('API_TIMEOUT', 3))  # seconds, the browser fetches what didn't make it
+    API_RENDER_BUDGET = float(getenv('API_RENDER_BUDGET', 1.5))  # seconds a page waits for all its calls together
+    API_POOL_SIZE = int(getenv('API_POOL_SIZE', 10))
+    API_FRAGMENT_TTL = int(getenv('API_FRAGMENT_TTL', 30))  # seconds, 0 disables the cache
+
+    # Static assets, fingerprinted into ASSETS_DIST by `flask assets build` (web/apis/utils/assets.py)
+    ASSETS_ENABLED = strtobool_custom(getenv('ASSETS_ENABLED', 'true'))
+    ASSETS_DIST = getenv('ASSETS_DIST', path.join(path.abspath(path.dirname(__file__)), 'static-dist'))
+
     # Session
     SESSION_TYPE = 'filesystem'
     SESSION_COOKIE_HTTPONLY = True
@@ -75,6 +86,7 @@ class DevelopmentConfig(Config):
     FLASK_DEBUG = True
     FLASK_APP = 'app.py'
     MAIL_DEBUG = True
+    ASSETS_ENABLED = False  # edits to web/static show up without a rebuild
     DEFAULT_MAIL_SENDER = getenv('DEFAULT_MAIL_SENDER') 
     DEFAULT_MAIL_TOKEN = getenv('mailtrap_token') 
     MAIL_SERVER = getenv('mailtrap_server')
@@ -13,6 +13,41 @@ csrf = CSRFProtect()
 from flask_cors import CORS
 cors = CORS()
 
+from flask_jwt_extended import JWTManager
+jwt = JWTManager()
+
+# chat sockets (web/apis/chats.py); with REDIS_URI as message queue an emit reaches the
+# sockets of every worker
+from flask_socketio import SocketIO
+socketio = SocketIO()
+
+import threading
+from werkzeug.local import LocalProxy
+
+def lazy(factory):
+    """
+    Module level object built on first use, e.g. `redis` below.
+
+    Keeps process start (every passenger/gunicorn worker) from paying for clients a
+    worker may never touch.
+    """
+    instance = []
+    lock = threading.Lock()
+
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    return LocalProxy(get)
+
+def _redis_client():
+    from redis import Redis
+    return Redis.from_url(getenv('REDIS_URI'))
+
+redis = lazy(_redis_client)
+
 def config_app(app, config_name):
     """Configure app settings based on environment."""
     from web.config import app_config
@@ -22,6 +57,8 @@ def init_ext(app):
     """Initialize all extensions."""
     csrf.init_app(app)
     cors.init_app(app)
+    jwt.init_app(app)  # verifies the api's tokens, both apps sign with SECRET_KEY
+    socketio.init_app(app, message_queue=app.config.get('REDIS_URI'))
 
 def make_available():
     """Provide application metadata."""
@@ -12,6 +12,9 @@ const apiURL = (
         ? "https://api.simplylovely.ng/api"
         : (window.apiURL || "http://localhost:5001/api");
 
+// Data the page was rendered with (web/apis/utils/api_client.py), read before going to the API
+const initialData = JSON.parse(document.getElementById('initial-data')?.textContent || '{}');
+
 class FashionProductsAPI {
     constructor(baseURL = apiURL) {
         this.baseURL = baseURL;
@@ -96,8 +99,8 @@ class FashionProductsAPI {
         }
 
         try {
-            const response = await fetch(`${this.baseURL}/categories`);
-            const data = await response.json();
+            const data = initialData.categories
+                || await fetch(`${this.baseURL}/categories`).then(response => response.json());
             
             if (data.success && data.categories) {
                 // Map backend categories to frontend structure
@@ -438,8 +441,8 @@ class FashionProductsAPI {
                 }
             }
 
-            const response = await fetch(url);
-            const data = await response.json();
+            const data = this.takeInitialProducts(categorySlug)
+                || await fetch(url).then(response => response.json());
             console.log(`CAT DATA - ${JSON.stringify(data)}`);
 
             if (data.success) {
@@ -493,6 +496,22 @@ class FashionProductsAPI {
 }*/
 
 
+    /**
+     * Products the page was rendered with for a category, once; later loads go to the API
+     */
+    takeInitialProducts(categorySlug) {
+        let data;
+        if (categorySlug === 'all') {
+            data = initialData.products;
+            delete initialData.products;
+        } else {
+            const id = this.categories[categorySlug]?.id;
+            data = id && initialData.category_products?.[id];
+            if (data) delete initialData.category_products[id];
+        }
+        return data;
+    }
+
     /**
      * Update products in category cache
      */